@@ -1,11 +1,12 @@
 import sqlite3
 import pandas as pd
 from pathlib import Path
+from derived_metrics import METRICS, refresh_metrics
 
 def add_precio_unidad_column():
     """
     Add PRECIO_UNIDAD column to the merged_imports table.
-    PRECIO_UNIDAD = TOTAL_A_PAGAR / CANTIDAD
+    PRECIO_UNIDAD = TOTAL_A_PAGAR / CANTIDAD (see derived_metrics.py for the other metrics)
     """
     db_path = Path("data/imports/merged/merged_data.db")
     
@@ -15,42 +16,14 @@ def add_precio_unidad_column():
     
     print(f"Connecting to database: {db_path}")
     conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # Check if column already exists
-    cursor.execute("PRAGMA table_info(merged_imports);")
-    columns = [col[1] for col in cursor.fetchall()]
-    
-    if 'PRECIO_UNIDAD' in columns:
-        print("Column PRECIO_UNIDAD already exists. Updating values...")
-        # Update existing column
-        cursor.execute("""
-            UPDATE merged_imports
-            SET PRECIO_UNIDAD = CASE 
-                WHEN CANTIDAD IS NOT NULL AND CANTIDAD != 0 
-                THEN TOTAL_A_PAGAR / CANTIDAD 
-                ELSE NULL 
-            END
-        """)
-    else:
-        print("Adding PRECIO_UNIDAD column...")
-        # Add new column
-        cursor.execute("ALTER TABLE merged_imports ADD COLUMN PRECIO_UNIDAD REAL;")
-        
-        # Calculate and populate the column
-        cursor.execute("""
-            UPDATE merged_imports
-            SET PRECIO_UNIDAD = CASE 
-                WHEN CANTIDAD IS NOT NULL AND CANTIDAD != 0 
-                THEN TOTAL_A_PAGAR / CANTIDAD 
-                ELSE NULL 
-            END
-        """)
-    
-    conn.commit()
+
+    # PRECIO_UNIDAD is one of the registered derived metrics: the column is added
+    # if missing, recomputed if its definition changed, otherwise only missing
+    # values are filled in (merge_xlsx_to_sqlite computes it as rows are inserted)
+    refresh_metrics(conn, metrics={'PRECIO_UNIDAD': METRICS['PRECIO_UNIDAD']})
     
     # Get statistics
-    cursor.execute("""
+    cursor = conn.execute("""
         SELECT 
             COUNT(*) as total_rows,
             COUNT(PRECIO_UNIDAD) as rows_with_precio,
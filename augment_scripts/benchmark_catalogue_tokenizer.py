@@ -0,0 +1,83 @@
+import sqlite3
+import time
+import tracemalloc
+import argparse
+from pathlib import Path
+from pdf_page_cache import extract_page_texts, iter_page_texts
+from catalogue_tokenizer import (PATTERN_FULL, PATTERN_NO_TAXES, PATTERN_ALT, CHAPTER_PATTERN,
+                                 PRIORITY, CatalogueTokenizer, catalogue_row)
+
+def findall_catalogue(conn, pdf_path):
+    """
+    The previous extraction: all pages joined into one string, then one
+    re.findall pass per code format and one for the chapter headers.
+    """
+    full_text = '\n'.join(extract_page_texts(conn, pdf_path, verbose=False))
+    catalogue_data = []
+    seen_codes = set()
+    for pattern in (PATTERN_FULL, PATTERN_NO_TAXES, PATTERN_ALT):
+        for match in pattern.findall(full_text):
+            code_str = match[0]
+            if pattern is PATTERN_ALT:
+                # Pad to 4 digits at start
+                code_str = code_str.split('.')[0].zfill(4) + '.' + '.'.join(code_str.split('.')[1:])
+            cod_inciso = int(code_str.replace('.', ''))
+            if cod_inciso and cod_inciso not in seen_codes:
+                catalogue_data.append(catalogue_row(cod_inciso, code_str, *match[1:]))
+                seen_codes.add(cod_inciso)
+    chapter_names = {int(ch): name.strip() for ch, name in CHAPTER_PATTERN.findall(full_text)}
+    return catalogue_data, chapter_names
+
+def tokenizer_catalogue(conn, pdf_path):
+    """Pages streamed from the page cache into the single-pass tokenizer."""
+    tokenizer = CatalogueTokenizer()
+    for text in iter_page_texts(conn, pdf_path, verbose=False):
+        tokenizer.feed(text)
+    return tokenizer.close()
+
+def measure(extract, conn, pdf_path, repeats):
+    """(best seconds, peak traced MB, result) of extract(conn, pdf_path)."""
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = extract(conn, pdf_path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    extract(conn, pdf_path)
+    peak = tracemalloc.get_traced_memory()[1] / (1024**2)
+    tracemalloc.stop()
+    return best, peak, result
+
+def benchmark_catalogue_tokenizer(repeats=5):
+    """
+    Compare the findall extraction of catalogo_arancel with the streaming
+    tokenizer on the cached pages of data/docs/arancel_2025.pdf.
+    """
+    pdf_path = Path("data/docs/arancel_2025.pdf")
+    db_path = Path("data/imports/merged/merged_data.db")
+    conn = sqlite3.connect(db_path)
+
+    print("CATALOGUE TOKENIZER BENCHMARK")
+    print("=" * 100)
+    # Fill the page cache first so both runs read the same cached pages
+    extract_page_texts(conn, pdf_path)
+
+    results = {}
+    print(f"\n{'Extraction':28s} {'Time':>10s} {'Peak memory':>12s} {'Codes':>8s} {'Chapters':>9s}")
+    for label, extract in (("findall over joined text", findall_catalogue),
+                           ("streaming tokenizer", tokenizer_catalogue)):
+        elapsed, peak, (rows, chapter_names) = measure(extract, conn, pdf_path, repeats)
+        results[label] = (rows, chapter_names)
+        print(f"{label:28s} {elapsed * 1000:8.0f}ms {peak:9.1f} MB {len(rows):8,} {len(chapter_names):9,}")
+
+    before, after = results.values()
+    print(f"\nSame catalogue rows and chapter names: {before == after}")
+    print(f"Format priority: {', '.join(PRIORITY)}")
+    conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the streaming catalogue tokenizer against findall passes")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    benchmark_catalogue_tokenizer(args.repeats)
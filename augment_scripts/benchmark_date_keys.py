@@ -0,0 +1,122 @@
+import sqlite3
+import tempfile
+import time
+import argparse
+from pathlib import Path
+from benchmark_typed_schema import synthetic_rows, time_query, same_rows
+from canonical_schema import fecha_key, date_keys
+
+BATCH_SIZE = 10000
+
+PRODUCTS = {
+    60311000000: 'Rosas',
+    60312000000: 'Claveles',
+    60319990000: 'Flores Frescas - Otras Variedades',
+}
+
+# Monthly trend queries of the Streamlit app: strftime() on the text date
+# before, the stored yyyymm key after
+MONTHLY_SELECT = """
+    SUM(CANTIDAD) AS volume,
+    SUM(PRECIO_UNIDAD * CANTIDAD) / NULLIF(SUM(CANTIDAD), 0) AS weighted_avg_price,
+    SUM(TOTAL_A_PAGAR) AS total_value,
+    COUNT(*) AS shipments
+FROM flowers_greens_fact
+"""
+
+def monthly_queries(product_filter):
+    before = (f"SELECT strftime('%Y-%m', FECHA_IMPORTACION_EXPORTACION) AS month, {MONTHLY_SELECT}"
+              f"WHERE {product_filter}FECHA_IMPORTACION_EXPORTACION IS NOT NULL "
+              f"GROUP BY month ORDER BY month")
+    after = (f"SELECT printf('%04d-%02d', yyyymm / 100, yyyymm % 100) AS month, {MONTHLY_SELECT}"
+             f"WHERE {product_filter}yyyymm IS NOT NULL "
+             f"GROUP BY yyyymm ORDER BY yyyymm")
+    return before, after
+
+QUERIES = {
+    'Historical Trends (all)': monthly_queries(""),
+    'Historical Trends (one)': monthly_queries("producto_normalizado = 'Claveles' AND "),
+    'Roses monthly trends': monthly_queries("producto_normalizado = 'Rosas' AND "),
+    'Shipments in 2023': (
+        "SELECT COUNT(*), SUM(TOTAL_A_PAGAR) FROM flowers_greens_fact "
+        "WHERE strftime('%Y', FECHA_IMPORTACION_EXPORTACION) = '2023'",
+        "SELECT COUNT(*), SUM(TOTAL_A_PAGAR) FROM flowers_greens_fact "
+        "WHERE yyyymm BETWEEN 202301 AND 202312",
+    ),
+}
+
+def build_database(path, rows, date_key_indexes):
+    """flowers_greens_fact-like table; with date_key_indexes, the covering yyyymm indexes too."""
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE flowers_greens_fact (
+            FECHA_IMPORTACION_EXPORTACION TEXT,
+            IMPORTADOR_EXPORTADOR TEXT,
+            COD_INCISO INTEGER,
+            PRECIO_UNIDAD REAL,
+            CANTIDAD REAL,
+            TOTAL_A_PAGAR REAL,
+            tipo_producto TEXT,
+            producto_normalizado TEXT,
+            year INTEGER,
+            yyyymm INTEGER,
+            day_number INTEGER
+        ) STRICT
+    """)
+    batch = []
+    for row in synthetic_rows(rows):
+        code = int(row['COD_INCISO'])
+        keys = date_keys(fecha_key(row['FECHA_IMPORTACION_EXPORTACION']))
+        product = PRODUCTS.get(code, 'Otros')
+        batch.append((row['FECHA_IMPORTACION_EXPORTACION'], row['IMPORTADOR_EXPORTADOR'], code,
+                      row['PRECIO_UNIDAD'], float(row['CANTIDAD']), row['TOTAL_A_PAGAR'],
+                      product, product, keys['year'], keys['yyyymm'], keys['day_number']))
+        if len(batch) >= BATCH_SIZE:
+            conn.executemany("INSERT INTO flowers_greens_fact VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+            batch = []
+    if batch:
+        conn.executemany("INSERT INTO flowers_greens_fact VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+
+    conn.execute("CREATE INDEX idx_fg_fecha ON flowers_greens_fact(FECHA_IMPORTACION_EXPORTACION)")
+    if date_key_indexes:
+        conn.execute("CREATE INDEX idx_fg_yyyymm ON flowers_greens_fact"
+                     "(yyyymm, CANTIDAD, PRECIO_UNIDAD, TOTAL_A_PAGAR)")
+        conn.execute("CREATE INDEX idx_fg_producto_yyyymm ON flowers_greens_fact"
+                     "(producto_normalizado, yyyymm, CANTIDAD, PRECIO_UNIDAD, TOTAL_A_PAGAR)")
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+def benchmark_date_keys(rows=1_000_000):
+    """
+    Compare the monthly dashboard queries grouped on strftime() of the text
+    date with the same queries grouped on the stored yyyymm key and its
+    covering indexes.
+    """
+    print("DATE KEY BENCHMARK")
+    print("=" * 100)
+    print(f"Rows: {rows:,}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        before_db = Path(tmp) / "strftime.db"
+        after_db = Path(tmp) / "date_keys.db"
+
+        for label, path, indexed in (("strftime() layout", before_db, False),
+                                     ("Date key layout", after_db, True)):
+            start = time.perf_counter()
+            build_database(path, rows, indexed)
+            print(f"  Built {label} in {time.perf_counter() - start:.1f}s: "
+                  f"{path.stat().st_size / (1024**2):,.1f} MB")
+
+        print(f"\n{'Query':26s} {'strftime':>10s} {'yyyymm':>10s} {'Speedup':>8s}  Same rows")
+        for name, (before_sql, after_sql) in QUERIES.items():
+            before_time, before_result = time_query(before_db, before_sql)
+            after_time, after_result = time_query(after_db, after_sql)
+            print(f"{name:26s} {before_time * 1000:8.0f}ms {after_time * 1000:8.0f}ms "
+                  f"{before_time / after_time:7.1f}x  {same_rows(before_result, after_result)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark stored date keys against strftime() grouping")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+    benchmark_date_keys(args.rows)
@@ -0,0 +1,125 @@
+import sqlite3
+import tempfile
+import time
+import argparse
+from pathlib import Path
+from benchmark_typed_schema import synthetic_rows, time_query
+from canonical_schema import CANONICAL_COLUMNS, table_ddl, coerce_value, column_type, fact_columns
+from star_schema import ensure_dimensions, create_presentation_view, DimensionEncoder
+
+BATCH_SIZE = 10000
+
+# Tariff descriptions are long and repeat on every row of the same code
+DESCRIPTIONS = {
+    60311: "- - Rosas frescas cortadas para ramos o adornos",
+    60312: "- - Claveles frescos cortados para ramos o adornos",
+    60319: "- - - Las demás flores y capullos frescos, cortados para ramos o adornos",
+    70200: "Tomates frescos o refrigerados.",
+    80390: "Los demás bananas o plátanos, frescos o secos.",
+    100630: "Arroz semiblanqueado o blanqueado, incluso pulido o glaseado",
+    847130: "Máquinas automáticas para tratamiento o procesamiento de datos, portátiles",
+    300490: "Los demás medicamentos constituidos por productos mezclados o sin mezclar",
+    220300: "Cerveza de malta.",
+    870323: "Los demás vehículos con motor de émbolo alternativo de encendido por chispa",
+}
+
+QUERIES = {
+    'Top importers': (
+        "SELECT IMPORTADOR_EXPORTADOR, SUM(CANTIDAD) AS q FROM merged_imports "
+        "GROUP BY IMPORTADOR_EXPORTADOR ORDER BY q DESC LIMIT 10",
+        "SELECT d.value, t.q FROM (SELECT IMPORTADOR_EXPORTADOR_ID AS id, SUM(CANTIDAD) AS q "
+        "FROM merged_imports_fact GROUP BY IMPORTADOR_EXPORTADOR_ID ORDER BY q DESC LIMIT 10) t "
+        "JOIN dim_importador d ON d.id = t.id ORDER BY t.q DESC",
+    ),
+    'Totals by country': (
+        "SELECT PAIS_DE_PROCEDENCIA_DESTINO, SUM(TOTAL_A_PAGAR) FROM merged_imports "
+        "GROUP BY PAIS_DE_PROCEDENCIA_DESTINO ORDER BY 1",
+        "SELECT d.value, t.total FROM (SELECT PAIS_DE_PROCEDENCIA_DESTINO_ID AS id, "
+        "SUM(TOTAL_A_PAGAR) AS total FROM merged_imports_fact GROUP BY PAIS_DE_PROCEDENCIA_DESTINO_ID) t "
+        "JOIN dim_pais d ON d.id = t.id ORDER BY 1",
+    ),
+    'Rows per description': (
+        "SELECT DESCRIPCIÓN, COUNT(*) FROM merged_imports GROUP BY DESCRIPCIÓN ORDER BY 1",
+        "SELECT d.value, t.n FROM (SELECT DESCRIPCIÓN_ID AS id, COUNT(*) AS n "
+        "FROM merged_imports_fact GROUP BY DESCRIPCIÓN_ID) t "
+        "JOIN dim_descripcion d ON d.id = t.id ORDER BY 1",
+    ),
+    'Monthly totals': (
+        "SELECT FECHA_KEY / 100 AS m, SUM(CANTIDAD) FROM merged_imports GROUP BY m",
+        "SELECT FECHA_KEY / 100 AS m, SUM(CANTIDAD) FROM merged_imports_fact GROUP BY m",
+    ),
+}
+
+def typed_batches(rows, columns):
+    batch = []
+    for row in synthetic_rows(rows):
+        row['DESCRIPCIÓN'] = DESCRIPTIONS[row['COD_SUBPARTIDA']]
+        row['FECHA_KEY'] = int(row['FECHA_IMPORTACION_EXPORTACION'][:10].replace('-', ''))
+        batch.append(tuple(coerce_value(row.get(col), column_type(col))[0] for col in columns))
+        if len(batch) >= BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def build_database(path, rows, star):
+    """Flat STRICT merged_imports table, or fact + dimension tables behind a merged_imports view."""
+    columns = [c for c in CANONICAL_COLUMNS if c != 'ROW_HASH']
+    conn = sqlite3.connect(path)
+    if star:
+        ensure_dimensions(conn)
+        stored_columns = fact_columns(columns)
+        table_name = 'merged_imports_fact'
+        encoder = DimensionEncoder(conn, columns)
+    else:
+        stored_columns = columns
+        table_name = 'merged_imports'
+        encoder = None
+    conn.execute(table_ddl(table_name, stored_columns))
+    insert_sql = f"INSERT INTO {table_name} VALUES ({', '.join('?' for _ in stored_columns)})"
+    for batch in typed_batches(rows, columns):
+        conn.executemany(insert_sql, encoder.encode(batch) if encoder else batch)
+    if star:
+        create_presentation_view(conn, 'merged_imports', table_name)
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+
+def benchmark_star_schema(rows=2_000_000):
+    """
+    Compare the flat merged_imports table with the star-schema layout: database
+    size, dashboard-style GROUP BY queries through the view, and the same
+    queries grouped on the integer keys of the fact table. Speedups are
+    against the flat table: the view looks a value up on every row, so it
+    can be slower than flat, grouping on the keys should not be.
+    """
+    print("STAR SCHEMA BENCHMARK")
+    print("=" * 100)
+    print(f"Rows: {rows:,}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        flat_db = Path(tmp) / "flat.db"
+        star_db = Path(tmp) / "star.db"
+
+        for label, path, star in (("Flat table", flat_db, False), ("Star schema", star_db, True)):
+            start = time.perf_counter()
+            build_database(path, rows, star)
+            print(f"  Built {label} in {time.perf_counter() - start:.1f}s: "
+                  f"{path.stat().st_size / (1024**2):,.1f} MB")
+
+        print(f"\n{'Query':24s} {'Flat':>10s} {'Star view':>10s} {'Star keys':>10s} "
+              f"{'View/flat':>10s} {'Keys/flat':>10s}  Same rows")
+        for name, (view_sql, fact_sql) in QUERIES.items():
+            flat_time, flat_result = time_query(flat_db, view_sql)
+            view_time, view_result = time_query(star_db, view_sql)
+            fact_time, fact_result = time_query(star_db, fact_sql)
+            same = sorted(flat_result) == sorted(view_result) == sorted(fact_result)
+            print(f"{name:24s} {flat_time * 1000:8.0f}ms {view_time * 1000:8.0f}ms "
+                  f"{fact_time * 1000:8.0f}ms {flat_time / view_time:9.2f}x "
+                  f"{flat_time / fact_time:9.2f}x  {same}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the star-schema layout against a flat table")
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    args = parser.parse_args()
+    benchmark_star_schema(args.rows)
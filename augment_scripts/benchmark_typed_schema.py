@@ -0,0 +1,165 @@
+import sqlite3
+import random
+import tempfile
+import time
+import argparse
+import math
+from pathlib import Path
+from canonical_schema import CANONICAL_COLUMNS, table_ddl, coerce_value, column_type, fecha_key
+
+def synthetic_rows(n, seed=42):
+    """
+    Rows as pandas used to store them: codes and quantities sometimes arrive
+    as text (zero-padded codes, '12' quantities), dates as text.
+    """
+    rng = random.Random(seed)
+    codes = [60311000000, 60312000000, 60319990000, 70200000000, 80390000000,
+             100630000000, 847130000000, 300490000000, 220300000000, 870323000000]
+    importers = [f"IMPORTADORA {i}, S.A." for i in range(500)]
+    countries = ['COLOMBIA', 'ECUADOR', 'CHINA', 'ESTADOS UNIDOS', 'COSTA RICA', 'MEXICO']
+    for i in range(n):
+        code = rng.choice(codes)
+        padded = str(code).zfill(12)
+        cantidad = rng.choice([1, 10, 25, 100, 250.5, 1000])
+        total = round(rng.random() * 5000, 2)
+        fecha = f"{rng.randint(2020, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 00:00:00"
+        yield {
+            'FECHA_IMPORTACION_EXPORTACION': fecha,
+            'IMPORTADOR_EXPORTADOR': rng.choice(importers),
+            'PAIS_DE_PROCEDENCIA_DESTINO': rng.choice(countries),
+            'COD_INCISO': padded if i % 7 == 0 else code,
+            'COD_CAPITULO': int(padded[:2]),
+            'COD_PARTIDA': int(padded[:4]),
+            'COD_SUBPARTIDA': int(padded[:6]),
+            'CATEGORIA': 'CATEGORIA',
+            'DESCRIPCIÓN': 'Descripción del producto',
+            'PUNTO_ENTRADA_PAIS': 'TOCUMEN',
+            'PRECIO_UNIDAD': total / cantidad,
+            'CANTIDAD': str(cantidad) if i % 11 == 0 else cantidad,
+            'UNIDAD': 'U',
+            'PESO_NETO': rng.random() * 100,
+            'PESO_BRUTO': rng.random() * 120,
+            'VALOR_FOB': total * 0.8,
+            'VALOR_FLETE': total * 0.1,
+            'VALOR_SEGURO': 1.0,
+            'VALOR_CIF': total * 0.9,
+            'IMPUESTO_IMPORTACION': total * 0.05,
+            'ITBMS': total * 0.07,
+            'IMP_PROTECCION_PETROLEO': 0.0,
+            'IMPUESTOS_ISC': 0.0,
+            'TOTAL_A_PAGAR': total,
+            'MODO_TRANSPORTE': 'AEREO',
+            'source_file': f"IMP_{2020 + i % 6}_{1 + i % 2}.xlsx",
+        }
+
+def build_database(path, n, typed):
+    conn = sqlite3.connect(path)
+    columns = [c for c in CANONICAL_COLUMNS if c != 'ROW_HASH' and (typed or c != 'FECHA_KEY')]
+    if typed:
+        conn.execute(table_ddl('merged_imports', columns))
+    else:
+        conn.execute(f"CREATE TABLE merged_imports ({', '.join(repr(c) for c in columns)})")
+
+    placeholders = ', '.join('?' for _ in columns)
+    batch = []
+    for row in synthetic_rows(n):
+        if typed:
+            values = [coerce_value(row.get(col), column_type(col))[0] for col in columns]
+            values[columns.index('FECHA_KEY')] = fecha_key(row['FECHA_IMPORTACION_EXPORTACION'])
+        else:
+            values = [row.get(col) for col in columns]
+        batch.append(values)
+        if len(batch) >= 50000:
+            conn.executemany(f"INSERT INTO merged_imports VALUES ({placeholders})", batch)
+            batch = []
+    if batch:
+        conn.executemany(f"INSERT INTO merged_imports VALUES ({placeholders})", batch)
+
+    conn.execute("CREATE INDEX idx_mi_inciso ON merged_imports(COD_INCISO)")
+    conn.execute("CREATE TABLE catalogo_arancel (COD_INCISO INTEGER, DESCRIPCIÓN TEXT)")
+    conn.executemany("INSERT INTO catalogo_arancel VALUES (?, ?)",
+                     [(60311000000, 'Rosas'), (60312000000, 'Claveles'), (70200000000, 'Tomates')])
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+
+# (untyped, typed) versions of each query return the same rows: the untyped
+# ones cast the text-stored codes and dates themselves
+QUERIES = {
+    'Totals by chapter': (
+        "SELECT COD_CAPITULO, SUM(CANTIDAD), SUM(TOTAL_A_PAGAR) FROM merged_imports GROUP BY COD_CAPITULO",
+        "SELECT COD_CAPITULO, SUM(CANTIDAD), SUM(TOTAL_A_PAGAR) FROM merged_imports GROUP BY COD_CAPITULO",
+    ),
+    'Monthly totals': (
+        "SELECT CAST(strftime('%Y%m', FECHA_IMPORTACION_EXPORTACION) AS INTEGER) AS m, SUM(CANTIDAD) "
+        "FROM merged_imports GROUP BY m",
+        "SELECT FECHA_KEY / 100 AS m, SUM(CANTIDAD) FROM merged_imports GROUP BY m",
+    ),
+    'Chapter 6 by code prefix': (
+        "SELECT COUNT(*) FROM merged_imports WHERE CAST(COD_INCISO AS INTEGER) BETWEEN 60000000000 AND 69999999999",
+        "SELECT COUNT(*) FROM merged_imports WHERE COD_INCISO BETWEEN 60000000000 AND 69999999999",
+    ),
+    'Join to catalogue': (
+        "SELECT c.DESCRIPCIÓN, SUM(i.CANTIDAD) FROM catalogo_arancel c "
+        "JOIN merged_imports i ON CAST(i.COD_INCISO AS INTEGER) = c.COD_INCISO GROUP BY c.DESCRIPCIÓN",
+        "SELECT c.DESCRIPCIÓN, SUM(i.CANTIDAD) FROM catalogo_arancel c "
+        "JOIN merged_imports i ON i.COD_INCISO = c.COD_INCISO GROUP BY c.DESCRIPCIÓN",
+    ),
+}
+
+def time_query(path, sql, repeats=3):
+    conn = sqlite3.connect(path)
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = conn.execute(sql).fetchall()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    conn.close()
+    return best, result
+
+def same_rows(left, right):
+    """Row-by-row equality; sums may differ in the last bits when rows are added in another order."""
+    if len(left) != len(right):
+        return False
+    return all(
+        len(a) == len(b) and all(
+            math.isclose(x, y, rel_tol=1e-9) if isinstance(x, float) or isinstance(y, float) else x == y
+            for x, y in zip(a, b)
+        )
+        for a, b in zip(left, right)
+    )
+
+def benchmark_typed_schema(rows=2_000_000):
+    """
+    Compare an untyped, pandas-style merged_imports with the STRICT typed layout:
+    database size and timings of typical aggregate and join queries.
+    """
+    print("TYPED SCHEMA BENCHMARK")
+    print("=" * 100)
+    print(f"Rows: {rows:,}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_db = Path(tmp) / "legacy.db"
+        typed_db = Path(tmp) / "typed.db"
+
+        for label, path, typed in (("Untyped (pandas-inferred)", legacy_db, False),
+                                   ("Typed STRICT", typed_db, True)):
+            start = time.perf_counter()
+            build_database(path, rows, typed)
+            print(f"  Built {label} in {time.perf_counter() - start:.1f}s: "
+                  f"{path.stat().st_size / (1024**2):,.1f} MB")
+
+        print(f"\n{'Query':30s} {'Untyped':>10s} {'Typed':>10s} {'Speedup':>8s}  Same rows")
+        for name, (legacy_sql, typed_sql) in QUERIES.items():
+            legacy_time, legacy_result = time_query(legacy_db, legacy_sql)
+            typed_time, typed_result = time_query(typed_db, typed_sql)
+            speedup = legacy_time / typed_time if typed_time else float('inf')
+            print(f"{name:30s} {legacy_time * 1000:8.0f}ms {typed_time * 1000:8.0f}ms "
+                  f"{speedup:7.1f}x  {same_rows(sorted(legacy_result), sorted(typed_result))}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the typed merged_imports schema")
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    args = parser.parse_args()
+    benchmark_typed_schema(args.rows)
@@ -0,0 +1,111 @@
+import time
+
+# Settings for write-heavy stages. WAL keeps the database intact if the
+# process dies mid-load; synchronous=OFF only gives up durability on an OS
+# crash or power loss, which a re-run of the load recovers from.
+FAST_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'OFF',
+    'cache_size': -262144,      # 256 MB page cache
+    'temp_store': 'MEMORY',
+}
+
+# synchronous level restored after a load is at least FULL
+SAFE_SYNCHRONOUS = 2
+
+COMMIT_ROWS = 500_000
+
+def secondary_indexes(conn, table_name):
+    """(name, sql) of the explicitly created, non-unique indexes on a table."""
+    rows = conn.execute("""
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL
+    """, (table_name,)).fetchall()
+    unique = {row[1] for row in conn.execute(f'PRAGMA index_list("{table_name}")') if row[2]}
+    return [(name, sql) for name, sql in rows if name not in unique]
+
+class BulkLoadSession:
+    """
+    Context manager for write-heavy ETL stages.
+
+    On entry: switches to FAST_PRAGMAS and (with defer_indexes) drops the
+    non-unique secondary indexes of `tables`. Inside: call rows_written(n)
+    after each insert so the session commits every commit_rows rows, and
+    defer_index(sql) to have indexes built once the data is in.
+    On exit: commits, rebuilds dropped and deferred indexes, checkpoints the
+    WAL and restores the previous settings (synchronous at least FULL).
+    Unique indexes are never dropped, so INSERT OR IGNORE deduplication keeps
+    working during the load.
+
+        with BulkLoadSession(conn, ['merged_imports']) as session:
+            for batch in batches:
+                conn.executemany(sql, batch)
+                session.rows_written(len(batch))
+    """
+
+    def __init__(self, conn, tables=(), defer_indexes=True, commit_rows=COMMIT_ROWS,
+                 pragmas=None, verbose=True):
+        self.conn = conn
+        self.tables = list(tables)
+        self.defer_indexes = defer_indexes
+        self.commit_rows = commit_rows
+        self.pragmas = dict(FAST_PRAGMAS, **(pragmas or {}))
+        self.verbose = verbose
+        self.saved_pragmas = {}
+        self.pending_indexes = []
+        self.uncommitted = 0
+        self.total_rows = 0
+
+    def log(self, message):
+        if self.verbose:
+            print(message)
+
+    def __enter__(self):
+        self.conn.commit()
+        for name in self.pragmas:
+            self.saved_pragmas[name] = self.conn.execute(f"PRAGMA {name}").fetchone()[0]
+        for name, value in self.pragmas.items():
+            self.conn.execute(f"PRAGMA {name} = {value}")
+
+        if self.defer_indexes:
+            for table_name in self.tables:
+                for index_name, sql in secondary_indexes(self.conn, table_name):
+                    self.log(f"  Deferring index {index_name}")
+                    self.conn.execute(f'DROP INDEX "{index_name}"')
+                    self.pending_indexes.append(sql)
+            self.conn.commit()
+        return self
+
+    def rows_written(self, count):
+        """Count inserted rows and commit once commit_rows have accumulated."""
+        self.uncommitted += count
+        self.total_rows += count
+        if self.commit_rows and self.uncommitted >= self.commit_rows:
+            self.conn.commit()
+            self.uncommitted = 0
+
+    def defer_index(self, sql):
+        """Queue a CREATE INDEX statement to run when the session ends."""
+        self.pending_indexes.append(sql)
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.commit()
+        else:
+            self.conn.rollback()
+
+        # Indexes are rebuilt even after a failure so tables are never left without them
+        if self.pending_indexes:
+            start = time.perf_counter()
+            for sql in self.pending_indexes:
+                self.conn.execute(sql)
+            self.conn.commit()
+            self.log(f"  Built {len(self.pending_indexes)} indexes in {time.perf_counter() - start:.1f}s")
+            self.pending_indexes = []
+
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        for name, value in self.saved_pragmas.items():
+            if name == 'synchronous':
+                value = max(value, SAFE_SYNCHRONOUS)
+            self.conn.execute(f"PRAGMA {name} = {value}")
+        return False
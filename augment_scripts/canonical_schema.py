@@ -0,0 +1,282 @@
+import re
+import hashlib
+from datetime import datetime, date
+from reorder_columns import new_column_order
+from scan_xlsx_headers import drift_key
+
+def ratio(numerator, denominator):
+    """numerator / denominator as REAL; NULL when either is NULL or the denominator is 0."""
+    return f'CAST("{numerator}" AS REAL) / NULLIF("{denominator}", 0)'
+
+# Derived metric columns: name -> (SQL expression over the other columns of a
+# row, description). This is their only definition: the merge evaluates the
+# expressions in the INSERT that writes each row, and derived_metrics.py
+# recomputes the stored columns of a table when an expression changes.
+METRICS = {
+    'PRECIO_UNIDAD': (ratio('TOTAL_A_PAGAR', 'CANTIDAD'), 'Total paid per unit'),
+    'TASA_IMPUESTO': (ratio('IMPUESTO_IMPORTACION', 'VALOR_CIF'), 'Effective import tax rate on CIF'),
+    'PARTICIPACION_FLETE': (ratio('VALOR_FLETE', 'VALOR_CIF'), 'Freight share of CIF'),
+    'PRECIO_KG': (ratio('TOTAL_A_PAGAR', 'PESO_NETO'), 'Total paid per kg of net weight'),
+    'CIF_UNIDAD': (ratio('VALOR_CIF', 'CANTIDAD'), 'CIF value per unit'),
+}
+
+# Target layout of merged_imports, applied while rows stream in so that
+# add_precio_unidad.py and reorder_columns.py no longer rewrite the table.
+# FECHA_KEY (YYYYMMDD integer), ROW_HASH, the integer date keys and the
+# metrics not among the presentation columns are appended after them.
+DATE_KEY_COLUMNS = ['year', 'yyyymm', 'day_number']
+CANONICAL_COLUMNS = (list(new_column_order) + ['FECHA_KEY', 'ROW_HASH'] + DATE_KEY_COLUMNS
+                     + [name for name in METRICS if name not in new_column_order])
+
+# Declared types of the STRICT merged_imports table. Values are coerced to
+# these while loading instead of letting pandas guess per file.
+COLUMN_TYPES = {
+    'FECHA_IMPORTACION_EXPORTACION': 'TEXT',
+    'IMPORTADOR_EXPORTADOR': 'TEXT',
+    'PAIS_DE_PROCEDENCIA_DESTINO': 'TEXT',
+    'COD_INCISO': 'INTEGER',
+    'COD_CAPITULO': 'INTEGER',
+    'COD_PARTIDA': 'INTEGER',
+    'COD_SUBPARTIDA': 'INTEGER',
+    'CATEGORIA': 'TEXT',
+    'DESCRIPCIÓN': 'TEXT',
+    'PUNTO_ENTRADA_PAIS': 'TEXT',
+    'PRECIO_UNIDAD': 'REAL',
+    'CANTIDAD': 'REAL',
+    'UNIDAD': 'TEXT',
+    'PESO_NETO': 'REAL',
+    'PESO_BRUTO': 'REAL',
+    'VALOR_FOB': 'REAL',
+    'VALOR_FLETE': 'REAL',
+    'VALOR_SEGURO': 'REAL',
+    'VALOR_CIF': 'REAL',
+    'IMPUESTO_IMPORTACION': 'REAL',
+    'ITBMS': 'REAL',
+    'IMP_PROTECCION_PETROLEO': 'REAL',
+    'IMPUESTOS_ISC': 'REAL',
+    'TOTAL_A_PAGAR': 'REAL',
+    'MODO_TRANSPORTE': 'TEXT',
+    'source_file': 'TEXT',
+    'FECHA_KEY': 'INTEGER',
+    'ROW_HASH': 'INTEGER',
+    'year': 'INTEGER',
+    'yyyymm': 'INTEGER',
+    'day_number': 'INTEGER',
+}
+
+# Columns that identify a shipment. Re-issued exports with overlapping date
+# ranges repeat rows with the same values here; ROW_HASH is a hash of them and
+# carries a UNIQUE constraint, so the repeats are rejected while loading.
+BUSINESS_KEY = [
+    'FECHA_IMPORTACION_EXPORTACION', 'IMPORTADOR_EXPORTADOR', 'PAIS_DE_PROCEDENCIA_DESTINO',
+    'COD_INCISO', 'CANTIDAD', 'PESO_NETO', 'VALOR_FOB', 'VALOR_FLETE', 'VALOR_SEGURO',
+    'VALOR_CIF', 'IMPUESTO_IMPORTACION', 'ITBMS', 'TOTAL_A_PAGAR',
+]
+
+UNIQUE_COLUMNS = {'ROW_HASH'}
+
+# Repeated text columns stored as integer keys into small dimension tables
+# (star schema, see star_schema.py). The fact table holds <column>_ID instead.
+DIMENSION_TABLES = {
+    'IMPORTADOR_EXPORTADOR': 'dim_importador',
+    'PAIS_DE_PROCEDENCIA_DESTINO': 'dim_pais',
+    'CATEGORIA': 'dim_categoria',
+    'DESCRIPCIÓN': 'dim_descripcion',
+    'PUNTO_ENTRADA_PAIS': 'dim_punto_entrada',
+    'MODO_TRANSPORTE': 'dim_modo_transporte',
+    'source_file': 'dim_source_file',
+}
+
+def id_column(column):
+    """Fact table column holding the dimension key: 'CATEGORIA' -> 'CATEGORIA_ID'."""
+    return f"{column}_ID" if column.isupper() else f"{column}_id"
+
+def fact_columns(columns):
+    """Columns of the fact table: dimensioned columns replaced by their key columns."""
+    return [id_column(col) if col in DIMENSION_TABLES else col for col in columns]
+
+COLUMN_TYPES.update({id_column(col): 'INTEGER' for col in DIMENSION_TABLES})
+COLUMN_TYPES.update({name: 'REAL' for name in METRICS})
+
+# Source spellings that map to a different canonical name
+COLUMN_RENAMES = {
+    'PAÍS_DE_PROCEDENCIA_DESTINO': 'PAIS_DE_PROCEDENCIA_DESTINO',
+}
+
+# Columns computed during ingest rather than read from the workbook. Metrics are
+# left NULL by the row mapper: the INSERT computes them from their METRICS expression.
+DERIVED_COLUMNS = {'source_file', 'FECHA_KEY', 'ROW_HASH'} | set(DATE_KEY_COLUMNS) | set(METRICS)
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+_CANONICAL_BY_KEY = {drift_key(col): col for col in CANONICAL_COLUMNS}
+
+def canonical_name(column):
+    """Map a workbook header to its merged_imports column name."""
+    if column in COLUMN_RENAMES:
+        return COLUMN_RENAMES[column]
+    return _CANONICAL_BY_KEY.get(drift_key(column), column)
+
+def canonical_columns(file_columns):
+    """
+    Output columns for a load: the canonical order, followed by any unknown
+    workbook columns (sorted) so no source data is dropped.
+    """
+    extras = set()
+    for columns in file_columns.values():
+        for column in columns:
+            name = canonical_name(column)
+            if name not in CANONICAL_COLUMNS:
+                extras.add(name)
+    return CANONICAL_COLUMNS + sorted(extras)
+
+def column_type(column):
+    """Declared type of a column; columns outside the canonical layout are ANY."""
+    return COLUMN_TYPES.get(column, 'ANY')
+
+def table_ddl(table_name, columns, temp=False):
+    """
+    CREATE TABLE statement for a STRICT table with the declared column types.
+    ROW_HASH is UNIQUE except in TEMP tables, which hold rows before deduplication.
+    """
+    column_defs = ', '.join(
+        f'"{col}" {column_type(col)}' + (' UNIQUE' if col in UNIQUE_COLUMNS and not temp else '')
+        for col in columns
+    )
+    kind = 'TEMP TABLE' if temp else 'TABLE'
+    return f'CREATE {kind} "{table_name}" ({column_defs}) STRICT'
+
+def is_canonical_table(conn, table_name, columns=CANONICAL_COLUMNS):
+    """True if the table starts with the canonical columns and their declared types."""
+    info = [(row[1], row[2]) for row in conn.execute(f'PRAGMA table_info("{table_name}")')]
+    expected = [(col, column_type(col)) for col in columns]
+    return info[:len(expected)] == expected
+
+def coerce_value(value, sql_type):
+    """
+    Convert a cell value to the declared type. Returns (value, ok); values that
+    cannot be represented (e.g. text in a numeric column) become None with ok=False.
+    """
+    if value is None or sql_type == 'ANY':
+        return value, True
+    if isinstance(value, str):
+        value = value.strip()
+        if value == '':
+            return None, True
+    try:
+        if sql_type == 'INTEGER':
+            if isinstance(value, float):
+                if not value.is_integer():
+                    return None, False
+                return int(value), True
+            if isinstance(value, str):
+                if re.fullmatch(r'\d+', value):
+                    return int(value), True
+                if re.fullmatch(r'\d{2,4}(\.\d{2})+', value):
+                    # Tariff code written with dots, e.g. '0603.11.00.00.00'
+                    return int(value.replace('.', '')), True
+                value = float(value)
+                if not value.is_integer():
+                    return None, False
+            return int(value), True
+        if sql_type == 'REAL':
+            return float(value), True
+    except (TypeError, ValueError):
+        return None, False
+    if isinstance(value, (datetime, date)):
+        return value.isoformat(sep=' ') if isinstance(value, datetime) else value.isoformat(), True
+    return str(value), True
+
+def fecha_key(value):
+    """YYYYMMDD integer for a date, datetime or 'YYYY-MM-DD...' string."""
+    if isinstance(value, (datetime, date)):
+        return value.year * 10000 + value.month * 100 + value.day
+    if isinstance(value, str) and len(value) >= 10 and value[4] == '-' and value[7] == '-':
+        try:
+            return int(value[0:4]) * 10000 + int(value[5:7]) * 100 + int(value[8:10])
+        except ValueError:
+            return None
+    return None
+
+def date_keys(key):
+    """
+    {'year', 'yyyymm', 'day_number'} for a YYYYMMDD FECHA_KEY. day_number counts
+    days since 1970-01-01, so date ranges and day differences are integer arithmetic.
+    """
+    if key is None:
+        return dict.fromkeys(DATE_KEY_COLUMNS)
+    try:
+        day_number = date(key // 10000, key // 100 % 100, key % 100).toordinal() - _EPOCH_ORDINAL
+    except ValueError:
+        day_number = None
+    return {'year': key // 10000, 'yyyymm': key // 100, 'day_number': day_number}
+
+def row_hash(values):
+    """
+    Signed 64-bit hash of the BUSINESS_KEY values of a row (already coerced to
+    their declared types), stored as an INTEGER so the unique index stays small.
+    """
+    text = '\x1f'.join('' if values.get(col) is None else repr(values.get(col))
+                        for col in BUSINESS_KEY)
+    digest = hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+def build_row_mapper(header, columns, source_file, convert=lambda v: v, rejected=None):
+    """
+    Return a function turning one raw worksheet row into a tuple in `columns` order.
+    Headers are renamed to canonical names, missing columns become None,
+    FECHA_KEY, ROW_HASH and the date keys are derived, the METRICS columns are
+    left NULL for the INSERT to compute and source_file is filled in.
+    `convert` is applied to every value read from the sheet, then
+    the value is coerced to the column's declared type. Values that fail coercion
+    are stored as NULL and counted per column in the optional `rejected` dict.
+    """
+    positions = {}
+    for idx, name in enumerate(header):
+        if name is not None:
+            positions.setdefault(canonical_name(name), idx)
+
+    plan = []
+    for col in columns:
+        if col == 'source_file':
+            plan.append(('const', source_file, None))
+        elif col in DERIVED_COLUMNS:
+            plan.append(('derived', col, None))
+        elif col in positions:
+            plan.append(('read', positions[col], column_type(col)))
+        else:
+            plan.append(('const', None, None))
+
+    def cell(row, idx, sql_type, col):
+        if idx is None or idx >= len(row):
+            return None
+        value, ok = coerce_value(convert(row[idx]), sql_type)
+        if not ok and rejected is not None:
+            rejected[col] = rejected.get(col, 0) + 1
+        return value
+
+    def map_row(row):
+        values = {}
+        out = []
+        for col, (kind, arg, sql_type) in zip(columns, plan):
+            if kind == 'read':
+                values[col] = cell(row, arg, sql_type, col)
+                out.append(values[col])
+            else:
+                out.append(arg)
+        key = fecha_key(values.get('FECHA_IMPORTACION_EXPORTACION'))
+        dates = date_keys(key)
+        for i, (kind, arg, _) in enumerate(plan):
+            if kind != 'derived':
+                continue
+            if arg in METRICS:
+                out[i] = None
+            elif arg == 'ROW_HASH':
+                out[i] = row_hash(values)
+            elif arg == 'FECHA_KEY':
+                out[i] = key
+            else:
+                out[i] = dates[arg]
+        return tuple(out)
+
+    return map_row
@@ -0,0 +1,261 @@
+import sqlite3
+import re
+import time
+import argparse
+import pandas as pd
+from datetime import date, datetime
+from pathlib import Path
+from chapter_page_index import alternate_code_chapters, extract_catalogue, extract_chapters, parse_chapters
+from pdf_page_cache import pdf_fingerprint
+from tariff_hierarchy import refresh_hierarchy_rows
+
+EDITIONS_TABLE = "catalogo_ediciones"
+CHANGES_TABLE = "catalogo_cambios"
+REENRICH_TABLE = "catalogo_reenriquecer"
+
+CATALOGUE_COLUMNS = ['COD_INCISO', 'COD_CAPITULO', 'COD_PARTIDA', 'COD_SUBPARTIDA', 'DESCRIPCIÓN',
+                     'DAI', 'ITBMS', 'ISC', 'ICCDP', 'CAPITULO_NOMBRE']
+
+# Validity of a catalogue row: the edition that last added or changed it, the
+# date it applies from and the date it stopped applying (NULL while in force)
+EDITION_COLUMNS = ['EDICION', 'VIGENTE_DESDE', 'VIGENTE_HASTA']
+
+# Values compared between editions
+DIFF_COLUMNS = ['DESCRIPCIÓN', 'DAI', 'ITBMS', 'ISC', 'ICCDP']
+
+def edition_label(pdf_path):
+    """Edition of an arancel PDF: the year in its name (arancel_2026.pdf -> '2026'), else the name."""
+    year = re.search(r'(19|20)\d\d', Path(pdf_path).stem)
+    return year.group(0) if year else Path(pdf_path).stem
+
+def default_valid_from(edition):
+    """1 January of a year edition, today otherwise."""
+    return f"{edition}-01-01" if re.fullmatch(r'\d{4}', edition) else date.today().isoformat()
+
+def add_edition_columns(conn):
+    """Add EDICION / VIGENTE_DESDE / VIGENTE_HASTA to a catalogo_arancel loaded without them."""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(catalogo_arancel)")}
+    for col in EDITION_COLUMNS:
+        if col not in existing:
+            conn.execute(f'ALTER TABLE catalogo_arancel ADD COLUMN "{col}" TEXT')
+    conn.commit()
+
+def ensure_edition_tables(conn):
+    """Create the edition load log, the per-code change log and the re-enrichment list."""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {EDITIONS_TABLE} (
+            id INTEGER PRIMARY KEY,
+            EDICION TEXT NOT NULL,
+            content_hash TEXT,
+            VIGENTE_DESDE TEXT NOT NULL,
+            CAPITULOS TEXT,
+            applied_at TEXT NOT NULL,
+            codes INTEGER NOT NULL,
+            added INTEGER NOT NULL,
+            removed INTEGER NOT NULL,
+            changed INTEGER NOT NULL
+        )
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CHANGES_TABLE} (
+            EDICION TEXT NOT NULL,
+            COD_INCISO INTEGER NOT NULL,
+            TIPO_CAMBIO TEXT NOT NULL,
+            COLUMNA TEXT,
+            VALOR_ANTERIOR,
+            VALOR_NUEVO
+        )
+    """)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_cambios_inciso ON {CHANGES_TABLE}(COD_INCISO)")
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {REENRICH_TABLE} (
+            COD_INCISO INTEGER PRIMARY KEY,
+            EDICION TEXT NOT NULL,
+            MOTIVO TEXT NOT NULL
+        )
+    """)
+    conn.commit()
+
+def record_edition(conn, edition, content_hash, valid_from, chapters, codes, added, removed, changed):
+    """Append a load of an edition (all chapters when chapters is None) to catalogo_ediciones."""
+    conn.execute(f"""
+        INSERT INTO {EDITIONS_TABLE} (EDICION, content_hash, VIGENTE_DESDE, CAPITULOS, applied_at,
+                                      codes, added, removed, changed)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (edition, content_hash, valid_from, ','.join(map(str, chapters)) if chapters else None,
+          datetime.now().isoformat(sep=' ', timespec='seconds'), codes, added, removed, changed))
+
+def catalogue_rows(rows, chapter_names):
+    """{COD_INCISO: row} of tokenizer rows, with their chapter names."""
+    return {row['COD_INCISO']: dict(row, CAPITULO_NOMBRE=chapter_names.get(row['COD_CAPITULO']))
+            for row in rows}
+
+def current_catalogue(conn, chapters=None):
+    """{COD_INCISO: row} of the catalogue codes in force, of the given chapters only if any."""
+    column_list = ', '.join(f'"{col}"' for col in CATALOGUE_COLUMNS)
+    query = f"SELECT {column_list} FROM catalogo_arancel WHERE VIGENTE_HASTA IS NULL"
+    params = []
+    if chapters:
+        query += f" AND COD_CAPITULO IN ({', '.join('?' for _ in chapters)})"
+        params = list(chapters)
+    return {row[0]: dict(zip(CATALOGUE_COLUMNS, row)) for row in conn.execute(query, params)}
+
+def diff_catalogue(current, new):
+    """
+    Per-code diff of two {COD_INCISO: row} catalogues: (added codes, removed
+    codes, {changed code: {column: (old value, new value)}}).
+    """
+    added = sorted(new.keys() - current.keys())
+    removed = sorted(current.keys() - new.keys())
+    changed = {}
+    for code in sorted(new.keys() & current.keys()):
+        columns = {col: (current[code][col], new[code][col])
+                   for col in DIFF_COLUMNS if current[code][col] != new[code][col]}
+        if columns:
+            changed[code] = columns
+    return added, removed, changed
+
+def apply_catalogue_diff(conn, edition, valid_from, new, current, diff):
+    """
+    Write only the diff to catalogo_arancel, in one transaction: added and
+    changed codes get the new values and edition, removed codes are kept with
+    VIGENTE_HASTA = valid_from (so older imports still resolve to them), and
+    every change is logged in catalogo_cambios. Chapter names are updated
+    where they differ. Returns the chapters renamed.
+    """
+    added, removed, changed = diff
+    expired = {row[0] for row in conn.execute(
+        "SELECT COD_INCISO FROM catalogo_arancel WHERE VIGENTE_HASTA IS NOT NULL")}
+    names = {row['COD_CAPITULO']: row['CAPITULO_NOMBRE'] for row in new.values()}
+    renamed = {row['COD_CAPITULO']: names[row['COD_CAPITULO']] for row in current.values()
+               if row['COD_CAPITULO'] in names and row['CAPITULO_NOMBRE'] != names[row['COD_CAPITULO']]}
+
+    columns = CATALOGUE_COLUMNS + EDITION_COLUMNS
+    column_list = ', '.join(f'"{col}"' for col in columns)
+    assignments = ', '.join(f'"{col}" = ?' for col in columns[1:])
+
+    def values(code):
+        return [new[code][col] for col in CATALOGUE_COLUMNS] + [edition, valid_from, None]
+
+    changes = ([(edition, code, 'alta', None, None, None) for code in added] +
+               [(edition, code, 'baja', None, None, None) for code in removed] +
+               [(edition, code, 'cambio', col, old, value)
+                for code, columns_changed in changed.items()
+                for col, (old, value) in columns_changed.items()])
+
+    conn.execute("BEGIN")
+    try:
+        conn.executemany(f"INSERT INTO catalogo_arancel ({column_list}) "
+                         f"VALUES ({', '.join('?' for _ in columns)})",
+                         [values(code) for code in added if code not in expired])
+        # Codes back in force and changed codes keep their row
+        conn.executemany(f"UPDATE catalogo_arancel SET {assignments} WHERE COD_INCISO = ?",
+                         [values(code)[1:] + [code] for code in added if code in expired] +
+                         [values(code)[1:] + [code] for code in changed])
+        conn.executemany("UPDATE catalogo_arancel SET VIGENTE_HASTA = ? WHERE COD_INCISO = ?",
+                         [(valid_from, code) for code in removed])
+        conn.executemany("UPDATE catalogo_arancel SET CAPITULO_NOMBRE = ? WHERE COD_CAPITULO = ?",
+                         [(name, chapter) for chapter, name in renamed.items()])
+        conn.executemany(f"INSERT INTO {CHANGES_TABLE} (EDICION, COD_INCISO, TIPO_CAMBIO, COLUMNA, "
+                         f"VALOR_ANTERIOR, VALOR_NUEVO) VALUES (?, ?, ?, ?, ?, ?)", changes)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return renamed
+
+def mark_reenrichment(conn, edition, added, changed):
+    """
+    Record in catalogo_reenriquecer the import codes whose enrichment the
+    update changed: codes whose catalogue values changed ('catálogo') and
+    codes that now resolve differently in catalogo_jerarquia ('jerarquía'),
+    e.g. an ancestor match that became exact or a renamed chapter. Only these
+    codes are re-resolved and rewritten. Returns {code: motive}.
+    """
+    motives = {code: 'jerarquía' for code in refresh_hierarchy_rows(conn, added)}
+    motives.update((code, 'catálogo') for code in changed)
+    conn.executemany(f"INSERT OR REPLACE INTO {REENRICH_TABLE} (COD_INCISO, EDICION, MOTIVO) "
+                     f"VALUES (?, ?, ?)", [(code, edition, motive) for code, motive in motives.items()])
+    conn.commit()
+    return motives
+
+def update_catalogue_edition(pdf_path, edition=None, valid_from=None, chapters=None, workers=None,
+                             use_cache=True):
+    """
+    Load an arancel edition into catalogo_arancel as a diff against the
+    codes in force (of the given chapters only, if any) and report the
+    flowers_greens rows that need re-enrichment.
+    """
+    db_path = Path("data/imports/merged/merged_data.db")
+    conn = sqlite3.connect(db_path)
+    edition = edition or edition_label(pdf_path)
+    valid_from = valid_from or default_valid_from(edition)
+
+    print("CATALOGUE EDITION UPDATE")
+    print("=" * 100)
+    print(f"Edition {edition} ({pdf_path.name}), in force from {valid_from}"
+          + (f", chapters {', '.join(map(str, chapters))}" if chapters else ""))
+    add_edition_columns(conn)
+    ensure_edition_tables(conn)
+
+    start = time.perf_counter()
+    if chapters:
+        rows, chapter_names = extract_chapters(conn, pdf_path, chapters, workers, use_cache)
+    else:
+        rows, chapter_names, _ = extract_catalogue(conn, pdf_path, workers, use_cache)
+    new = catalogue_rows(rows, chapter_names)
+    current = current_catalogue(conn, chapters)
+    if chapters:
+        # The alternate-format rows of these chapters are filed under chapter 0
+        origins = alternate_code_chapters(conn)
+        current.update((code, row) for code, row in current_catalogue(conn, [0]).items()
+                       if code in new or origins.get(code) in chapters)
+    print(f"  {len(new):,} codes extracted, {len(current):,} in force in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    added, removed, changed = diff = diff_catalogue(current, new)
+    renamed = apply_catalogue_diff(conn, edition, valid_from, new, current, diff)
+    record_edition(conn, edition, pdf_fingerprint(conn, pdf_path)[0], valid_from, chapters,
+                   len(new), len(added), len(removed), len(changed))
+    conn.commit()
+    print(f"  Diff applied in {time.perf_counter() - start:.2f}s: {len(added):,} added, "
+          f"{len(removed):,} removed, {len(changed):,} changed, {len(renamed)} chapters renamed")
+    for col in DIFF_COLUMNS:
+        count = sum(col in columns for columns in changed.values())
+        if count:
+            print(f"    {col}: {count:,} codes")
+
+    start = time.perf_counter()
+    motives = mark_reenrichment(conn, edition, added, changed)
+    print(f"  {len(motives):,} codes to re-enrich in {REENRICH_TABLE} ({time.perf_counter() - start:.2f}s)")
+
+    print("\nFLOWERS_GREENS ROWS TO RE-ENRICH:")
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'flowers_greens_fact'").fetchone():
+        print(pd.read_sql(f"""
+            SELECT r.EDICION AS edicion, r.MOTIVO AS motivo,
+                   COUNT(DISTINCT f.COD_INCISO) AS codes, COUNT(*) AS records
+            FROM flowers_greens_fact f
+            JOIN {REENRICH_TABLE} r ON r.COD_INCISO = f.COD_INCISO
+            GROUP BY r.EDICION, r.MOTIVO
+            ORDER BY r.EDICION, r.MOTIVO
+        """, conn).to_string(index=False))
+    else:
+        print("  flowers_greens not built yet")
+    conn.close()
+    return added, removed, changed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply a new arancel edition to catalogo_arancel as a diff")
+    parser.add_argument("--pdf", type=Path, default=Path("data/docs/arancel_2025.pdf"))
+    parser.add_argument("--edition", default=None, help="Edition label (default: the year in the PDF name)")
+    parser.add_argument("--valid-from", default=None,
+                        help="Date the edition applies from, YYYY-MM-DD (default: 1 January of its year)")
+    parser.add_argument("--chapters", default=None,
+                        help="Only update these chapters, e.g. 6-12 or 6,7,12 (default: all)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processes used to extract uncached pages (default: all cores)")
+    parser.add_argument("--no-cache", action="store_true", help="Extract the pages from the PDF again")
+    args = parser.parse_args()
+    update_catalogue_edition(args.pdf, args.edition, args.valid_from,
+                             parse_chapters(args.chapters) if args.chapters else None,
+                             args.workers, not args.no_cache)
@@ -0,0 +1,178 @@
+import re
+
+# Tariff line formats of arancel_2025.pdf, tried in this priority order: a code
+# found by an earlier format is not taken again from a later one.
+# 1: full format with all taxes   0603.11.00.00.00 - - Rosas 15 0 0 0
+# 2: code with description only (no taxes on the same line)
+# 3: alternative format with 2 digits at the start, padded to 4
+PATTERN_FULL = re.compile(r'(\d{4}\.\d{2}\.\d{2}\.\d{2}\.\d{2})\s+(.+?)\s+(\d+|II/\d+)\s+(\d+)\s+(\d+)\s+(\d+)')
+PATTERN_NO_TAXES = re.compile(r'(\d{4}\.\d{2}\.\d{2}\.\d{2}\.\d{2})\s+([A-Za-zÀ-ÿ\s\-\,\.\(\)]+?)(?=\n|\d{4}\.)')
+PATTERN_ALT = re.compile(r'(\d{2}\.\d{2}\.\d{2}\.\d{2}\.\d{2})\s+(.+?)\s+(\d+|II/\d+)\s+(\d+)\s+(\d+)\s+(\d+)')
+CHAPTER_PATTERN = re.compile(r'Capítulo\s+(\d+)\s*\n\s*(.+?)(?=\n|$)')
+
+# Every match of the patterns above starts at one of these: a dd.dd.dd.dd.dd
+# code (formats 1 and 2 start at the two digits before it) or a chapter header
+ANCHOR = re.compile(r'\d\d(?=\.\d\d\.\d\d\.\d\d\.\d\d)|Capítulo')
+
+# A match reads at most the line it starts on and the next 5 non-blank lines
+# (description line + 4 tax columns), so a position followed by that many
+# complete lines can be matched before the rest of the document is read
+LOOKAHEAD_LINES = 5
+
+def catalogue_row(cod_inciso, code_str, desc, dai=None, itbms=0, isc=0, iccdp=0):
+    """catalogo_arancel row of a tariff line whose code normalizes to cod_inciso."""
+    parts = code_str.split('.')
+    return {
+        'COD_INCISO': cod_inciso,
+        'COD_CAPITULO': int(parts[0][:2]),
+        'COD_PARTIDA': int(parts[0]),
+        'COD_SUBPARTIDA': int(parts[0] + parts[1]),
+        'DESCRIPCIÓN': desc.strip(),
+        'DAI': dai,
+        'ITBMS': float(itbms),
+        'ISC': float(isc),
+        'ICCDP': float(iccdp)
+    }
+
+# Code formats in priority order
+PRIORITY = {'full': 0, 'no_taxes': 1, 'alt': 2}
+
+class CatalogueTokenizer:
+    """
+    Single-pass, page-at-a-time reader of tariff lines and chapter headers.
+
+    Feed page texts in order; only the lines that may still belong to an
+    unfinished match are kept between pages. The result is what running
+    re.findall with each pattern over the '\\n'-joined document gives: every
+    pattern resumes after its previous match, and for every code the first
+    match of the highest-priority format wins.
+
+        tokenizer = CatalogueTokenizer()
+        for text in page_texts:
+            tokenizer.feed(text)
+        rows, chapter_names = tokenizer.close()
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.base = 0               # document offset of buffer[0]
+        self.scanned = 0            # document offset up to which anchors were matched
+        self.resume = {'full': 0, 'no_taxes': 0, 'alt': 0, 'chapter': 0}
+        self.matches = {'full': 0, 'no_taxes': 0, 'alt': 0, 'chapter': 0}   # per-pattern match counts
+        self.found = {'full': {}, 'no_taxes': {}, 'alt': {}}
+        self.best_priority = {}         # COD_INCISO -> best PRIORITY it was found with
+        self.line_chapters = {}         # COD_INCISO -> chapter of the tariff line its row was read from
+        self.chapter_names = {}
+        self.chapter = 0                # chapter of the last header read
+        self.pages = 0
+
+    def feed(self, text):
+        """Add the next page's text (pages are joined with '\\n')."""
+        if self.pages:
+            text = '\n' + text
+        self.pages += 1
+        self.buffer += text
+        self._scan(self._complete_before())
+
+    def close(self):
+        """Match what is left and return (rows in catalogue order, {chapter: name})."""
+        self._scan(None)
+        self.buffer = ''
+        rows = []
+        seen = set()
+        for kind in ('full', 'no_taxes', 'alt'):
+            for cod_inciso, row in self.found[kind].items():
+                if cod_inciso not in seen:
+                    rows.append(row)
+                    seen.add(cod_inciso)
+        return rows, self.chapter_names
+
+    def _complete_before(self):
+        """
+        Document offset before which every match attempt only reads text
+        already in the buffer: LOOKAHEAD_LINES complete non-blank lines follow.
+        """
+        end = len(self.buffer)
+        lines = 0
+        while True:
+            newline = self.buffer.rfind('\n', 0, end)
+            if newline < 0:
+                return self.base
+            if end > newline + 1 and self.buffer[newline + 1:end].strip():
+                # The last (page-final) piece has no '\n' yet and is not complete
+                if end < len(self.buffer):
+                    lines += 1
+                    if lines == LOOKAHEAD_LINES:
+                        return self.base + newline + 1
+            end = newline
+
+    def _scan(self, limit):
+        """Match the anchors before limit (None: up to the end of the document)."""
+        buffer = self.buffer
+        base = self.base
+        resume = self.resume
+        stop = len(buffer) if limit is None else limit - base
+        for anchor in ANCHOR.finditer(buffer, self.scanned - base):
+            pos = anchor.start()
+            if pos >= stop:
+                break
+            # A pattern is not tried inside its previous match, as findall would not
+            if buffer[pos] == 'C':
+                m = CHAPTER_PATTERN.match(buffer, pos)
+                if m and base + pos >= resume['chapter']:
+                    resume['chapter'] = base + m.end()
+                    self.matches['chapter'] += 1
+                    self.chapter = int(m.group(1))
+                    self.chapter_names[self.chapter] = m.group(2).strip()
+                continue
+            four_digits = pos >= 2 and buffer[pos - 2:pos].isdecimal()
+            if four_digits and base + pos - 2 >= resume['no_taxes']:
+                m = PATTERN_NO_TAXES.match(buffer, pos - 2)
+                if m:
+                    resume['no_taxes'] = base + m.end()
+                    self._add('no_taxes', m.group(1), m.groups()[1:], int(m.group(1)[:2]))
+            # Formats 1 and 3 only differ in the code: format 1 at the two digits
+            # before the anchor matches exactly when format 3 matches at it
+            m = PATTERN_ALT.match(buffer, pos)
+            if not m:
+                continue
+            fields = m.groups()[1:]
+            if four_digits and base + pos - 2 >= resume['full']:
+                resume['full'] = base + m.end()
+                self._add('full', buffer[pos - 2:pos] + m.group(1), fields, int(buffer[pos - 2:pos]))
+            if base + pos >= resume['alt']:
+                resume['alt'] = base + m.end()
+                # A format 3 code read inside a dddd code is on that code's line,
+                # any other one on a line of the chapter whose header came last
+                self._add('alt', '00' + m.group(1), fields,
+                          int(buffer[pos - 2:pos]) if four_digits else self.chapter)
+        self.scanned = base + stop
+        # Keep the buffer from the line the next scan starts on
+        cut = buffer.rfind('\n', 0, stop) + 1
+        if cut > 0:
+            self.buffer = buffer[cut:]
+            self.base += cut
+
+    def _add(self, kind, code_str, fields, line_chapter):
+        """
+        Keep the first match of a code, unless a higher-priority format already
+        has it. Format 3 codes come padded to 4 digits at the start.
+        """
+        self.matches[kind] += 1
+        # Codes matched by the patterns are only digits and dots
+        cod_inciso = int(code_str.replace('.', ''))
+        if not cod_inciso:
+            return
+        priority = PRIORITY[kind]
+        if self.best_priority.get(cod_inciso, priority + 1) <= priority:
+            return
+        self.best_priority[cod_inciso] = priority
+        self.found[kind][cod_inciso] = catalogue_row(cod_inciso, code_str, *fields)
+        self.line_chapters[cod_inciso] = line_chapter
+
+def tokenize_pages(page_texts):
+    """(rows, chapter_names) of an iterable of page texts, read one page at a time."""
+    tokenizer = CatalogueTokenizer()
+    for text in page_texts:
+        tokenizer.feed(text)
+    return tokenizer.close()
@@ -0,0 +1,280 @@
+import sqlite3
+import re
+import time
+import argparse
+import pandas as pd
+from pathlib import Path
+from catalogue_tokenizer import CHAPTER_PATTERN, CatalogueTokenizer
+from pdf_page_cache import (PDF_FILES_TABLE, ensure_page_cache, pdf_fingerprint, extract_page_texts,
+                            iter_page_texts)
+
+CHAPTER_INDEX_TABLE = "catalogo_paginas"
+
+# First two digits of a dddd.dd.dd.dd.dd tariff code: its chapter
+CODE_CHAPTER = re.compile(r'(\d{2})\d{2}\.\d{2}\.\d{2}\.\d{2}\.\d{2}')
+
+# An alternate-format (COD_CAPITULO 0) code is the last 10 digits of a full code
+ALTERNATE_CODES = 10 ** 10
+
+def ensure_chapter_index(conn):
+    """Create the chapter -> page range index: one row per (PDF content hash, chapter)."""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CHAPTER_INDEX_TABLE} (
+            content_hash TEXT NOT NULL,
+            COD_CAPITULO INTEGER NOT NULL,
+            first_page INTEGER NOT NULL,
+            last_page INTEGER NOT NULL,
+            PRIMARY KEY (content_hash, COD_CAPITULO)
+        ) WITHOUT ROWID
+    """)
+    conn.commit()
+
+def page_chapters(text):
+    """Chapters a page belongs to: the chapters of its headers and of its tariff codes."""
+    chapters = {int(m.group(1)) for m in CHAPTER_PATTERN.finditer(text)}
+    chapters.update(int(m.group(1)) for m in CODE_CHAPTER.finditer(text))
+    return chapters
+
+def update_chapter_ranges(ranges, page, text):
+    """Extend {chapter: (first_page, last_page)} with the next page in document order."""
+    for chapter in page_chapters(text):
+        first, _ = ranges.get(chapter, (page, page))
+        ranges[chapter] = (first, page)
+
+def chapter_ranges(page_texts):
+    """{chapter: (first_page, last_page)} of an iterable of (zero-based page, text)."""
+    ranges = {}
+    for page, text in page_texts:
+        update_chapter_ranges(ranges, page, text)
+    return ranges
+
+def save_chapter_index(conn, content_hash, ranges):
+    ensure_chapter_index(conn)
+    conn.executemany(f"""
+        INSERT OR REPLACE INTO {CHAPTER_INDEX_TABLE} (content_hash, COD_CAPITULO, first_page, last_page)
+        VALUES (?, ?, ?, ?)
+    """, [(content_hash, chapter, first, last) for chapter, (first, last) in sorted(ranges.items())])
+    conn.commit()
+
+def build_chapter_index(conn, pdf_path, workers=None, use_cache=True):
+    """
+    Index every chapter of the PDF from all its pages (read through the page
+    cache). The catalogue extraction builds it on the way; this is for PDFs
+    extracted before the index existed.
+    """
+    ensure_page_cache(conn)
+    content_hash, _ = pdf_fingerprint(conn, pdf_path)
+    ranges = chapter_ranges(enumerate(iter_page_texts(conn, pdf_path, workers=workers,
+                                                      use_cache=use_cache, verbose=False)))
+    save_chapter_index(conn, content_hash, ranges)
+    return ranges
+
+def _first_page(predicate, page_count, hint=None):
+    """
+    Smallest page in [0, page_count) for which the monotonic predicate holds
+    (page_count if none): galloping from hint, when there is one, then binary
+    search, so only O(log distance) pages are looked at.
+    """
+    low, high = 0, page_count
+    if hint is not None and 0 <= hint < page_count:
+        step = 1
+        if predicate(hint):
+            high = hint
+            while high - step >= 0 and predicate(high - step):
+                high -= step
+                step *= 2
+            low = max(high - step + 1, 0)
+        else:
+            low = hint + 1
+            while low + step - 1 < page_count and not predicate(low + step - 1):
+                low += step
+                step *= 2
+            high = min(low + step - 1, page_count)
+    while low < high:
+        middle = (low + high) // 2
+        if predicate(middle):
+            high = middle
+        else:
+            low = middle + 1
+    return low
+
+def locate_chapter_pages(conn, pdf_path, first_chapter, last_chapter, page_count, hints=(None, None)):
+    """
+    Page range [start, end) of chapters first_chapter..last_chapter in a PDF
+    without an index, found by searching on the chapters of single pages.
+    Chapters only grow through the document; a page with no header or code
+    counts with the next page that has one. Probed pages land in the page cache.
+    """
+    chapters_of = {}
+
+    def chapters_at(page):
+        while page < page_count:
+            if page not in chapters_of:
+                text = extract_page_texts(conn, pdf_path, [page], workers=1, verbose=False)[0]
+                chapters_of[page] = page_chapters(text)
+            if chapters_of[page]:
+                return chapters_of[page]
+            page += 1
+        return {float('inf')}
+
+    start = _first_page(lambda page: max(chapters_at(page)) >= first_chapter, page_count, hints[0])
+    end = _first_page(lambda page: min(chapters_at(page)) > last_chapter, page_count, hints[1])
+    return start, end, len(chapters_of)
+
+def chapter_runs(chapters):
+    """Consecutive runs of chapter numbers: [6, 7, 8, 12] -> [(6, 8), (12, 12)]."""
+    runs = []
+    for chapter in sorted(set(chapters)):
+        if runs and chapter == runs[-1][1] + 1:
+            runs[-1] = (runs[-1][0], chapter)
+        else:
+            runs.append((chapter, chapter))
+    return runs
+
+def chapter_pages(conn, pdf_path, chapters, verbose=True):
+    """
+    Zero-based page ranges [(start, end)] holding the given chapters, one per
+    consecutive run of chapters. Taken from the index when this edition has
+    one; otherwise located by probing pages, starting from where the chapters
+    are in the most recently indexed edition, and added to the index.
+    """
+    ensure_page_cache(conn)
+    ensure_chapter_index(conn)
+    content_hash, page_count = pdf_fingerprint(conn, pdf_path)
+    indexed = {
+        row[0]: (row[1], row[2])
+        for row in conn.execute(f"SELECT COD_CAPITULO, first_page, last_page FROM {CHAPTER_INDEX_TABLE} "
+                                f"WHERE content_hash = ?", (content_hash,))
+    }
+    hints = {
+        row[0]: row[1]
+        for row in conn.execute(f"""
+            SELECT p.COD_CAPITULO, p.first_page
+            FROM {CHAPTER_INDEX_TABLE} p JOIN {PDF_FILES_TABLE} f ON f.content_hash = p.content_hash
+            WHERE p.content_hash != ?
+            ORDER BY f.cached_at
+        """, (content_hash,))
+    }
+
+    ranges = []
+    for first_chapter, last_chapter in chapter_runs(chapters):
+        run = range(first_chapter, last_chapter + 1)
+        if all(chapter in indexed for chapter in run):
+            ranges.append((min(indexed[ch][0] for ch in run), max(indexed[ch][1] for ch in run) + 1))
+            continue
+        start_time = time.perf_counter()
+        start, end, probed = locate_chapter_pages(
+            conn, pdf_path, first_chapter, last_chapter, page_count,
+            hints=(hints.get(first_chapter), hints.get(last_chapter + 1)))
+        if verbose:
+            print(f"  Chapters {first_chapter}-{last_chapter}: pages {start + 1}-{end} located by "
+                  f"probing {probed} pages in {time.perf_counter() - start_time:.1f}s")
+        ranges.append((start, end))
+    return ranges
+
+def extract_catalogue(conn, pdf_path, workers=None, use_cache=True, verbose=True):
+    """
+    (catalogue rows, {chapter: name}, per-pattern match counts) of the whole
+    PDF, streamed from the page cache through the tokenizer. The chapter
+    page index of the PDF is built on the way.
+    """
+    tokenizer = CatalogueTokenizer()
+    ranges = {}
+    for page, text in enumerate(iter_page_texts(conn, pdf_path, workers=workers, use_cache=use_cache,
+                                                verbose=verbose)):
+        tokenizer.feed(text)
+        update_chapter_ranges(ranges, page, text)
+    rows, chapter_names = tokenizer.close()
+    save_chapter_index(conn, pdf_fingerprint(conn, pdf_path)[0], ranges)
+    return rows, chapter_names, tokenizer.matches
+
+def alternate_code_chapters(conn):
+    """
+    {alternate-format COD_INCISO: chapter of the first catalogue line yielding
+    it}: the lowest chapter with a code in force, with taxes, ending in the
+    same 10 digits. Empty before the catalogue is loaded.
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(catalogo_arancel)")}
+    if not columns:
+        return {}
+    in_force = " AND VIGENTE_HASTA IS NULL" if 'VIGENTE_HASTA' in columns else ""
+    return dict(conn.execute(f"""
+        SELECT COD_INCISO % {ALTERNATE_CODES}, MIN(COD_CAPITULO) FROM catalogo_arancel
+        WHERE COD_CAPITULO > 0 AND DAI IS NOT NULL{in_force}
+        GROUP BY COD_INCISO % {ALTERNATE_CODES}
+    """))
+
+def extract_chapters(conn, pdf_path, chapters, workers=None, use_cache=True, verbose=True):
+    """
+    (catalogue rows, {chapter: name}) of the given chapters, read from their
+    pages only. The pages of each run of chapters are tokenized together and
+    the chapters found on them are added to the index.
+
+    The rows are those a full extract_catalogue() reads from the lines of
+    these chapters, alternate-format (COD_CAPITULO 0) rows included. An
+    alternate code is only kept from its first line in the document, so one
+    that a line of an earlier chapter in catalogo_arancel already yields is
+    left to that chapter.
+    """
+    content_hash, _ = pdf_fingerprint(conn, pdf_path)
+    wanted = set(chapters)
+    earlier = alternate_code_chapters(conn)
+    rows = []
+    seen = set()
+    chapter_names = {}
+    for start, end in chapter_pages(conn, pdf_path, chapters, verbose):
+        texts = extract_page_texts(conn, pdf_path, range(start, end), workers=workers,
+                                   use_cache=use_cache, verbose=verbose)
+        ranges = chapter_ranges(enumerate(texts, start))
+        save_chapter_index(conn, content_hash, {ch: ranges[ch] for ch in wanted if ch in ranges})
+        tokenizer = CatalogueTokenizer()
+        for text in texts:
+            tokenizer.feed(text)
+        run_rows, run_names = tokenizer.close()
+        for row in run_rows:
+            code = row['COD_INCISO']
+            chapter = tokenizer.line_chapters[code]
+            if chapter in wanted and earlier.get(code, chapter) >= chapter and code not in seen:
+                rows.append(row)
+                seen.add(code)
+        chapter_names.update((ch, name) for ch, name in run_names.items() if ch in wanted)
+    return rows, chapter_names
+
+def parse_chapters(spec):
+    """'6-12' or '6,7,12' -> list of chapter numbers."""
+    chapters = []
+    for part in spec.split(','):
+        first, _, last = part.partition('-')
+        chapters.extend(range(int(first), int(last or first) + 1))
+    return chapters
+
+def show_chapter_index(pdf_path=Path("data/docs/arancel_2025.pdf"), workers=None, use_cache=True):
+    """
+    Build and print the chapter page index of a PDF.
+    """
+    db_path = Path("data/imports/merged/merged_data.db")
+    conn = sqlite3.connect(db_path)
+
+    print("CHAPTER PAGE INDEX")
+    print("=" * 100)
+    start = time.perf_counter()
+    ranges = build_chapter_index(conn, pdf_path, workers, use_cache)
+    print(f"  Indexed {len(ranges)} chapters in {time.perf_counter() - start:.1f}s")
+
+    content_hash, _ = pdf_fingerprint(conn, pdf_path)
+    print(f"\n{pdf_path.name}:")
+    print(pd.read_sql(f"""
+        SELECT COD_CAPITULO, first_page + 1 AS first_page, last_page + 1 AS last_page,
+               last_page - first_page + 1 AS pages
+        FROM {CHAPTER_INDEX_TABLE} WHERE content_hash = ? ORDER BY COD_CAPITULO
+    """, conn, params=(content_hash,)).to_string(index=False))
+    conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index arancel chapters by page")
+    parser.add_argument("--pdf", type=Path, default=Path("data/docs/arancel_2025.pdf"))
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processes used to extract uncached pages (default: all cores)")
+    parser.add_argument("--no-cache", action="store_true", help="Extract the pages from the PDF again")
+    args = parser.parse_args()
+    show_chapter_index(args.pdf, args.workers, not args.no_cache)
@@ -1,12 +1,175 @@
 import sqlite3
+import time
+import argparse
 import pandas as pd
 from pathlib import Path
+from tariff_hierarchy import refresh_hierarchy_rows
+from catalogue_editions import REENRICH_TABLE, ensure_edition_tables
+from data_marts import MARTS, CHAPTER_INDEX, mart_select, chapter_branches, build_marts
+from ingest_manifest import MANIFEST_TABLE, ensure_manifest
+from product_normalization import ensure_mapping_tables, normalize_table
 
-def create_flowers_greens_table():
+WATERMARK_TABLE = "flowers_greens_watermark"
+
+FLOWERS_CHAPTERS = MARTS['flowers_greens']['chapters']
+
+# merged_imports_fact rows with their catalogue enrichment, as the
+# flowers_greens spec of data_marts.py defines them; enriched_rows() adds
+# the WHERE clauses that select the agricultural chapters
+ENRICHED_SELECT = mart_select(MARTS['flowers_greens'])
+
+def enriched_rows(conn, condition=None, params=()):
+    """
+    (query, params) of the enriched rows of the agricultural chapters,
+    narrowed by condition (with its params) when given.
+    """
+    branches = chapter_branches(conn, FLOWERS_CHAPTERS)
+    if condition:
+        branches = [f"{branch} AND {condition}" for branch in branches]
+    query = "\nUNION ALL\n".join(f"{ENRICHED_SELECT} WHERE {branch}" for branch in branches)
+    return query, list(params) * len(branches)
+
+def ensure_watermark(conn):
+    """Create the watermark: the merged_imports source files (and their load) materialised in flowers_greens."""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (
+            source_file_id INTEGER PRIMARY KEY,
+            content_hash TEXT NOT NULL,
+            loaded_at TEXT NOT NULL
+        )
+    """)
+    conn.commit()
+
+def loaded_sources(conn):
+    """{source_file_id: (content_hash, loaded_at)} of the files merged_imports holds, from the ingest manifest."""
+    ensure_manifest(conn)
+    return {row[0]: (row[1], row[2]) for row in conn.execute(f"""
+        SELECT d.id, m.content_hash, m.loaded_at
+        FROM {MANIFEST_TABLE} m JOIN dim_source_file d ON d.value = m.source_file
+    """)}
+
+def materialized_sources(conn):
+    """{source_file_id: (content_hash, loaded_at)} of the files flowers_greens was built from."""
+    ensure_watermark(conn)
+    return {row[0]: (row[1], row[2]) for row in conn.execute(
+        f"SELECT source_file_id, content_hash, loaded_at FROM {WATERMARK_TABLE}")}
+
+def save_watermark(conn, sources):
+    """Replace the watermark, in the caller's transaction."""
+    conn.execute(f"DELETE FROM {WATERMARK_TABLE}")
+    conn.executemany(f"INSERT INTO {WATERMARK_TABLE} (source_file_id, content_hash, loaded_at) VALUES (?, ?, ?)",
+                     [(file_id, content_hash, loaded_at) for file_id, (content_hash, loaded_at) in sources.items()])
+
+def finish_flowers_greens_build(conn):
+    """
+    Record a full build: every row was enriched against the current
+    catalogue, from the files loaded now.
+    """
+    ensure_edition_tables(conn)
+    ensure_watermark(conn)
+    conn.execute(f"DELETE FROM {REENRICH_TABLE}")
+    save_watermark(conn, loaded_sources(conn))
+    conn.commit()
+
+def build_flowers_greens(conn):
+    """
+    Rebuild flowers_greens_fact and its indexes from all of merged_imports_fact
+    (data_marts.build_marts with the flowers_greens spec).
+    """
+    build_marts(conn, ('flowers_greens',))
+    finish_flowers_greens_build(conn)
+
+def refresh_flowers_greens(conn):
+    """
+    Bring flowers_greens_fact up to date without rebuilding it, in one
+    transaction. The watermark is compared with the ingest manifest: rows of
+    changed and removed files are deleted and the rows of new and changed
+    files inserted with their enrichment. Rows of codes whose enrichment
+    changed (queued in catalogo_reenriquecer by a catalogue edition update,
+    or resolving differently in catalogo_jerarquia) are re-enriched. Only the
+    inserted rows are normalized; the indexes are updated in place.
+    Returns (rows deleted, rows inserted).
+    """
+    fact_table = 'flowers_greens_fact'
+    materialized = materialized_sources(conn)
+    current = loaded_sources(conn)
+    reload = sorted(file_id for file_id in current if materialized.get(file_id) != current[file_id])
+    removed = sorted(file_id for file_id in materialized if file_id not in current)
+    print(f"  Source files: {len(current) - len(reload)} unchanged, {len(reload)} new or changed, "
+          f"{len(removed)} removed")
+
+    ensure_edition_tables(conn)
+    reenrich = {row[0] for row in conn.execute(f"SELECT COD_INCISO FROM {REENRICH_TABLE}")}
+    # Codes resolving differently against the current catalogue, then rows for the new files' codes
+    reenrich |= refresh_hierarchy_rows(conn)
+    file_marks = ', '.join('?' for _ in reload)
+    if reload:
+        refresh_hierarchy_rows(conn, [row[0] for row in conn.execute(
+            f"SELECT DISTINCT COD_INCISO FROM merged_imports_fact WHERE source_file_id IN ({file_marks})", reload)])
+    print(f"  Codes to re-enrich: {len(reenrich):,}")
+
+    conn.execute(CHAPTER_INDEX)
+    enriched_columns = [col[0] for col in conn.execute(f"{ENRICHED_SELECT} LIMIT 0").description]
+    fact_columns = [row[1] for row in conn.execute(f'PRAGMA table_info("{fact_table}")')]
+    # Columns added to flowers_greens after the build (producto_normalizado) are filled below
+    column_list = ', '.join(f'"{col}"' for col in fact_columns if col in enriched_columns)
+
+    conn.execute("DROP TABLE IF EXISTS temp.reenrich_codes")
+    conn.execute("CREATE TEMP TABLE reenrich_codes (COD_INCISO INTEGER PRIMARY KEY)")
+    conn.executemany("INSERT INTO temp.reenrich_codes VALUES (?)", [(code,) for code in reenrich])
+    # Tables built before the watermark existed lack it
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_fg_source_file ON {fact_table}(source_file_id)")
+    ensure_mapping_tables(conn)
+    conn.commit()
+
+    conn.execute("BEGIN")
+    try:
+        deleted = 0
+        if reload or removed:
+            deleted += conn.execute(f"DELETE FROM {fact_table} WHERE source_file_id IN "
+                                    f"({', '.join('?' for _ in reload + removed)})", reload + removed).rowcount
+        if reenrich:
+            deleted += conn.execute(f"DELETE FROM {fact_table} "
+                                    f"WHERE COD_INCISO IN (SELECT COD_INCISO FROM temp.reenrich_codes)").rowcount
+        # Rows inserted from here on have larger rowids
+        watermark_rowid = conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {fact_table}").fetchone()[0]
+        inserted = 0
+        if reload:
+            select, params = enriched_rows(conn, f"i.source_file_id IN ({file_marks})", reload)
+            inserted += conn.execute(f"INSERT INTO {fact_table} ({column_list}) "
+                                     f"SELECT {column_list} FROM ({select})", params).rowcount
+        if reenrich:
+            select, params = enriched_rows(conn, f"i.COD_INCISO IN (SELECT COD_INCISO FROM temp.reenrich_codes) "
+                                                 f"AND i.source_file_id NOT IN ({file_marks})", reload)
+            inserted += conn.execute(f"INSERT INTO {fact_table} ({column_list}) "
+                                     f"SELECT {column_list} FROM ({select})", params).rowcount
+        if 'producto_normalizado' in fact_columns:
+            normalize_table(conn, 'flowers_greens', "rowid > ?", (watermark_rowid,))
+        conn.execute(f"DELETE FROM {REENRICH_TABLE}")
+        save_watermark(conn, current)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    conn.execute("DROP TABLE temp.reenrich_codes")
+    return deleted, inserted
+
+def create_flowers_greens_table(incremental=False):
     """
     Create flowers_greens table with agricultural products.
     Chapters: 6 (flowers/plants), 7 (vegetables), 8 (fruits), 9 (coffee/tea/spices), 
               10 (cereals), 12 (seeds)
+
+    Rows are stored in flowers_greens_fact with the same dimension keys as
+    merged_imports_fact; flowers_greens is a view with the original column names.
+
+    Import codes are resolved through catalogo_jerarquia: a code missing from
+    catalogo_arancel is classified by its nearest catalogued ancestor
+    (nivel_coincidencia says which level matched).
+
+    With incremental=True only what changed since the last build is
+    refreshed (see refresh_flowers_greens); the table is built in full when
+    there is no watermark to refresh from.
     """
     db_path = Path("data/imports/merged/merged_data.db")
     conn = sqlite3.connect(db_path)
@@ -14,69 +177,16 @@ def create_flowers_greens_table():
     print("CREATING FLOWERS_GREENS TABLE")
     print("=" * 100)
     
-    # Drop existing table
-    conn.execute("DROP TABLE IF EXISTS flowers_greens")
-    
-    # Create table with agricultural products
-    query = """
-    CREATE TABLE flowers_greens AS
-    SELECT 
-        i.*,
-        c.DESCRIPCIÓN as descripcion_oficial,
-        c.CAPITULO_NOMBRE,
-        c.DAI as tarifa_oficial,
-        CASE 
-            WHEN c.COD_CAPITULO = 6 THEN 'Flores y Plantas'
-            WHEN c.COD_CAPITULO = 7 THEN 'Vegetales'
-            WHEN c.COD_CAPITULO = 8 THEN 'Frutas y Nueces'
-            WHEN c.COD_CAPITULO = 9 THEN 'Café, Té, Especias'
-            WHEN c.COD_CAPITULO = 10 THEN 'Cereales'
-            WHEN c.COD_CAPITULO = 12 THEN 'Semillas y Plantas Agrícolas'
-            ELSE 'Otros Agrícolas'
-        END as categoria_agricola,
-        CASE
-            -- Flowers (Chapter 6)
-            WHEN c.COD_INCISO = 60311000000 THEN 'Rosas'
-            WHEN c.COD_INCISO = 60312000000 THEN 'Claveles'
-            WHEN c.COD_INCISO = 60313000000 THEN 'Orquídeas'
-            WHEN c.COD_INCISO = 60314000000 THEN 'Crisantemos'
-            WHEN c.COD_INCISO = 60315000000 THEN 'Azucenas'
-            WHEN c.COD_INCISO = 60319600000 THEN 'Gerberas'
-            WHEN c.COD_INCISO = 60319920000 THEN 'Gladiolas'
-            WHEN c.COD_INCISO = 60319930000 THEN 'Anturios'
-            WHEN c.COD_INCISO = 60319940000 THEN 'Heliconias'
-            WHEN c.COD_INCISO BETWEEN 60300000000 AND 60399999999 THEN 'Otras Flores'
-            WHEN c.COD_INCISO BETWEEN 60100000000 AND 60299999999 THEN 'Plantas Vivas'
-            WHEN c.COD_INCISO BETWEEN 60400000000 AND 60499999999 THEN 'Follaje'
-            -- Vegetables (Chapter 7)
-            WHEN c.COD_CAPITULO = 7 THEN COALESCE(c.DESCRIPCIÓN, i.DESCRIPCIÓN)
-            -- Fruits (Chapter 8)
-            WHEN c.COD_CAPITULO = 8 THEN COALESCE(c.DESCRIPCIÓN, i.DESCRIPCIÓN)
-            -- Coffee/Tea/Spices (Chapter 9)
-            WHEN c.COD_CAPITULO = 9 THEN COALESCE(c.DESCRIPCIÓN, i.DESCRIPCIÓN)
-            -- Cereals (Chapter 10)
-            WHEN c.COD_CAPITULO = 10 THEN COALESCE(c.DESCRIPCIÓN, i.DESCRIPCIÓN)
-            -- Seeds (Chapter 12)
-            WHEN c.COD_CAPITULO = 12 THEN COALESCE(c.DESCRIPCIÓN, i.DESCRIPCIÓN)
-            ELSE COALESCE(c.DESCRIPCIÓN, i.DESCRIPCIÓN)
-        END as tipo_producto
-    FROM merged_imports i
-    LEFT JOIN catalogo_arancel c ON i.COD_INCISO = c.COD_INCISO
-    WHERE c.COD_CAPITULO IN (6, 7, 8, 9, 10, 12)
-       OR i.COD_CAPITULO IN (6, 7, 8, 9, 10, 12)
-    """
-    
-    print("Creating table...")
-    conn.execute(query)
-    conn.commit()
-    
-    # Create indexes
-    print("Creating indexes...")
-    conn.execute("CREATE INDEX idx_fg_fecha ON flowers_greens(FECHA_IMPORTACION_EXPORTACION)")
-    conn.execute("CREATE INDEX idx_fg_importador ON flowers_greens(IMPORTADOR_EXPORTADOR)")
-    conn.execute("CREATE INDEX idx_fg_tipo ON flowers_greens(tipo_producto)")
-    conn.execute("CREATE INDEX idx_fg_categoria ON flowers_greens(categoria_agricola)")
-    conn.commit()
+    if incremental and materialized_sources(conn) and conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'flowers_greens_fact'").fetchone():
+        print("Refreshing changed rows...")
+        start = time.perf_counter()
+        deleted, inserted = refresh_flowers_greens(conn)
+        print(f"  {deleted:,} rows deleted, {inserted:,} rows inserted in {time.perf_counter() - start:.2f}s")
+    else:
+        if incremental:
+            print("No watermark yet - building the whole table")
+        build_flowers_greens(conn)
     
     # Get statistics
     print("\n" + "=" * 100)
@@ -139,5 +249,9 @@ def create_flowers_greens_table():
     print("=" * 100)
 
 if __name__ == "__main__":
-    create_flowers_greens_table()
+    parser = argparse.ArgumentParser(description="Create flowers_greens from merged_imports and the catalogue")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only refresh the rows of new or changed files and re-enrich changed codes")
+    args = parser.parse_args()
+    create_flowers_greens_table(incremental=args.incremental)
 
@@ -0,0 +1,302 @@
+import sqlite3
+import re
+import time
+import argparse
+import pandas as pd
+from pathlib import Path
+from bulk_load import BulkLoadSession
+from star_schema import drop_table_or_view, create_presentation_view
+from tariff_hierarchy import build_hierarchy_table
+from chapter_page_index import chapter_runs
+from product_normalization import PRODUCT_CODES
+
+# Product of a row no rule matches: its catalogue description, or the declared one
+DEFAULT_PRODUCT = "COALESCE(c.DESCRIPCIÓN, descr.value)"
+
+# Chapter-scoped marts of merged_imports: view name -> spec. A mart holds the
+# rows whose code (h.COD_CAPITULO) or stored COD_CAPITULO is in its chapters,
+# as {name}_fact behind a {name} view. Category and product rules are
+# (SQL condition, label) pairs tried in order over the aliases of
+# ENRICHED_FROM (i, descr, h, c); the product of a row no rule matches is
+# DEFAULT_PRODUCT. The category and product columns must not clash with a
+# merged_imports column (names are case-insensitive: CATEGORIA is taken).
+# Indexes are name -> columns of the fact table.
+MARTS = {
+    'flowers_greens': {
+        'chapters': (6, 7, 8, 9, 10, 12),
+        'category_column': 'categoria_agricola',
+        'categories': [
+            ('h.COD_CAPITULO = 6', 'Flores y Plantas'),
+            ('h.COD_CAPITULO = 7', 'Vegetales'),
+            ('h.COD_CAPITULO = 8', 'Frutas y Nueces'),
+            ('h.COD_CAPITULO = 9', 'Café, Té, Especias'),
+            ('h.COD_CAPITULO = 10', 'Cereales'),
+            ('h.COD_CAPITULO = 12', 'Semillas y Plantas Agrícolas'),
+        ],
+        'default_category': 'Otros Agrícolas',
+        'product_column': 'tipo_producto',
+        'products': [
+            *[(f'c.COD_INCISO = {code}', label) for code, label in PRODUCT_CODES.items()],
+            ('h.COD_PARTIDA = 603', 'Otras Flores'),
+            ('h.COD_PARTIDA IN (601, 602)', 'Plantas Vivas'),
+            ('h.COD_PARTIDA = 604', 'Follaje'),
+        ],
+        'indexes': {
+            'idx_fg_fecha': 'FECHA_IMPORTACION_EXPORTACION',
+            # Covers the monthly trend queries, which group on yyyymm without reading the rows
+            'idx_fg_yyyymm': 'yyyymm, CANTIDAD, PRECIO_UNIDAD, TOTAL_A_PAGAR',
+            'idx_fg_importador': 'IMPORTADOR_EXPORTADOR_ID',
+            'idx_fg_tipo': 'tipo_producto',
+            'idx_fg_categoria': 'categoria_agricola',
+            # Lets an incremental refresh delete the rows of a reloaded file
+            'idx_fg_source_file': 'source_file_id',
+        },
+    },
+    'seafood': {
+        'chapters': (3,),
+        'category_column': 'categoria_pesquera',
+        'categories': [
+            ('h.COD_PARTIDA = 301', 'Peces Vivos'),
+            ('h.COD_PARTIDA = 302', 'Pescado Fresco o Refrigerado'),
+            ('h.COD_PARTIDA = 303', 'Pescado Congelado'),
+            ('h.COD_PARTIDA = 304', 'Filetes de Pescado'),
+            ('h.COD_PARTIDA = 305', 'Pescado Seco, Salado o Ahumado'),
+            ('h.COD_PARTIDA = 306', 'Crustáceos'),
+            ('h.COD_PARTIDA = 307', 'Moluscos'),
+            ('h.COD_PARTIDA = 308', 'Otros Invertebrados Acuáticos'),
+        ],
+        'default_category': 'Otros Pescados y Mariscos',
+        'product_column': 'tipo_producto',
+        'products': [],
+        'indexes': {
+            'idx_sf_yyyymm': 'yyyymm, CANTIDAD, PRECIO_UNIDAD, TOTAL_A_PAGAR',
+            'idx_sf_importador': 'IMPORTADOR_EXPORTADOR_ID',
+            'idx_sf_categoria': 'categoria_pesquera',
+        },
+    },
+    'preparations': {
+        'chapters': (20,),
+        'category_column': 'categoria_preparacion',
+        'categories': [
+            ('h.COD_PARTIDA = 2001', 'Encurtidos'),
+            ('h.COD_PARTIDA = 2002', 'Tomates Preparados'),
+            ('h.COD_PARTIDA = 2003', 'Hongos y Trufas'),
+            ('h.COD_PARTIDA IN (2004, 2005)', 'Hortalizas Preparadas'),
+            ('h.COD_PARTIDA = 2006', 'Frutas Confitadas'),
+            ('h.COD_PARTIDA = 2007', 'Confituras y Jaleas'),
+            ('h.COD_PARTIDA = 2008', 'Frutas Preparadas'),
+            ('h.COD_PARTIDA = 2009', 'Jugos'),
+        ],
+        'default_category': 'Otras Preparaciones',
+        'product_column': 'tipo_producto',
+        'products': [],
+        'indexes': {
+            'idx_pr_yyyymm': 'yyyymm, CANTIDAD, PRECIO_UNIDAD, TOTAL_A_PAGAR',
+            'idx_pr_importador': 'IMPORTADOR_EXPORTADOR_ID',
+            'idx_pr_categoria': 'categoria_preparacion',
+        },
+    },
+}
+
+ENRICHED_FROM = """
+    FROM merged_imports_fact i
+    LEFT JOIN dim_descripcion descr ON descr.id = i."DESCRIPCIÓN_ID"
+    LEFT JOIN catalogo_jerarquia h ON h.COD_INCISO = i.COD_INCISO
+    LEFT JOIN catalogo_arancel c ON c.COD_INCISO = h.COD_INCISO_CATALOGO
+"""
+
+# Drives the builds: one seek per chapter, or per (chapter, code range)
+CHAPTER_INDEX = "CREATE INDEX IF NOT EXISTS idx_mi_capitulo_inciso ON merged_imports_fact(COD_CAPITULO, COD_INCISO)"
+
+def sql_literal(value):
+    return "'" + value.replace("'", "''") + "'"
+
+def rules_case(rules, default):
+    """CASE of (condition, label) rules, falling back to the SQL expression default."""
+    if not rules:
+        return default
+    whens = ''.join(f"\n            WHEN {condition} THEN {sql_literal(label)}" for condition, label in rules)
+    return f"CASE{whens}\n            ELSE {default}\n        END"
+
+def mart_select(spec):
+    """Enriched merged_imports_fact rows in the shape of a mart, without a WHERE."""
+    return f"""
+    SELECT
+        i.*,
+        c.DESCRIPCIÓN as descripcion_oficial,
+        h.CAPITULO_NOMBRE,
+        c.DAI as tarifa_oficial,
+        {rules_case(spec['categories'], sql_literal(spec['default_category']))} as {spec['category_column']},
+        {rules_case(spec['products'], DEFAULT_PRODUCT)} as {spec['product_column']},
+        h.NIVEL_COINCIDENCIA as nivel_coincidencia{ENRICHED_FROM}"""
+
+def stored_chapters(conn):
+    """Distinct non-NULL COD_CAPITULO of merged_imports_fact, one index seek per value."""
+    return [row[0] for row in conn.execute("""
+        WITH RECURSIVE chapters(value) AS (
+            SELECT MIN(COD_CAPITULO) FROM merged_imports_fact
+            UNION ALL
+            SELECT (SELECT MIN(COD_CAPITULO) FROM merged_imports_fact WHERE COD_CAPITULO > value)
+            FROM chapters WHERE value IS NOT NULL
+        )
+        SELECT value FROM chapters WHERE value IS NOT NULL
+    """)]
+
+def chapter_branches(conn, chapters):
+    """
+    Disjoint WHERE clauses whose UNION ALL is
+    h.COD_CAPITULO IN chapters OR i.COD_CAPITULO IN chapters, each one a seek
+    on idx_mi_capitulo_inciso. h.COD_CAPITULO is the chapter of the code
+    itself, so rows stored under another (or no) COD_CAPITULO are found by
+    code range within each of those chapters.
+    """
+    listed = ', '.join(map(str, chapters))
+    others = [chapter for chapter in stored_chapters(conn) if chapter not in chapters]
+    branches = [f"i.COD_CAPITULO IN ({listed})"]
+    for first, last in chapter_runs(chapters):
+        in_range = (f"i.COD_INCISO BETWEEN {first * 10**10} AND {(last + 1) * 10**10 - 1} "
+                    f"AND h.COD_CAPITULO IN ({listed})")
+        if others:
+            branches.append(f"i.COD_CAPITULO IN ({', '.join(map(str, others))}) AND {in_range}")
+        branches.append(f"i.COD_CAPITULO IS NULL AND {in_range}")
+    return branches
+
+def check_query_plan(conn, query, params=()):
+    """
+    Print the plan of a mart query and raise if it scans merged_imports_fact
+    instead of seeking it through an index.
+    """
+    plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+    for detail in plan:
+        print(f"    {detail}")
+    scans = [detail for detail in plan if re.match(r'SCAN (i|merged_imports_fact)\b', detail)]
+    if scans:
+        raise RuntimeError(f"mart query plan scans merged_imports_fact: {'; '.join(scans)}")
+
+def routed_rows(conn, names):
+    """
+    Query reading the rows of all the named marts in one pass over
+    merged_imports_fact. Each row carries the enrichment once and, per mart
+    (by position in names), whether it belongs to it ("_in_<n>") and its
+    category and product labels ("_category_<n>", "_product_<n>").
+    """
+    specs = [MARTS[name] for name in names]
+    routing = []
+    for n, spec in enumerate(specs):
+        listed = ', '.join(map(str, spec['chapters']))
+        routing += [
+            f'(h.COD_CAPITULO IN ({listed}) OR i.COD_CAPITULO IN ({listed})) as "_in_{n}"',
+            f'{rules_case(spec["categories"], sql_literal(spec["default_category"]))} as "_category_{n}"',
+            f'{rules_case(spec["products"], DEFAULT_PRODUCT)} as "_product_{n}"',
+        ]
+    routing = ',\n        '.join(routing)
+    select = f"""
+    SELECT
+        i.*,
+        c.DESCRIPCIÓN as descripcion_oficial,
+        h.CAPITULO_NOMBRE,
+        c.DAI as tarifa_oficial,
+        h.NIVEL_COINCIDENCIA as nivel_coincidencia,
+        {routing}{ENRICHED_FROM}"""
+    chapters = sorted({chapter for spec in specs for chapter in spec['chapters']})
+    return "\nUNION ALL\n".join(f"{select} WHERE {branch}" for branch in chapter_branches(conn, chapters))
+
+def build_marts(conn, names=tuple(MARTS)):
+    """
+    Rebuild the named marts and their indexes from one pass over
+    merged_imports_fact: the rows of all their chapters are enriched once
+    and routed to every mart they belong to. With several marts the routed
+    rows are staged in a temp table each mart is filled from; a single mart
+    is filled straight from the query. Returns {mart: rows}.
+    """
+    taken = {row[1].lower() for row in conn.execute("PRAGMA table_info(merged_imports)")}
+    for name in names:
+        clashes = [MARTS[name][key] for key in ('category_column', 'product_column')
+                   if MARTS[name][key].lower() in taken]
+        if clashes:
+            raise ValueError(f"{name}: columns {', '.join(clashes)} clash with merged_imports columns")
+
+    print("Resolving import codes in catalogo_jerarquia...")
+    build_hierarchy_table(conn)
+    conn.execute(CHAPTER_INDEX)
+    fact_columns = [row[1] for row in conn.execute("PRAGMA table_info(merged_imports_fact)")]
+    query = routed_rows(conn, names)
+    print("Query plan:")
+    check_query_plan(conn, query)
+
+    counts = {}
+    with BulkLoadSession(conn) as session:
+        if len(names) > 1:
+            start = time.perf_counter()
+            conn.execute("DROP TABLE IF EXISTS temp.mart_rows")
+            conn.execute(f"CREATE TEMP TABLE mart_rows AS {query}")
+            staged = conn.execute("SELECT COUNT(*) FROM temp.mart_rows").fetchone()[0]
+            print(f"  Routed {staged:,} rows in {time.perf_counter() - start:.2f}s")
+            source = "temp.mart_rows"
+        else:
+            source = f"({query})"
+
+        for n, name in enumerate(names):
+            spec = MARTS[name]
+            fact_table = f"{name}_fact"
+            drop_table_or_view(conn, name)
+            conn.execute(f'DROP TABLE IF EXISTS {fact_table}')
+            columns = ', '.join(f'"{col}"' for col in fact_columns)
+            conn.execute(f"""
+                CREATE TABLE {fact_table} AS
+                SELECT {columns}, descripcion_oficial, CAPITULO_NOMBRE, tarifa_oficial,
+                       "_category_{n}" as {spec['category_column']},
+                       "_product_{n}" as {spec['product_column']},
+                       nivel_coincidencia
+                FROM {source} WHERE "_in_{n}"
+            """)
+            create_presentation_view(conn, name, fact_table)
+            counts[name] = conn.execute(f'SELECT COUNT(*) FROM {fact_table}').fetchone()[0]
+            print(f"  {name}: {counts[name]:,} rows")
+            for index_name, index_columns in spec['indexes'].items():
+                session.defer_index(f'CREATE INDEX {index_name} ON {fact_table}({index_columns})')
+        conn.execute("DROP TABLE IF EXISTS temp.mart_rows")
+    return counts
+
+def create_data_marts(names=tuple(MARTS)):
+    """
+    Build the named chapter marts (all of MARTS by default) and print their
+    categories. flowers_greens is finished like create_flowers_greens_table.py
+    does, so its incremental refresh starts from this build.
+    """
+    db_path = Path("data/imports/merged/merged_data.db")
+    conn = sqlite3.connect(db_path)
+
+    print("BUILDING DATA MARTS")
+    print("=" * 100)
+    start = time.perf_counter()
+    build_marts(conn, names)
+    if 'flowers_greens' in names:
+        from create_flowers_greens_table import finish_flowers_greens_build
+        finish_flowers_greens_build(conn)
+    print(f"  Built {len(names)} marts in {time.perf_counter() - start:.2f}s")
+
+    for name in names:
+        spec = MARTS[name]
+        print("\n" + "=" * 100)
+        print(f"{name.upper()} (chapters {', '.join(map(str, spec['chapters']))})")
+        print("=" * 100)
+        print(pd.read_sql(f"""
+            SELECT {spec['category_column']}, COUNT(*) as records,
+                   COUNT(DISTINCT {spec['product_column']}) as unique_products,
+                   ROUND(SUM(TOTAL_A_PAGAR), 2) as total_value
+            FROM {name}
+            GROUP BY {spec['category_column']}
+            ORDER BY records DESC
+        """, conn).to_string(index=False))
+    conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build chapter-scoped data marts from merged_imports")
+    parser.add_argument("marts", nargs="*", default=list(MARTS),
+                        help=f"Marts to build, of {', '.join(MARTS)} (default: all)")
+    args = parser.parse_args()
+    unknown = [name for name in args.marts if name not in MARTS]
+    if unknown:
+        parser.error(f"unknown marts: {', '.join(unknown)}")
+    create_data_marts(tuple(args.marts))
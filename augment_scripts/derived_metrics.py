@@ -0,0 +1,151 @@
+import sqlite3
+import hashlib
+import time
+import argparse
+import pandas as pd
+from datetime import datetime
+from pathlib import Path
+from bulk_load import BulkLoadSession
+from canonical_schema import METRICS
+from star_schema import storage_table, create_presentation_view
+
+METRICS_TABLE = "derived_metric_definitions"
+
+CHUNK_ROWS = 200_000
+
+# The metrics are registered in canonical_schema.METRICS. The merge computes them
+# as rows are inserted; here the stored columns are evaluated set-wise by one
+# UPDATE per chunk, so changing an expression there is enough to have the
+# column recomputed on the next run.
+
+def definition_hash(expression):
+    return hashlib.sha256(expression.encode('utf-8')).hexdigest()
+
+def ensure_metrics_table(conn):
+    """Create the table recording which definition each stored metric column was computed with."""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {METRICS_TABLE} (
+            metric TEXT PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            expression TEXT NOT NULL,
+            definition_hash TEXT NOT NULL,
+            computed_at TEXT NOT NULL
+        )
+    """)
+    conn.commit()
+
+def stale_metrics(conn, table_name, metrics=METRICS):
+    """
+    Metrics whose column is missing or was computed with another definition.
+    A full reload of merged_imports drops the columns, so they count as stale too.
+    """
+    columns = {row[1] for row in conn.execute(f'PRAGMA table_info("{table_name}")')}
+    recorded = {
+        row[0]: (row[1], row[2])
+        for row in conn.execute(f"SELECT metric, table_name, definition_hash FROM {METRICS_TABLE}")
+    }
+    return [
+        name for name, (expression, _) in metrics.items()
+        if name not in columns or recorded.get(name) != (table_name, definition_hash(expression))
+    ]
+
+def record_metrics(conn, table_name, names, metrics=METRICS):
+    """
+    Record that the named metric columns of table_name hold their current
+    definition, in the caller's transaction.
+    """
+    now = datetime.now().isoformat(sep=' ', timespec='seconds')
+    conn.executemany(f"""
+        INSERT OR REPLACE INTO {METRICS_TABLE}
+            (metric, table_name, expression, definition_hash, computed_at)
+        VALUES (?, ?, ?, ?, ?)
+    """, [(name, table_name, metrics[name][0], definition_hash(metrics[name][0]), now)
+          for name in names])
+
+def refresh_metrics(conn, view_name='merged_imports', metrics=METRICS, chunk_rows=CHUNK_ROWS,
+                    force=False):
+    """
+    Bring the metric columns of view_name's storage table up to date in one
+    chunked pass over the table (rowid ranges of chunk_rows, one commit each).
+
+    Stale metrics (new, changed definition or dropped column) are recomputed
+    on every row. The others are only filled in where they are NULL but
+    computable, e.g. rows added by an incremental merge. Returns the list of
+    recomputed metrics.
+    """
+    ensure_metrics_table(conn)
+    table_name = storage_table(conn, view_name)
+    stale = list(metrics) if force else stale_metrics(conn, table_name, metrics)
+
+    columns = {row[1] for row in conn.execute(f'PRAGMA table_info("{table_name}")')}
+    added = [name for name in metrics if name not in columns]
+    for name in added:
+        print(f"  Adding column {name}")
+        conn.execute(f'ALTER TABLE "{table_name}" ADD COLUMN "{name}" REAL')
+    if added and table_name != view_name:
+        create_presentation_view(conn, view_name, table_name)
+    conn.commit()
+
+    assignments = []
+    fill_conditions = []
+    for name, (expression, _) in metrics.items():
+        if name in stale:
+            assignments.append(f'"{name}" = {expression}')
+        else:
+            assignments.append(f'"{name}" = COALESCE("{name}", {expression})')
+            fill_conditions.append(f'("{name}" IS NULL AND ({expression}) IS NOT NULL)')
+    # Without stale metrics only rows with a missing, computable value are rewritten
+    where = "rowid > ? AND rowid <= ?"
+    if not stale:
+        where += f" AND ({' OR '.join(fill_conditions)})"
+    update_sql = f'UPDATE "{table_name}" SET {", ".join(assignments)} WHERE {where}'
+
+    print(f"  Recomputing: {', '.join(stale) if stale else 'none'}")
+    first, last = conn.execute(f'SELECT MIN(rowid), MAX(rowid) FROM "{table_name}"').fetchone()
+    updated = 0
+    start = time.perf_counter()
+    if first is not None:
+        with BulkLoadSession(conn, defer_indexes=False, commit_rows=chunk_rows, verbose=False) as session:
+            for low in range(first - 1, last, chunk_rows):
+                cursor = conn.execute(update_sql, (low, low + chunk_rows))
+                updated += cursor.rowcount
+                session.rows_written(cursor.rowcount)
+                print(f"    rows up to {min(low + chunk_rows, last):,} of {last:,}: "
+                      f"{updated:,} updated")
+
+            record_metrics(conn, table_name, stale, metrics)
+    elapsed = time.perf_counter() - start
+    print(f"  Updated {updated:,} rows of {table_name} in {elapsed:.1f}s")
+    return stale
+
+def compute_derived_metrics(force=False):
+    """
+    Compute the derived metric columns of merged_imports and print their ranges.
+    """
+    db_path = Path("data/imports/merged/merged_data.db")
+    if not db_path.exists():
+        print(f"Database not found at {db_path}")
+        return
+
+    conn = sqlite3.connect(db_path)
+    print("DERIVED METRICS")
+    print("=" * 100)
+    refresh_metrics(conn, force=force)
+
+    print("\nMETRIC SUMMARY:")
+    rows = []
+    for name, (expression, description) in METRICS.items():
+        stats = conn.execute(f'''
+            SELECT COUNT("{name}"), MIN("{name}"), AVG("{name}"), MAX("{name}")
+            FROM "{storage_table(conn, 'merged_imports')}"
+        ''').fetchone()
+        rows.append({'metric': name, 'description': description, 'non_null': stats[0],
+                     'min': stats[1], 'avg': stats[2], 'max': stats[3]})
+    print(pd.DataFrame(rows).to_string(index=False))
+    conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute the derived metric columns of merged_imports")
+    parser.add_argument("--force", action="store_true", help="recompute every metric on every row")
+    args = parser.parse_args()
+    compute_derived_metrics(force=args.force)
@@ -1,8 +1,9 @@
-import PyPDF2
 import sqlite3
 import re
+import argparse
 import pandas as pd
 from pathlib import Path
+from pdf_page_cache import extract_page_texts
 
 def normalize_code(code_str):
     """
@@ -25,7 +26,7 @@ def normalize_code(code_str):
     except:
         return None
 
-def extract_arancel_catalogue():
+def extract_arancel_catalogue(workers=None, use_cache=True):
     """
     Extract complete tariff catalogue from arancel_2025.pdf
     """
@@ -37,24 +38,12 @@ def extract_arancel_catalogue():
     print(f"Source: {pdf_path}")
     print(f"Target: {db_path}")
     
-    # Read PDF
-    with open(pdf_path, 'rb') as file:
-        pdf_reader = PyPDF2.PdfReader(file)
-        num_pages = len(pdf_reader.pages)
-        print(f"\nTotal pages to process: {num_pages}")
-        
-        all_text = []
-        print("\nExtracting text from all pages...")
-        
-        for page_num in range(num_pages):
-            if (page_num + 1) % 50 == 0:
-                print(f"  Processing page {page_num + 1}/{num_pages}...")
-            
-            page = pdf_reader.pages[page_num]
-            text = page.extract_text()
-            all_text.append(text)
-        
-        print("✓ Text extraction complete")
+    # Page texts come from the page cache; pages not cached yet are
+    # extracted in a process pool
+    conn = sqlite3.connect(db_path)
+    print("\nExtracting text from all pages...")
+    all_text = extract_page_texts(conn, pdf_path, workers=workers, use_cache=use_cache)
+    print("✓ Text extraction complete")
     
     # Combine all text
     full_text = '\n'.join(all_text)
@@ -138,7 +127,6 @@ def extract_arancel_catalogue():
     
     # Save to SQLite
     print("\nCreating catalogue table in database...")
-    conn = sqlite3.connect(db_path)
     
     # Drop existing table if exists
     conn.execute("DROP TABLE IF EXISTS catalogo_arancel")
@@ -176,6 +164,12 @@ def extract_arancel_catalogue():
     return df
 
 if __name__ == "__main__":
-    df = extract_arancel_catalogue()
+    parser = argparse.ArgumentParser(description="Extract catalogo_arancel from arancel_2025.pdf")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processes used to extract uncached pages (default: all cores)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Extract every page from the PDF again and refresh the page cache")
+    args = parser.parse_args()
+    df = extract_arancel_catalogue(workers=args.workers, use_cache=not args.no_cache)
     print("\n✓ Extraction complete!")
 
@@ -0,0 +1,129 @@
+import sqlite3
+import re
+import time
+import unicodedata
+import pandas as pd
+from collections import defaultdict
+from pathlib import Path
+
+# Words shorter than this are not matched: too few n-grams to tell a typo from another word
+MIN_LENGTH = 5
+
+def fold(text):
+    """Lower-case text without accents or punctuation, words separated by one space."""
+    decomposed = unicodedata.normalize('NFKD', text)
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(re.findall(r'[a-z0-9]+', stripped.casefold()))
+
+def char_ngrams(text, n=3):
+    """Set of the character n-grams of text, padded with a space on each side."""
+    padded = f" {text} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+class NgramIndex:
+    """
+    Inverted index n-gram -> entries. search() scores only the entries
+    sharing an n-gram with the query (Dice coefficient of the n-gram sets),
+    so a lookup costs the length of the postings it touches rather than one
+    comparison per entry.
+    """
+
+    def __init__(self, n=3):
+        self.n = n
+        self.keys = []
+        self.sizes = []
+        self.postings = defaultdict(list)
+
+    def add(self, key, text):
+        grams = char_ngrams(text, self.n)
+        entry = len(self.keys)
+        self.keys.append(key)
+        self.sizes.append(len(grams))
+        for gram in grams:
+            self.postings[gram].append(entry)
+
+    def search(self, text, threshold):
+        """[(score, key)] of the entries at least threshold similar to text, best first."""
+        grams = char_ngrams(text, self.n)
+        shared = defaultdict(int)
+        for gram in grams:
+            for entry in self.postings.get(gram, ()):
+                shared[entry] += 1
+        scored = [(2 * count / (len(grams) + self.sizes[entry]), entry) for entry, count in shared.items()]
+        # Ties go to the entry added first
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [(score, self.keys[entry]) for score, entry in scored if score >= threshold]
+
+class ProductMatcher:
+    """
+    Best canonical product of a description. vocabulary maps each product to
+    its spellings, which are indexed by character trigram; every run of as
+    many words of the description as a spelling has is looked up, and the
+    most similar spelling at or above threshold wins. Results are cached per
+    distinct description.
+    """
+
+    def __init__(self, vocabulary, threshold):
+        self.threshold = threshold
+        self.index = NgramIndex()
+        self.word_counts = set()
+        for product, spellings in vocabulary.items():
+            for spelling in spellings:
+                folded = fold(spelling)
+                self.index.add(product, folded)
+                self.word_counts.add(len(folded.split()))
+        self.cache = {}
+
+    def match(self, description):
+        """(product, similarity) of the best match of description, or None."""
+        if description not in self.cache:
+            words = fold(description).split()
+            best = None
+            for count in sorted(self.word_counts):
+                for start in range(len(words) - count + 1):
+                    window = ' '.join(words[start:start + count])
+                    if len(window) < MIN_LENGTH:
+                        continue
+                    found = self.index.search(window, self.threshold)
+                    if found and (best is None or found[0][0] > best[1]):
+                        best = (found[0][1], found[0][0])
+            self.cache[description] = best
+        return self.cache[description]
+
+def show_fuzzy_matches():
+    """
+    Match every distinct catalogue and flowers_greens description of
+    chapters 6-12 against the product vocabulary and print the misspellings
+    found (descriptions that resemble a product without spelling it).
+    """
+    from product_normalization import PRODUCT_VOCABULARY, FUZZY_THRESHOLD
+
+    db_path = Path("data/imports/merged/merged_data.db")
+    conn = sqlite3.connect(db_path)
+
+    print("FUZZY PRODUCT MATCHES")
+    print("=" * 100)
+    descriptions = {row[0] for row in conn.execute(
+        "SELECT DISTINCT DESCRIPCIÓN FROM catalogo_arancel "
+        "WHERE COD_INCISO BETWEEN 60000000000 AND 129999999999 AND DESCRIPCIÓN IS NOT NULL")}
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'flowers_greens'").fetchone():
+        descriptions.update(row[0] for row in conn.execute(
+            "SELECT DISTINCT tipo_producto FROM flowers_greens WHERE tipo_producto IS NOT NULL"))
+    conn.close()
+
+    start = time.perf_counter()
+    matcher = ProductMatcher(PRODUCT_VOCABULARY, FUZZY_THRESHOLD)
+    matches = [(description, *matcher.match(description))
+               for description in sorted(descriptions) if matcher.match(description)]
+    print(f"  {len(descriptions):,} distinct descriptions matched in {time.perf_counter() - start:.2f}s, "
+          f"{len(matches):,} resemble a product")
+
+    spellings = {fold(spelling) for values in PRODUCT_VOCABULARY.values() for spelling in values}
+    misspelled = pd.DataFrame([match for match in matches
+                               if not any(spelling in fold(match[0]) for spelling in spellings)],
+                              columns=['description', 'product', 'similarity'])
+    print("\nMISSPELLINGS:")
+    print(misspelled.round(3).to_string(index=False) if len(misspelled) else "  (none)")
+
+if __name__ == "__main__":
+    show_fuzzy_matches()
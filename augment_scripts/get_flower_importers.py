@@ -6,7 +6,7 @@ db_path = Path("data/imports/merged/merged_data.db")
 conn = sqlite3.connect(db_path)
 
 flowers = ['Rosas', 'Otras Flores', 'Crisantemos', 'Claveles', 'Plantas Vivas', 
-           'Follaje', 'Azucenas', 'Gerberas', 'Gladiolas', 'Orquídeas']
+           'Follaje', 'Azucenas (Lilium)', 'Gerberas', 'Gladiolas', 'Orquídeas']
 
 print("=" * 120)
 print("TOP IMPORTERS FOR EACH TOP 10 FLOWER")
@@ -0,0 +1,327 @@
+import sqlite3
+import time
+import argparse
+import pandas as pd
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from canonical_schema import DIMENSION_TABLES, id_column
+from star_schema import storage_table
+from fuzzy_matching import fold, char_ngrams
+
+IMPORTERS_TABLE = "importadores"
+NAMES_TABLE = "importadores_nombres"
+
+# Legal-form and connector words dropped from the end of a name ('s' is the
+# S of 'S. de R.L.'): 'FLORES DEL SOL, S.A.' and 'Flores del Sol SA' both
+# become 'flores del sol'
+LEGAL_SUFFIXES = {'s', 'sa', 'srl', 'sas', 'rl', 'cv', 'inc', 'corp', 'corporation', 'ltd', 'ltda',
+                  'llc', 'co', 'cia', 'company', 'limitada', 'sociedad', 'anonima', 'y', 'de'}
+
+# Words that do not block: every other name would share them
+CONNECTORS = {'de', 'del', 'la', 'las', 'el', 'los', 'y', 'e', 'and', 'the'}
+
+# Names are only compared within a block: the names sharing the first
+# BLOCK_PREFIX letters of one of their words. Blocks larger than MAX_BLOCK
+# (common words such as 'comercial') are skipped unless a name has no other.
+BLOCK_PREFIX = 4
+MAX_BLOCK = 200
+
+# Minimum similarity (Dice coefficient of character trigrams of the keys) of two variants
+IMPORTER_THRESHOLD = 0.8
+
+# Character edits allowed within one word of a variant: one, two from this many letters
+LONG_WORD = 8
+
+def importer_key(name):
+    """
+    Comparison key of an importer name: folded, trailing legal suffixes
+    removed (also when spelt letter by letter, 'S. de R.L.') and runs of
+    single letters joined ('X Y Z' -> 'xyz').
+    """
+    words = fold(name).split()
+    while len(words) > 1:
+        if words[-1] in LEGAL_SUFFIXES:
+            words.pop()
+            continue
+        letters = 0
+        while letters < len(words) - 1 and len(words[-1 - letters]) == 1:
+            letters += 1
+        # The shortest run of trailing single letters that spells a suffix
+        spelt = next((count for count in range(2, letters + 1)
+                      if ''.join(words[-count:]) in LEGAL_SUFFIXES), None)
+        if spelt is None:
+            break
+        del words[-spelt:]
+    joined = []
+    for position, word in enumerate(words):
+        if len(word) == 1 and position and len(words[position - 1]) == 1:
+            joined[-1] += word
+        else:
+            joined.append(word)
+    return ' '.join(joined)
+
+def edit_distance(word, other, limit):
+    """Levenshtein distance of two words, or limit + 1 once it exceeds limit."""
+    if abs(len(word) - len(other)) > limit:
+        return limit + 1
+    previous = list(range(len(other) + 1))
+    for i, char in enumerate(word, 1):
+        current = [i]
+        for j, other_char in enumerate(other, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != other_char)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+def typo_variants(key, other):
+    """
+    Whether two keys can spell the same company: the same number of words,
+    and words that differ only by typos (edits within the word, none in a
+    word with digits). 'importadora 12' / 'importadora 13' and
+    'especialidades agricolas' / 'especialidades agricolas directas' are
+    different companies, however similar.
+    """
+    words, other_words = key.split(), other.split()
+    if len(words) != len(other_words):
+        return False
+    for word, other_word in zip(words, other_words):
+        if word == other_word:
+            continue
+        if any(char.isdigit() for char in word + other_word):
+            return False
+        limit = 2 if min(len(word), len(other_word)) >= LONG_WORD else 1
+        if edit_distance(word, other_word, limit) > limit:
+            return False
+    return True
+
+class UnionFind:
+    """Disjoint sets of hashable items, with path halving."""
+
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        self.parent.setdefault(item, item)
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, first, second):
+        self.parent[self.find(first)] = self.find(second)
+
+class ImporterBlocks:
+    """
+    Blocking index of importer keys: word prefix -> keys. candidates() are
+    the keys sharing a block with a key, so a key is scored against its
+    block mates instead of every name.
+    """
+
+    def __init__(self):
+        self.blocks = defaultdict(list)
+        self.grams = {}
+
+    @staticmethod
+    def block_keys(key):
+        return {word[:BLOCK_PREFIX] for word in key.split() if word not in CONNECTORS} or {key[:BLOCK_PREFIX]}
+
+    def add(self, key):
+        self.grams[key] = char_ngrams(key)
+        for block in self.block_keys(key):
+            self.blocks[block].append(key)
+
+    def candidates(self, key):
+        blocks = [self.blocks.get(block, []) for block in self.block_keys(key)]
+        small = [block for block in blocks if len(block) <= MAX_BLOCK]
+        return {other for block in (small or blocks) for other in block if other != key}
+
+    def similarity(self, key, other, threshold=0.0):
+        """
+        Dice coefficient of the trigrams of two keys; 0 when their sizes
+        alone rule threshold out or they are not typo_variants().
+        """
+        grams, other_grams = self.grams[key], self.grams[other]
+        total = len(grams) + len(other_grams)
+        if 2 * min(len(grams), len(other_grams)) < threshold * total:
+            return 0.0
+        similarity = 2 * len(grams & other_grams) / total
+        if similarity >= threshold and not typo_variants(key, other):
+            return 0.0
+        return similarity
+
+def ensure_importer_tables(conn):
+    """
+    Create the canonical importers (importer_id, nombre_canonico) and the
+    mapping of every IMPORTADOR_EXPORTADOR value to its importer_id, with
+    its comparison key and its similarity to the closest other key it was
+    matched to (none when its key matched no other). In the star schema the
+    mapping also holds the value's dim_importador key, so fact tables join
+    it on their integer IMPORTADOR_EXPORTADOR_ID.
+    """
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {IMPORTERS_TABLE} (
+            importer_id INTEGER PRIMARY KEY,
+            nombre_canonico TEXT NOT NULL,
+            creado TEXT NOT NULL
+        )
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {NAMES_TABLE} (
+            IMPORTADOR_EXPORTADOR TEXT PRIMARY KEY,
+            importer_id INTEGER NOT NULL,
+            clave TEXT NOT NULL,
+            similitud REAL,
+            IMPORTADOR_EXPORTADOR_ID INTEGER
+        )
+    """)
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({NAMES_TABLE})")}
+    if 'IMPORTADOR_EXPORTADOR_ID' not in columns:
+        conn.execute(f"ALTER TABLE {NAMES_TABLE} ADD COLUMN IMPORTADOR_EXPORTADOR_ID INTEGER")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_importadores_nombres_id ON {NAMES_TABLE}(importer_id)")
+    conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_importadores_nombres_dim "
+                 f"ON {NAMES_TABLE}(IMPORTADOR_EXPORTADOR_ID)")
+    conn.commit()
+
+def importer_names(conn):
+    """
+    {IMPORTADOR_EXPORTADOR: shipments} of every importer name in
+    merged_imports: from its importer dimension in the star schema, from
+    the table itself when it is flat.
+    """
+    table_name = storage_table(conn, 'merged_imports')
+    if table_name == 'merged_imports':
+        return dict(conn.execute("""
+            SELECT IMPORTADOR_EXPORTADOR, COUNT(*) FROM merged_imports
+            WHERE IMPORTADOR_EXPORTADOR IS NOT NULL
+            GROUP BY IMPORTADOR_EXPORTADOR
+        """))
+    dim_table = DIMENSION_TABLES['IMPORTADOR_EXPORTADOR']
+    return dict(conn.execute(f"""
+        SELECT d.value, COUNT(f.rowid)
+        FROM {dim_table} d
+        LEFT JOIN {table_name} f ON f.{id_column('IMPORTADOR_EXPORTADOR')} = d.id
+        GROUP BY d.id
+    """))
+
+def resolve_importers(conn, rebuild=False):
+    """
+    Cluster the importer names that are not mapped yet (all of them with
+    rebuild=True) and record them, in one transaction.
+
+    Names with the same key are one importer. A new key is scored against
+    the keys sharing a block with it; typo variants at or above
+    IMPORTER_THRESHOLD are joined (union-find), so variants of variants end
+    up together. A group of new names matching an existing importer joins
+    the most similar one and existing importers are never merged or
+    renamed; any other group becomes a new importer named after its most
+    frequent variant.
+    Returns (names added, importers created).
+    """
+    ensure_importer_tables(conn)
+    shipments = importer_names(conn)
+    if rebuild:
+        conn.execute(f"DELETE FROM {NAMES_TABLE}")
+        conn.execute(f"DELETE FROM {IMPORTERS_TABLE}")
+    existing = dict(conn.execute(f"SELECT clave, importer_id FROM {NAMES_TABLE}"))
+    mapped = {row[0] for row in conn.execute(f"SELECT IMPORTADOR_EXPORTADOR FROM {NAMES_TABLE}")}
+    new_names = defaultdict(list)
+    for name in shipments:
+        if name not in mapped:
+            new_names[importer_key(name)].append(name)
+
+    blocks = ImporterBlocks()
+    for key in existing:
+        blocks.add(key)
+    groups = UnionFind()
+    # key -> (similarity, existing key) of its best match among the existing importers
+    best_existing = {}
+    # key -> similarity of its best match among the new keys
+    scores = {}
+    for key in new_names:
+        if key in existing:
+            best_existing[key] = (1.0, key)
+            continue
+        blocks.add(key)
+        groups.find(key)
+        for other in blocks.candidates(key):
+            similarity = blocks.similarity(key, other, IMPORTER_THRESHOLD)
+            if similarity < IMPORTER_THRESHOLD:
+                continue
+            if other in existing:
+                if similarity > best_existing.get(key, (0, None))[0]:
+                    best_existing[key] = (similarity, other)
+            elif other in new_names:
+                groups.union(key, other)
+                for matched in (key, other):
+                    scores[matched] = max(scores.get(matched, 0), similarity)
+
+    members = defaultdict(list)
+    for key in new_names:
+        members[groups.find(key)].append(key)
+    now = datetime.now().isoformat(sep=' ', timespec='seconds')
+    rows = []
+    created = 0
+    for group in members.values():
+        matches = [best_existing[key] for key in group if key in best_existing]
+        if matches:
+            importer_id = existing[max(matches)[1]]
+        else:
+            variants = [name for key in group for name in new_names[key]]
+            canonical = max(variants, key=lambda name: (shipments[name], name))
+            importer_id = conn.execute(f"INSERT INTO {IMPORTERS_TABLE} (nombre_canonico, creado) VALUES (?, ?)",
+                                       (canonical, now)).lastrowid
+            created += 1
+        rows.extend((name, importer_id, key, best_existing.get(key, (scores.get(key),))[0])
+                    for key in group for name in new_names[key])
+    conn.executemany(f"INSERT INTO {NAMES_TABLE} (IMPORTADOR_EXPORTADOR, importer_id, clave, similitud) "
+                     f"VALUES (?, ?, ?, ?)", rows)
+    if storage_table(conn, 'merged_imports') != 'merged_imports':
+        # Also names mapped before the mapping was keyed on the dimension
+        conn.execute(f"""
+            UPDATE {NAMES_TABLE} SET IMPORTADOR_EXPORTADOR_ID = (
+                SELECT d.id FROM {DIMENSION_TABLES['IMPORTADOR_EXPORTADOR']} d
+                WHERE d.value = {NAMES_TABLE}.IMPORTADOR_EXPORTADOR
+            )
+            WHERE IMPORTADOR_EXPORTADOR_ID IS NULL
+        """)
+    conn.commit()
+    return len(rows), created
+
+def show_importers(rebuild=False):
+    """
+    Resolve the new importer names (all of them with rebuild=True) and print
+    the importers with more than one name variant.
+    """
+    db_path = Path("data/imports/merged/merged_data.db")
+    conn = sqlite3.connect(db_path)
+
+    print("IMPORTER RESOLUTION")
+    print("=" * 100)
+    start = time.perf_counter()
+    added, created = resolve_importers(conn, rebuild)
+    print(f"  {added:,} names mapped, {created:,} importers created in {time.perf_counter() - start:.2f}s")
+    totals = conn.execute(f"SELECT COUNT(*), COUNT(DISTINCT importer_id) FROM {NAMES_TABLE}").fetchone()
+    print(f"  {totals[0]:,} names -> {totals[1]:,} importers")
+
+    print("\nIMPORTERS WITH NAME VARIANTS:")
+    variants = pd.read_sql(f"""
+        SELECT i.importer_id, i.nombre_canonico, n.IMPORTADOR_EXPORTADOR as variante,
+               ROUND(n.similitud, 3) as similitud
+        FROM {IMPORTERS_TABLE} i
+        JOIN {NAMES_TABLE} n ON n.importer_id = i.importer_id
+        WHERE i.importer_id IN (SELECT importer_id FROM {NAMES_TABLE}
+                                GROUP BY importer_id HAVING COUNT(*) > 1)
+        ORDER BY i.importer_id, n.IMPORTADOR_EXPORTADOR
+        LIMIT 100
+    """, conn)
+    print(variants.to_string(index=False) if len(variants) else "  (none)")
+    conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Map importer name variants to canonical importers")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Re-cluster every name instead of matching only new names")
+    args = parser.parse_args()
+    show_importers(rebuild=args.rebuild)
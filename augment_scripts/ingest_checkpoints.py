@@ -0,0 +1,65 @@
+from datetime import datetime
+
+CHECKPOINT_TABLE = "ingest_checkpoints"
+
+def ensure_checkpoints(conn):
+    """Create the checkpoint table of the staged (not yet swapped in) merge run."""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} (
+            source_file TEXT PRIMARY KEY,
+            content_hash TEXT NOT NULL,
+            rows_committed INTEGER NOT NULL,
+            duplicate_rows INTEGER NOT NULL DEFAULT 0,
+            completed INTEGER NOT NULL,
+            full_reload INTEGER NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    """)
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({CHECKPOINT_TABLE})")}
+    if 'duplicate_rows' not in columns:
+        conn.execute(f"ALTER TABLE {CHECKPOINT_TABLE} ADD COLUMN duplicate_rows INTEGER NOT NULL DEFAULT 0")
+    conn.commit()
+
+def load_checkpoints(conn):
+    """
+    {source_file: {'content_hash', 'rows_committed', 'duplicate_rows', 'completed', 'full_reload'}}
+    rows_committed counts source rows read, including the duplicate_rows that were rejected.
+    """
+    rows = conn.execute(f"""
+        SELECT source_file, content_hash, rows_committed, duplicate_rows, completed, full_reload
+        FROM {CHECKPOINT_TABLE}
+    """).fetchall()
+    return {
+        row[0]: {'content_hash': row[1], 'rows_committed': row[2], 'duplicate_rows': row[3],
+                 'completed': bool(row[4]), 'full_reload': bool(row[5])}
+        for row in rows
+    }
+
+def _now():
+    return datetime.now().isoformat(sep=' ', timespec='seconds')
+
+def begin_checkpoint(conn, fp, full_reload):
+    """Start tracking a file; an existing checkpoint for it is kept."""
+    conn.execute(f"""
+        INSERT OR IGNORE INTO {CHECKPOINT_TABLE}
+            (source_file, content_hash, rows_committed, completed, full_reload, updated_at)
+        VALUES (?, ?, 0, 0, ?, ?)
+    """, (fp['source_file'], fp['content_hash'], int(full_reload), _now()))
+
+def advance_checkpoint(conn, source_file, rows, duplicates=0):
+    """Count rows staged for a file. Call in the transaction that inserted them."""
+    conn.execute(f"""
+        UPDATE {CHECKPOINT_TABLE}
+        SET rows_committed = rows_committed + ?, duplicate_rows = duplicate_rows + ?, updated_at = ?
+        WHERE source_file = ?
+    """, (rows, duplicates, _now(), source_file))
+
+def complete_checkpoint(conn, source_file):
+    conn.execute(f"UPDATE {CHECKPOINT_TABLE} SET completed = 1, updated_at = ? WHERE source_file = ?",
+                 (_now(), source_file))
+
+def drop_checkpoint(conn, source_file):
+    conn.execute(f"DELETE FROM {CHECKPOINT_TABLE} WHERE source_file = ?", (source_file,))
+
+def clear_checkpoints(conn):
+    conn.execute(f"DELETE FROM {CHECKPOINT_TABLE}")
@@ -0,0 +1,137 @@
+import sqlite3
+import hashlib
+import pandas as pd
+from datetime import datetime
+from pathlib import Path
+
+MANIFEST_TABLE = "ingest_manifest"
+
+def ensure_manifest(conn):
+    """Create the ingest manifest table if it does not exist yet."""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} (
+            source_file TEXT PRIMARY KEY,
+            content_hash TEXT NOT NULL,
+            file_size INTEGER NOT NULL,
+            mtime REAL NOT NULL,
+            row_count INTEGER NOT NULL,
+            duplicate_rows INTEGER NOT NULL DEFAULT 0,
+            loaded_at TEXT NOT NULL
+        )
+    """)
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({MANIFEST_TABLE})")}
+    if 'duplicate_rows' not in columns:
+        conn.execute(f"ALTER TABLE {MANIFEST_TABLE} ADD COLUMN duplicate_rows INTEGER NOT NULL DEFAULT 0")
+    conn.commit()
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 of the file contents, read in 1 MB chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def fingerprint(conn, path):
+    """
+    Describe a file as it is on disk now.
+    The hash recorded in the manifest is reused when size and mtime are unchanged,
+    so unchanged workbooks are not re-read.
+    """
+    stat = path.stat()
+    row = conn.execute(
+        f"SELECT content_hash, file_size, mtime FROM {MANIFEST_TABLE} WHERE source_file = ?",
+        (path.name,)
+    ).fetchone()
+    if row and row[1] == stat.st_size and row[2] == stat.st_mtime:
+        content_hash = row[0]
+    else:
+        content_hash = file_hash(path)
+    return {
+        'source_file': path.name,
+        'content_hash': content_hash,
+        'file_size': stat.st_size,
+        'mtime': stat.st_mtime,
+    }
+
+def plan_ingest(conn, xlsx_files):
+    """
+    Compare the files on disk with the manifest.
+    Returns a dict of lists: 'unchanged' and 'changed' / 'new' (paths with their
+    fingerprints) plus 'missing' (manifest entries with no file on disk).
+    """
+    recorded = dict(conn.execute(f"SELECT source_file, content_hash FROM {MANIFEST_TABLE}").fetchall())
+    plan = {'unchanged': [], 'changed': [], 'new': [], 'missing': []}
+
+    for path in xlsx_files:
+        fp = fingerprint(conn, path)
+        if path.name not in recorded:
+            plan['new'].append((path, fp))
+        elif recorded[path.name] != fp['content_hash']:
+            plan['changed'].append((path, fp))
+        else:
+            plan['unchanged'].append((path, fp))
+
+    on_disk = {path.name for path in xlsx_files}
+    plan['missing'] = sorted(name for name in recorded if name not in on_disk)
+    return plan
+
+def record_file(conn, fp, row_count, duplicate_rows=0):
+    """
+    Record a loaded file. Call inside the transaction that inserted its rows.
+    row_count is the rows stored; duplicate_rows the rows rejected as already loaded.
+    """
+    conn.execute(f"""
+        INSERT OR REPLACE INTO {MANIFEST_TABLE}
+            (source_file, content_hash, file_size, mtime, row_count, duplicate_rows, loaded_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (fp['source_file'], fp['content_hash'], fp['file_size'], fp['mtime'],
+          row_count, duplicate_rows, datetime.now().isoformat(sep=' ', timespec='seconds')))
+
+def forget_file(conn, source_file):
+    """Drop a file from the manifest so the next run loads it as new."""
+    conn.execute(f"DELETE FROM {MANIFEST_TABLE} WHERE source_file = ?", (source_file,))
+
+def clear_manifest(conn):
+    conn.execute(f"DELETE FROM {MANIFEST_TABLE}")
+
+def show_manifest():
+    """
+    Print the manifest and what the next merge run would do with each file.
+    """
+    imports_dir = Path("data/imports")
+    db_path = imports_dir / "merged" / "merged_data.db"
+
+    if not db_path.exists():
+        print(f"Database not found at {db_path}")
+        return
+
+    conn = sqlite3.connect(db_path)
+    ensure_manifest(conn)
+
+    print("INGEST MANIFEST")
+    print("=" * 100)
+    df = pd.read_sql(f"SELECT * FROM {MANIFEST_TABLE} ORDER BY source_file", conn)
+    print(df.to_string(index=False) if not df.empty else "(empty)")
+
+    plan = plan_ingest(conn, sorted(imports_dir.glob("*.xlsx")))
+    print("\nNEXT RUN:")
+    for status in ('unchanged', 'changed', 'new'):
+        print(f"  {status}: {len(plan[status])}")
+        for path, _ in plan[status]:
+            if status != 'unchanged':
+                print(f"    - {path.name}")
+    if plan['missing']:
+        print(f"  recorded but not on disk (rows kept): {', '.join(plan['missing'])}")
+
+    staged = conn.execute("SELECT name FROM sqlite_master WHERE name = 'ingest_checkpoints'").fetchone()
+    if staged:
+        df = pd.read_sql("SELECT * FROM ingest_checkpoints ORDER BY source_file", conn)
+        if not df.empty:
+            print("\nINTERRUPTED RUN (resumes on the next merge):")
+            print(df.to_string(index=False))
+
+    conn.close()
+
+if __name__ == "__main__":
+    show_manifest()
@@ -1,13 +1,413 @@
 import pandas as pd
 import sqlite3
 import os
+import sys
+import time
+import argparse
+import multiprocessing as mp
+from datetime import datetime, date
 from pathlib import Path
+from openpyxl import load_workbook
+from ingest_manifest import (ensure_manifest, plan_ingest, record_file,
+                             clear_manifest)
+from ingest_checkpoints import (ensure_checkpoints, load_checkpoints, begin_checkpoint,
+                                advance_checkpoint, complete_checkpoint, drop_checkpoint,
+                                clear_checkpoints)
+from scan_xlsx_headers import scan_headers, print_drift_report
+from bulk_load import BulkLoadSession
+from canonical_schema import (CANONICAL_COLUMNS, canonical_columns, build_row_mapper, table_ddl,
+                              column_type, is_canonical_table, fact_columns, METRICS)
+from schema_migrations import apply_migrations
+from derived_metrics import ensure_metrics_table, record_metrics
+from star_schema import (ensure_dimensions, dimension_id, drop_table_or_view,
+                         create_presentation_view, DimensionEncoder)
 
-def merge_xlsx_to_sqlite():
+BATCH_SIZE = 10000
+
+# Secondary indexes of merged_imports_fact: file replacement by source_file,
+# date-range seeks on day_number and chapter / code-range seeks for the
+# flowers_greens build. yyyymm is left unindexed: whole-table monthly
+# GROUP BYs would walk a bare yyyymm index and fetch every row out of order,
+# which is slower than scanning the table.
+FACT_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_mi_source_file ON "{table}"(source_file_id)',
+    'CREATE INDEX IF NOT EXISTS idx_mi_day_number ON "{table}"(day_number)',
+    'CREATE INDEX IF NOT EXISTS idx_mi_capitulo_inciso ON "{table}"(COD_CAPITULO, COD_INCISO)',
+]
+
+def to_sqlite_value(value):
+    """Convert an openpyxl cell value to what pandas.to_sql would have stored."""
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day).isoformat(sep=' ')
+    return value
+
+def iter_xlsx_batches(xlsx_file, all_columns, batch_size=BATCH_SIZE, rejected=None, skip_rows=0):
+    """
+    Stream the first sheet of a workbook in fixed-size batches of row tuples.
+    Rows are mapped to the canonical all_columns layout: headers renamed,
+    values coerced to the declared column types, missing columns None,
+    FECHA_KEY derived and source_file filled in. Values that
+    fail coercion are counted per column in `rejected`. The first skip_rows
+    non-empty rows (already loaded by an interrupted run) are read but not mapped.
+    Uses openpyxl read-only mode so memory stays flat regardless of workbook size.
+    """
+    wb = load_workbook(xlsx_file, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+
+        map_row = build_row_mapper(header, all_columns, xlsx_file.name,
+                                   convert=to_sqlite_value, rejected=rejected)
+
+        batch = []
+        skipped = 0
+        for row in rows:
+            if not any(v is not None for v in row):
+                continue
+            if skipped < skip_rows:
+                skipped += 1
+                continue
+            batch.append(map_row(row))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        wb.close()
+
+def create_table(conn, table_name, all_columns):
+    """(Re)create the target as a STRICT table with the declared column types."""
+    conn.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+    conn.execute(table_ddl(table_name, all_columns))
+    conn.commit()
+
+def insert_batch(conn, table_name, all_columns, batch):
+    """
+    Insert one batch of aligned row tuples with a single executemany.
+    The METRICS columns are computed from the other values of the row in the
+    same statement, so no UPDATE pass rewrites the rows afterwards.
+    Rows whose ROW_HASH is already in the table are skipped; returns the rows inserted.
+    """
+    placeholders = ', '.join(f'? AS "{col}"' for col in all_columns)
+    column_list = ', '.join(f'"{col}"' for col in all_columns)
+    values = ', '.join(METRICS[col][0] if col in METRICS else f'"{col}"' for col in all_columns)
+    cursor = conn.executemany(
+        f'INSERT OR IGNORE INTO "{table_name}" ({column_list}) SELECT {values} FROM (SELECT {placeholders})',
+        batch
+    )
+    return cursor.rowcount
+
+def stream_file_to_sqlite(conn, table_name, xlsx_file, all_columns, batch_size=BATCH_SIZE,
+                          skip_rows=0, on_batch=None, encoder=None):
+    """
+    Load one workbook batch by batch.
+    Returns (rows_read, elapsed_seconds, rejected, duplicates), where duplicates
+    are rows skipped because their ROW_HASH was already loaded.
+    on_batch(rows, duplicates) is called after each insert, e.g. to checkpoint
+    and commit; otherwise nothing is committed here. With a DimensionEncoder,
+    rows are written to a fact table with dimension keys instead of values.
+    """
+    start = time.perf_counter()
+    rows_added = 0
+    duplicates = 0
+    rejected = {}
+    columns = fact_columns(all_columns) if encoder else all_columns
+    for batch in iter_xlsx_batches(xlsx_file, all_columns, batch_size, rejected, skip_rows):
+        rows = encoder.encode(batch) if encoder else batch
+        batch_duplicates = len(batch) - insert_batch(conn, table_name, columns, rows)
+        rows_added += len(batch)
+        duplicates += batch_duplicates
+        if on_batch:
+            on_batch(len(batch), batch_duplicates)
+    return rows_added, time.perf_counter() - start, rejected, duplicates
+
+def format_rejected(rejected):
+    """'COL=n, ...' summary of values that could not be coerced to their column type."""
+    return ', '.join(f"{col}={count:,}" for col, count in sorted(rejected.items()))
+
+# Parse workers put batches on this queue; set per process by _init_parse_worker
+_batch_queue = None
+
+def _init_parse_worker(queue):
+    global _batch_queue
+    _batch_queue = queue
+
+def _parse_file_worker(file_index, xlsx_file, all_columns, batch_size, skip_rows=0):
+    """
+    Pool task: parse one workbook and stream its batches to the writer.
+    Sends ('batch', idx, rows) messages followed by
+    ('done', idx, rows, seconds, rejected) or ('error', idx, message).
+    Never touches the database.
+    """
+    start = time.perf_counter()
+    rows_parsed = 0
+    rejected = {}
+    try:
+        for batch in iter_xlsx_batches(xlsx_file, all_columns, batch_size, rejected, skip_rows):
+            _batch_queue.put(('batch', file_index, batch))
+            rows_parsed += len(batch)
+    except Exception as e:
+        _batch_queue.put(('error', file_index, str(e)))
+        return
+    _batch_queue.put(('done', file_index, rows_parsed, time.perf_counter() - start, rejected))
+
+def merge_files_parallel(conn, table_name, xlsx_files, all_columns, workers,
+                         batch_size=BATCH_SIZE, skip_rows=None, on_rows_written=None,
+                         on_file_loaded=None, encoder=None):
+    """
+    Parse workbooks in a process pool while this process stays the only SQLite writer.
+
+    Batches of the earliest unfinished file (in sorted source_file order) go straight
+    into table_name and are committed one by one. Batches of files that finish
+    parsing early are spilled to a TEMP table and copied over once every earlier
+    file is written, so the final row order is the same as a sequential load.
+    skip_rows[i] rows of file i are skipped (already loaded by an earlier run).
+    Rows whose ROW_HASH is already loaded are dropped and counted per file.
+    on_rows_written(index, rows, duplicates) and on_file_loaded(index, rows) are called in
+    the transaction that writes those rows, so checkpoints stay in step with the
+    data. A file that fails keeps its committed rows. With a DimensionEncoder,
+    the writer replaces dimension values by keys. Returns the total rows written.
+    """
+    queue = mp.Queue(maxsize=workers * 4)
+    stage_tables = {}     # file index -> temp table holding its early batches
+    finished = {}         # file index -> (rows, seconds) or error message
+    duplicates = {}       # file index -> rows dropped as duplicates
+    next_index = 0
+    total_rows = 0
+    skip_rows = skip_rows or [0] * len(xlsx_files)
+    columns = fact_columns(all_columns) if encoder else all_columns
+
+    def rows_written(idx, rows, inserted):
+        duplicates[idx] = duplicates.get(idx, 0) + rows - inserted
+        if on_rows_written and rows:
+            on_rows_written(idx, rows, rows - inserted)
+
+    def flush_stage(idx):
+        stage = stage_tables.pop(idx)
+        column_list = ', '.join(f'"{col}"' for col in columns)
+        rows = conn.execute(f'SELECT COUNT(*) FROM temp."{stage}"').fetchone()[0]
+        cursor = conn.execute(f'INSERT OR IGNORE INTO main."{table_name}" ({column_list}) '
+                              f'SELECT {column_list} FROM temp."{stage}" ORDER BY rowid')
+        conn.execute(f'DROP TABLE temp."{stage}"')
+        rows_written(idx, rows, cursor.rowcount)
+
+    with mp.Pool(processes=workers, initializer=_init_parse_worker, initargs=(queue,)) as pool:
+        for idx, xlsx_file in enumerate(xlsx_files):
+            pool.apply_async(_parse_file_worker,
+                             (idx, xlsx_file, all_columns, batch_size, skip_rows[idx]))
+
+        while len(finished) < len(xlsx_files):
+            message = queue.get()
+            kind, idx = message[0], message[1]
+
+            if kind == 'batch':
+                batch = encoder.encode(message[2]) if encoder else message[2]
+                if idx == next_index and idx not in stage_tables:
+                    inserted = insert_batch(conn, table_name, columns, batch)
+                    rows_written(idx, len(batch), inserted)
+                    conn.commit()
+                else:
+                    if idx not in stage_tables:
+                        stage_tables[idx] = f"stage_{idx}"
+                        conn.execute(table_ddl(stage_tables[idx], columns, temp=True))
+                    insert_batch(conn, stage_tables[idx], columns, batch)
+                continue
+
+            finished[idx] = message[2:] if kind == 'done' else message[2]
+
+            # Write out every file whose predecessors are all complete
+            while next_index < len(xlsx_files):
+                result = finished.get(next_index)
+                name = xlsx_files[next_index].name
+                if isinstance(result, str):
+                    if next_index in stage_tables:
+                        conn.execute(f'DROP TABLE temp."{stage_tables.pop(next_index)}"')
+                    print(f"  - Error processing {name}: {result}")
+                else:
+                    if next_index in stage_tables:
+                        flush_stage(next_index)
+                    if result is None:
+                        break
+                    rows_added, elapsed, rejected = result
+                    total_rows += rows_added
+                    rate = rows_added / elapsed if elapsed > 0 else 0
+                    print(f"  {name}: {rows_added:,} rows parsed in {elapsed:.1f}s "
+                          f"({rate:,.0f} rows/sec) (Total: {total_rows:,})")
+                    if rejected:
+                        print(f"    Values stored as NULL (wrong type): {format_rejected(rejected)}")
+                    if duplicates.get(next_index):
+                        print(f"    Duplicate rows skipped: {duplicates[next_index]:,}")
+                    if on_file_loaded:
+                        on_file_loaded(next_index, rows_added)
+                conn.commit()
+                next_index += 1
+
+    conn.commit()
+    return total_rows
+
+def add_missing_columns(conn, table_name, all_columns):
+    """Add columns that appeared in new workbooks to an existing table."""
+    existing = {row[1] for row in conn.execute(f'PRAGMA table_info("{table_name}")')}
+    for col in all_columns:
+        if col not in existing:
+            print(f"  Adding new column: {col}")
+            conn.execute(f'ALTER TABLE "{table_name}" ADD COLUMN "{col}" {column_type(col)}')
+
+def prepare_staging(conn, staging_name, stored_columns, to_load):
+    """
+    Keep the staged rows of an interrupted run that can be reused.
+
+    Checkpoints of files that are no longer part of the run, or whose content
+    changed since they were staged, are dropped together with their rows.
+    Returns the remaining checkpoints.
+    """
+    checkpoints = load_checkpoints(conn)
+    staged = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                          (staging_name,)).fetchone()
+    if (not staged or not checkpoints
+            or not is_canonical_table(conn, staging_name, fact_columns(CANONICAL_COLUMNS))):
+        create_table(conn, staging_name, stored_columns)
+        clear_checkpoints(conn)
+        conn.commit()
+        return {}
+
+    add_missing_columns(conn, staging_name, stored_columns)
+    wanted = {fp['source_file']: fp['content_hash'] for _, fp in to_load}
+    for name, checkpoint in sorted(checkpoints.items()):
+        if wanted.get(name) == checkpoint['content_hash']:
+            state = 'complete' if checkpoint['completed'] else 'partial'
+            print(f"  {name}: {checkpoint['rows_committed']:,} rows already staged ({state})")
+            continue
+        cursor = conn.execute(f'DELETE FROM "{staging_name}" WHERE source_file_id = ?',
+                              (dimension_id(conn, 'source_file', name),))
+        drop_checkpoint(conn, name)
+        del checkpoints[name]
+        print(f"  {name}: discarded {cursor.rowcount:,} staged rows (file changed or not in this run)")
+    conn.commit()
+    return checkpoints
+
+def staged_in_file_order(conn, staging_name):
+    """
+    True if every file's staged rows form one block and the blocks are sorted by
+    source_file. A file resumed after a failure ends up behind later files.
+    """
+    ranges = conn.execute(f'''
+        SELECT MIN(s.rowid), MAX(s.rowid)
+        FROM "{staging_name}" s JOIN dim_source_file d ON d.id = s.source_file_id
+        GROUP BY d.value ORDER BY d.value
+    ''').fetchall()
+    return all(prev[1] < cur[0] for prev, cur in zip(ranges, ranges[1:]))
+
+def swap_in_staging(conn, view_name, table_name, staging_name, stored_columns, to_load,
+                    full_reload):
+    """
+    Publish the staged rows in one transaction, so readers see either the old
+    or the new merged_imports and never a partial load.
+
+    Full reload: the staging table is renamed over the fact table (replacing a
+    pre-star-schema merged_imports table too) and the indexes
+    are recreated (rows are first put back in source_file order if a resumed file
+    left them out of order). Incremental: the old rows of every loaded file are replaced by
+    the staged ones; staged rows already present from other files are skipped
+    and counted as duplicates. The manifest is updated and the checkpoints
+    cleared in the same transaction, and the merged_imports view is recreated
+    over the fact table.
+    """
+    checkpoints = load_checkpoints(conn)
+    row_counts = {name: cp['rows_committed'] - cp['duplicate_rows'] for name, cp in checkpoints.items()}
+    duplicate_counts = {name: cp['duplicate_rows'] for name, cp in checkpoints.items()}
+    column_list = ', '.join(f'"{col}"' for col in stored_columns)
+
+    if full_reload and not staged_in_file_order(conn, staging_name):
+        print("  Restoring source_file row order after resumed files")
+        ordered_name = f"{staging_name}_ordered"
+        create_table(conn, ordered_name, stored_columns)
+        staged_list = ', '.join(f's."{col}"' for col in stored_columns)
+        conn.execute(f'INSERT INTO "{ordered_name}" ({column_list}) '
+                     f'SELECT {staged_list} '
+                     f'FROM "{staging_name}" s JOIN dim_source_file d ON d.id = s.source_file_id '
+                     f'ORDER BY d.value, s.rowid')
+        conn.execute(f'DROP TABLE "{staging_name}"')
+        conn.execute(f'ALTER TABLE "{ordered_name}" RENAME TO "{staging_name}"')
+        conn.commit()
+
+    conn.execute("BEGIN")
+    try:
+        if full_reload:
+            indexes = [row[0] for row in conn.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+                (table_name,))]
+            conn.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+            drop_table_or_view(conn, view_name)
+            # Views that read the fact table are left alone rather than re-validated
+            conn.execute("PRAGMA legacy_alter_table = ON")
+            conn.execute(f'ALTER TABLE "{staging_name}" RENAME TO "{table_name}"')
+            conn.execute("PRAGMA legacy_alter_table = OFF")
+            for sql in indexes + [sql.format(table=table_name) for sql in FACT_INDEXES]:
+                conn.execute(sql)
+            clear_manifest(conn)
+        else:
+            file_ids = {path.name: dimension_id(conn, 'source_file', path.name) for path, _ in to_load}
+            for path, _ in to_load:
+                cursor = conn.execute(f'DELETE FROM "{table_name}" WHERE source_file_id = ?',
+                                      (file_ids[path.name],))
+                if cursor.rowcount:
+                    print(f"  {path.name}: replaced {cursor.rowcount:,} old rows")
+            for path, _ in to_load:
+                cursor = conn.execute(f'INSERT OR IGNORE INTO "{table_name}" ({column_list}) '
+                                      f'SELECT {column_list} FROM "{staging_name}" '
+                                      f'WHERE source_file_id = ? ORDER BY rowid', (file_ids[path.name],))
+                already_loaded = row_counts[path.name] - cursor.rowcount
+                if already_loaded:
+                    print(f"  {path.name}: {already_loaded:,} rows already loaded from other files")
+                row_counts[path.name] -= already_loaded
+                duplicate_counts[path.name] += already_loaded
+            conn.execute(f'DROP TABLE "{staging_name}"')
+        create_presentation_view(conn, view_name, table_name)
+        for path, fp in to_load:
+            record_file(conn, fp, row_counts[path.name], duplicate_counts[path.name])
+        clear_checkpoints(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def merge_xlsx_to_sqlite(batch_size=BATCH_SIZE, workers=1, full_reload=False):
     """
     Merge all XLSX files from data/imports into a single SQLite database.
-    Uses chunked processing to avoid memory issues with large datasets.
     Handles files with different column structures by collecting all unique columns.
+
+    Rows are written in their final form in a single pass: PAÍS_DE_PROCEDENCIA_DESTINO
+    is renamed and columns follow reorder_columns.new_column_order as rows stream
+    in, so no follow-up table rewrite is needed. PRECIO_UNIDAD and the other
+    derived metrics (canonical_schema.METRICS) are computed by the INSERT of
+    each row.
+
+    Workbooks are read row by row in batches of batch_size (openpyxl read-only)
+    and inserted with executemany, so peak memory does not depend on workbook
+    size. workers > 1 parses files in a process pool; this process remains the
+    single database writer.
+
+    Loads are incremental: the ingest_manifest table records each file's hash,
+    size, mtime and row count. Unchanged files are skipped, changed files have
+    their rows replaced, new files are appended. full_reload=True rebuilds the
+    table from scratch.
+
+    Storage is a star schema: rows go to merged_imports_fact with the repeated
+    text columns replaced by integer keys into dim_* tables, and merged_imports
+    is a view that joins the values back in under the original column names.
+
+    Loads are resumable: rows go into merged_imports_fact_staging and every committed
+    batch is checkpointed in ingest_checkpoints. An interrupted or failed run
+    leaves merged_imports untouched and the next run continues from the last
+    checkpoint. The staged rows are swapped in only once every file has loaded.
+    Returns True if the merge completed.
     """
     # Define paths
     imports_dir = Path("data/imports")
@@ -19,78 +419,170 @@ def merge_xlsx_to_sqlite():
 
     if not xlsx_files:
         print("No XLSX files found in data/imports")
-        return
+        return False
 
     print(f"Found {len(xlsx_files)} XLSX files to merge")
 
-    # First pass: collect all unique columns from all files
-    print("\nScanning files to identify all columns...")
-    all_columns = set()
-    file_columns = {}
-
-    for xlsx_file in xlsx_files:
-        try:
-            # Read just the header to get column names
-            df_header = pd.read_excel(xlsx_file, nrows=0)
-            cols = list(df_header.columns)
-            file_columns[xlsx_file.name] = cols
-            all_columns.update(cols)
-            print(f"  {xlsx_file.name}: {len(cols)} columns")
-        except Exception as e:
-            print(f"  Error reading {xlsx_file.name}: {e}")
-
-    # Add source_file column
-    all_columns.add('source_file')
-    all_columns = sorted(list(all_columns))
-
-    print(f"\nTotal unique columns found: {len(all_columns)}")
-
-    # Create SQLite connection
     conn = sqlite3.connect(db_path)
-    table_name = "merged_imports"
+    view_name = "merged_imports"
+    table_name = "merged_imports_fact"
+    staging_name = f"{table_name}_staging"
 
-    total_rows = 0
+    # First pass: collect all unique columns from all files (header rows only, cached by hash)
+    print("\nScanning files to identify all columns...")
+    file_columns = scan_headers(conn, xlsx_files)
 
-    # Second pass: process each file and normalize columns
-    print("\nProcessing files...")
-    for i, xlsx_file in enumerate(xlsx_files):
-        print(f"Processing {xlsx_file.name}...")
-        try:
-            df = pd.read_excel(xlsx_file)
+    print("\nColumn drift between files:")
+    print_drift_report(file_columns)
 
-            # Add source file column
-            df['source_file'] = xlsx_file.name
+    # Canonical column order, plus any columns the canonical layout does not know
+    all_columns = canonical_columns(file_columns)
 
-            # Add missing columns with None values
-            for col in all_columns:
-                if col not in df.columns:
-                    df[col] = None
+    stored_columns = fact_columns(all_columns)
 
-            # Reorder columns to match all_columns
-            df = df[all_columns]
+    print(f"\nTotal columns in merged_imports: {len(all_columns)}")
 
-            # Write to SQLite in chunks
-            if_exists = 'replace' if i == 0 else 'append'
-            df.to_sql(table_name, conn, if_exists=if_exists, index=False, chunksize=10000)
+    ensure_manifest(conn)
+    ensure_checkpoints(conn)
+    ensure_dimensions(conn)
 
-            rows_added = len(df)
-            total_rows += rows_added
-            print(f"  - Added {rows_added:,} rows (Total: {total_rows:,})")
+    existing = [row[1] for row in conn.execute(f'PRAGMA table_info("{table_name}")')]
+    if not existing and conn.execute(f'PRAGMA table_info("{view_name}")').fetchone():
+        print(f"\n{view_name} is not in the star-schema layout - rebuilding it")
+        full_reload = True
+    elif existing and not is_canonical_table(conn, table_name, fact_columns(CANONICAL_COLUMNS)):
+        print("\nExisting table is not in the canonical typed layout - rebuilding it")
+        full_reload = True
+    if not full_reload and any(cp['full_reload'] for cp in load_checkpoints(conn).values()):
+        print("\nResuming an interrupted full reload")
+        full_reload = True
+    if existing and not full_reload:
+        add_missing_columns(conn, table_name, stored_columns)
+        for sql in FACT_INDEXES:
+            conn.execute(sql.format(table=table_name))
+        conn.commit()
 
-            # Free memory
-            del df
+    plan = plan_ingest(conn, xlsx_files)
+    if full_reload or not existing:
+        full_reload = True
+        print("\nFull reload: staging every file")
+        to_load = plan['unchanged'] + plan['changed'] + plan['new']
+    else:
+        print(f"\nManifest: {len(plan['unchanged'])} unchanged, "
+              f"{len(plan['changed'])} changed, {len(plan['new'])} new")
+        for name in plan['missing']:
+            print(f"  {name} is in the manifest but not on disk - its rows are kept")
+        to_load = plan['changed'] + plan['new']
+    to_load = sorted(to_load, key=lambda item: item[0].name)
 
-        except Exception as e:
-            print(f"  - Error processing {xlsx_file.name}: {e}")
+    if not to_load:
+        print("\nNothing to load - all files are unchanged")
+        conn.close()
+        return True
 
-    print(f"\nTotal rows merged: {total_rows:,}")
+    print(f"\nStaging table: {staging_name}")
+    checkpoints = prepare_staging(conn, staging_name, stored_columns, to_load)
+    pending = [(path, fp) for path, fp in to_load
+               if not checkpoints.get(path.name, {}).get('completed')]
+    for path, fp in pending:
+        begin_checkpoint(conn, fp, full_reload)
+    conn.commit()
+
+    files_to_load = [path for path, _ in pending]
+    skip_rows = [checkpoints.get(path.name, {}).get('rows_committed', 0) for path in files_to_load]
+    total_rows = 0
+    encoder = DimensionEncoder(conn, all_columns)
+
+    # Fast PRAGMAs for the load. Every batch is committed with its checkpoint, so a
+    # crash loses at most one batch. Spilled parallel batches stay on disk so
+    # memory remains bounded.
+    session = BulkLoadSession(conn, defer_indexes=False, commit_rows=None,
+                              pragmas={'temp_store': 'FILE'} if workers > 1 else None)
+    with session:
+        if not files_to_load:
+            print("\nEvery file is already staged")
+        elif workers > 1:
+            print(f"\nParsing {len(files_to_load)} files with {workers} workers "
+                  f"(batch size: {batch_size:,})...")
+            total_rows = merge_files_parallel(
+                conn, staging_name, files_to_load, all_columns, workers, batch_size,
+                skip_rows=skip_rows,
+                on_rows_written=lambda idx, rows, dups: advance_checkpoint(
+                    conn, files_to_load[idx].name, rows, dups),
+                on_file_loaded=lambda idx, rows: complete_checkpoint(conn, files_to_load[idx].name),
+                encoder=encoder
+            )
+        else:
+            print(f"\nStreaming {len(files_to_load)} files (batch size: {batch_size:,})...")
+            for xlsx_file, skip in zip(files_to_load, skip_rows):
+                print(f"Processing {xlsx_file.name}...")
+                if skip:
+                    print(f"  - Resuming after {skip:,} staged rows")
+
+                def checkpoint_batch(rows, duplicates, name=xlsx_file.name):
+                    advance_checkpoint(conn, name, rows, duplicates)
+                    conn.commit()
+
+                try:
+                    rows_added, elapsed, rejected, duplicates = stream_file_to_sqlite(
+                        conn, staging_name, xlsx_file, all_columns, batch_size,
+                        skip_rows=skip, on_batch=checkpoint_batch, encoder=encoder
+                    )
+                    complete_checkpoint(conn, xlsx_file.name)
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    encoder.reload()
+                    print(f"  - Error processing {xlsx_file.name}: {e}")
+                    continue
+                total_rows += rows_added
+                rate = rows_added / elapsed if elapsed > 0 else 0
+                print(f"  - Added {rows_added:,} rows in {elapsed:.1f}s "
+                      f"({rate:,.0f} rows/sec) (Total: {total_rows:,})")
+                if rejected:
+                    print(f"    Values stored as NULL (wrong type): {format_rejected(rejected)}")
+                if duplicates:
+                    print(f"    Duplicate rows skipped: {duplicates:,}")
+
+    checkpoints = load_checkpoints(conn)
+    incomplete = [path.name for path, _ in to_load if not checkpoints[path.name]['completed']]
+    if incomplete:
+        print(f"\nMerge incomplete - {len(incomplete)} file(s) failed: {', '.join(incomplete)}")
+        print(f"{view_name} was not changed. Staged rows and checkpoints are kept; "
+              f"run the merge again to resume.")
+        conn.close()
+        return False
+
+    print(f"\nSwapping {staging_name} into {table_name}...")
+    start = time.perf_counter()
+    with BulkLoadSession(conn, defer_indexes=False, pragmas={'synchronous': 'FULL'}, verbose=False):
+        swap_in_staging(conn, view_name, table_name, staging_name, stored_columns, to_load,
+                        full_reload)
+    print(f"  Done in {time.perf_counter() - start:.1f}s")
+    # The merge writes the current layout, so pending migrations are only recorded
+    apply_migrations(conn)
+    if full_reload:
+        # Every row was just computed with the current metric definitions
+        ensure_metrics_table(conn)
+        record_metrics(conn, table_name, METRICS)
+        conn.commit()
+
+    print("\nDuplicate rows skipped per file:")
+    loaded = {row[0]: row[1:] for row in conn.execute(
+        "SELECT source_file, row_count, duplicate_rows FROM ingest_manifest")}
+    merged_rows = 0
+    for path, _ in to_load:
+        rows, duplicate_rows = loaded[path.name]
+        merged_rows += rows
+        print(f"  {path.name}: {rows:,} rows stored, {duplicate_rows:,} duplicates")
+    print(f"\nTotal rows merged: {merged_rows:,} ({total_rows:,} read in this run)")
     print(f"Data saved to SQLite database: {db_path}")
-    print(f"Table name: {table_name}")
+    print(f"Table name: {view_name} (view over {table_name})")
     print(f"\nColumns in merged data ({len(all_columns)}): {all_columns}")
 
     # Display sample data
     try:
-        sample_df = pd.read_sql(f"SELECT * FROM {table_name} LIMIT 5", conn)
+        sample_df = pd.read_sql(f"SELECT * FROM {view_name} LIMIT 5", conn)
         print(f"\nFirst few rows:")
         print(sample_df)
     except Exception as e:
@@ -98,7 +590,18 @@ def merge_xlsx_to_sqlite():
 
     conn.close()
     print("\nMerge complete!")
+    return True
 
 if __name__ == "__main__":
-    merge_xlsx_to_sqlite()
-
+    parser = argparse.ArgumentParser(description="Merge data/imports/*.xlsx into merged_data.db")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help=f"Rows per executemany batch (default: {BATCH_SIZE})")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Parse workbooks in N processes with a single SQLite writer")
+    parser.add_argument("--full-reload", action="store_true",
+                        help="Ignore the ingest manifest and rebuild merged_imports from scratch")
+    args = parser.parse_args()
+    completed = merge_xlsx_to_sqlite(batch_size=args.batch_size, workers=args.workers,
+                                     full_reload=args.full_reload)
+    if not completed:
+        sys.exit(1)
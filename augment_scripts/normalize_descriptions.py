@@ -1,6 +1,8 @@
 import sqlite3
 import pandas as pd
 from pathlib import Path
+from star_schema import storage_table, create_presentation_view
+from product_normalization import PRODUCT_CODES, ensure_mapping_tables, normalize_table
 
 def normalize_product_descriptions():
     """
@@ -46,19 +48,12 @@ def normalize_product_descriptions():
     
     # Update with normalized names
     # Rule 1: For "Los demás" - use chapter context
-    update_query = """
+    product_codes = "\n        ".join(f"WHEN COD_INCISO = {code} THEN '{label}'" for code, label in PRODUCT_CODES.items())
+    update_query = f"""
     UPDATE catalogo_arancel
     SET producto_normalizado = CASE
         -- Specific flower types (Chapter 6)
-        WHEN COD_INCISO = 60311000000 THEN 'Rosas'
-        WHEN COD_INCISO = 60312000000 THEN 'Claveles'
-        WHEN COD_INCISO = 60313000000 THEN 'Orquídeas'
-        WHEN COD_INCISO = 60314000000 THEN 'Crisantemos'
-        WHEN COD_INCISO = 60315000000 THEN 'Azucenas (Lilium)'
-        WHEN COD_INCISO = 60319600000 THEN 'Gerberas'
-        WHEN COD_INCISO = 60319920000 THEN 'Gladiolas'
-        WHEN COD_INCISO = 60319930000 THEN 'Anturios'
-        WHEN COD_INCISO = 60319940000 THEN 'Heliconias'
+        {product_codes}
         
         -- Generic "Los demás" in flowers (0603.19.99)
         WHEN COD_PARTIDA = 603 AND (DESCRIPCIÓN LIKE '%demás%' OR DESCRIPCIÓN LIKE '%otros%') 
@@ -96,63 +91,31 @@ def normalize_product_descriptions():
     # Now update flowers_greens table
     print("\n3. UPDATING flowers_greens TABLE...")
     
+    # flowers_greens is a view over flowers_greens_fact in the star-schema layout
+    fg_table = storage_table(conn, 'flowers_greens')
     try:
-        conn.execute("ALTER TABLE flowers_greens ADD COLUMN producto_normalizado TEXT")
+        conn.execute(f"ALTER TABLE {fg_table} ADD COLUMN producto_normalizado TEXT")
+        if fg_table != 'flowers_greens':
+            create_presentation_view(conn, 'flowers_greens', fg_table)
         conn.commit()
         print("✓ Added producto_normalizado column to flowers_greens")
     except:
         print("✓ Column already exists in flowers_greens")
     
-    # Update flowers_greens with normalized names
-    # Apply same normalization logic directly to tipo_producto
-    update_fg = """
-    UPDATE flowers_greens
-    SET producto_normalizado = CASE
-        -- Specific flower types
-        WHEN tipo_producto LIKE '%Rosas%' OR tipo_producto LIKE '%ROSAS%' THEN 'Rosas'
-        WHEN tipo_producto LIKE '%Claveles%' OR tipo_producto LIKE '%CLAVELES%' THEN 'Claveles'
-        WHEN tipo_producto LIKE '%Orquídeas%' OR tipo_producto LIKE '%ORQUIDEAS%' THEN 'Orquídeas'
-        WHEN tipo_producto LIKE '%Crisantemos%' OR tipo_producto LIKE '%CRISANTEMOS%' THEN 'Crisantemos'
-        WHEN tipo_producto LIKE '%Gerberas%' OR tipo_producto LIKE '%GERBERAS%' THEN 'Gerberas'
-        WHEN tipo_producto LIKE '%Gladiolas%' OR tipo_producto LIKE '%GLADIOLAS%' THEN 'Gladiolas'
-        WHEN tipo_producto LIKE '%Heliconias%' OR tipo_producto LIKE '%HELICONIAS%' THEN 'Heliconias'
-        WHEN tipo_producto LIKE '%Anturios%' OR tipo_producto LIKE '%ANTURIOS%' THEN 'Anturios'
-        WHEN tipo_producto LIKE '%Astromerias%' OR tipo_producto LIKE '%ASTROMERIAS%' THEN 'Astromerias'
-
-        -- Generic "Los demás" / "Otros" in flowers (Chapter 6, Partida 603)
-        WHEN (tipo_producto LIKE '%demás%' OR tipo_producto LIKE '%otros%' OR tipo_producto LIKE '%otras%')
-             AND categoria_agricola = 'Flores'
-             THEN 'Flores Frescas - Otras Variedades'
-
-        -- Generic in foliage/plants
-        WHEN (tipo_producto LIKE '%demás%' OR tipo_producto LIKE '%otros%' OR tipo_producto LIKE '%otras%')
-             AND (categoria_agricola = 'Follaje' OR tipo_producto LIKE '%Follaje%')
-             THEN 'Follaje y Ramas - Otros'
-
-        -- Generic in vegetables (Chapter 7)
-        WHEN (tipo_producto LIKE '%demás%' OR tipo_producto LIKE '%otros%' OR tipo_producto LIKE '%otras%')
-             AND (categoria_agricola = 'Vegetales' OR tipo_producto LIKE '%Hortalizas%' OR tipo_producto LIKE '%plantas%')
-             THEN 'Vegetales - Hortalizas, plantas, raíces  y'
-
-        -- Generic in fruits (Chapter 8)
-        WHEN (tipo_producto LIKE '%demás%' OR tipo_producto LIKE '%otros%' OR tipo_producto LIKE '%otras%')
-             AND (categoria_agricola = 'Frutas' OR tipo_producto LIKE '%frutos%' OR tipo_producto LIKE '%frutas%')
-             THEN 'Frutas - Las frutas y otros frutos refr'
-
-        -- Clean up leading dashes and spaces
-        WHEN tipo_producto LIKE '- - - - %' THEN TRIM(SUBSTR(tipo_producto, 9))
-        WHEN tipo_producto LIKE '- - - %' THEN TRIM(SUBSTR(tipo_producto, 7))
-        WHEN tipo_producto LIKE '- - %' THEN TRIM(SUBSTR(tipo_producto, 5))
-        WHEN tipo_producto LIKE '- %' THEN TRIM(SUBSTR(tipo_producto, 3))
-
-        -- Keep original if already specific
-        ELSE TRIM(tipo_producto)
-    END
-    """
+    # Update flowers_greens with normalized names: the distinct (tipo_producto, COD_INCISO)
+    # pairs are classified once into the mapping, then each row is filled from it
+    ensure_mapping_tables(conn)
+    _, added, updated = normalize_table(conn, 'flowers_greens')
+    conn.commit()
+    print(f"✓ Updated flowers_greens with normalized names ({added:,} new pairs, {updated:,} rows changed)")
 
-    conn.execute(update_fg)
+    # Covers the per-product monthly trend queries (built after the update so it is written once)
+    conn.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_fg_producto_yyyymm ON {fg_table}
+        (producto_normalizado, yyyymm, CANTIDAD, PRECIO_UNIDAD, TOTAL_A_PAGAR)
+    """)
     conn.commit()
-    print("✓ Updated flowers_greens with normalized names")
+    print("✓ Indexed flowers_greens by product and month")
     
     # Show results
     print("\n4. RESULTS - Normalized names:")
@@ -0,0 +1,192 @@
+import sqlite3
+import os
+import time
+import argparse
+import multiprocessing as mp
+import PyPDF2
+import pandas as pd
+from datetime import datetime
+from pathlib import Path
+from ingest_manifest import file_hash
+
+PDF_FILES_TABLE = "pdf_cache_files"
+PAGE_CACHE_TABLE = "pdf_page_cache"
+
+def ensure_page_cache(conn):
+    """
+    Create the page text cache: one row per (PDF content hash, page), plus the
+    page count and last seen size/mtime of every cached PDF.
+    """
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {PDF_FILES_TABLE} (
+            content_hash TEXT PRIMARY KEY,
+            source_file TEXT NOT NULL,
+            file_size INTEGER NOT NULL,
+            mtime REAL NOT NULL,
+            page_count INTEGER NOT NULL,
+            cached_at TEXT NOT NULL
+        )
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {PAGE_CACHE_TABLE} (
+            content_hash TEXT NOT NULL,
+            page INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            PRIMARY KEY (content_hash, page)
+        ) WITHOUT ROWID
+    """)
+    conn.commit()
+
+def pdf_fingerprint(conn, pdf_path):
+    """
+    (content_hash, page_count) of a PDF. A file whose name, size and mtime
+    match a cached entry is neither hashed nor opened.
+    """
+    stat = pdf_path.stat()
+    row = conn.execute(f"""
+        SELECT content_hash, page_count FROM {PDF_FILES_TABLE}
+        WHERE source_file = ? AND file_size = ? AND mtime = ?
+    """, (pdf_path.name, stat.st_size, stat.st_mtime)).fetchone()
+    if row:
+        return row[0], row[1]
+
+    content_hash = file_hash(pdf_path)
+    row = conn.execute(f"SELECT page_count FROM {PDF_FILES_TABLE} WHERE content_hash = ?",
+                       (content_hash,)).fetchone()
+    page_count = row[0] if row else len(PyPDF2.PdfReader(str(pdf_path)).pages)
+    conn.execute(f"""
+        INSERT OR REPLACE INTO {PDF_FILES_TABLE}
+            (content_hash, source_file, file_size, mtime, page_count, cached_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (content_hash, pdf_path.name, stat.st_size, stat.st_mtime, page_count,
+          datetime.now().isoformat(sep=' ', timespec='seconds')))
+    conn.commit()
+    return content_hash, page_count
+
+# Each pool process opens the PDF once; set by _init_page_worker
+_pdf_reader = None
+
+def _init_page_worker(pdf_path):
+    global _pdf_reader
+    _pdf_reader = PyPDF2.PdfReader(str(pdf_path))
+
+def _extract_page_worker(page):
+    """Pool task: (page, text) of one zero-based page."""
+    return page, _pdf_reader.pages[page].extract_text()
+
+def _extract_pages(conn, pdf_path, content_hash, pages, workers=None, verbose=True):
+    """
+    Extract the given zero-based pages in a pool of `workers` processes
+    (default: all cores), add them to the cache and return {page: text}.
+    """
+    texts = {}
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    if workers > 1 and len(pages) > 1:
+        with mp.Pool(processes=min(workers, len(pages)), initializer=_init_page_worker,
+                     initargs=(pdf_path,)) as pool:
+            chunksize = max(1, len(pages) // (workers * 8))
+            extracted = pool.imap_unordered(_extract_page_worker, pages, chunksize=chunksize)
+            for done, (page, text) in enumerate(extracted, 1):
+                texts[page] = text
+                if verbose and done % 50 == 0:
+                    print(f"    Extracted {done}/{len(pages)} pages...")
+    else:
+        _init_page_worker(pdf_path)
+        for done, page in enumerate(pages, 1):
+            texts[page] = _extract_page_worker(page)[1]
+            if verbose and done % 50 == 0:
+                print(f"    Extracted {done}/{len(pages)} pages...")
+
+    conn.executemany(f"INSERT OR REPLACE INTO {PAGE_CACHE_TABLE} (content_hash, page, text) "
+                     f"VALUES (?, ?, ?)",
+                     [(content_hash, page, texts[page]) for page in pages])
+    conn.commit()
+    if verbose:
+        print(f"  Extracted {len(pages)} pages in {time.perf_counter() - start:.1f}s "
+              f"with {min(workers, len(pages))} process(es)")
+    return texts
+
+def extract_page_texts(conn, pdf_path, pages=None, workers=None, use_cache=True, verbose=True):
+    """
+    Text of the given zero-based pages (default: all) in the given order.
+
+    Pages already in the cache for this PDF's content hash are read from the
+    database; the others are extracted in a pool of `workers` processes
+    (default: all cores) and added to the cache. With use_cache=False every
+    requested page is extracted again and the cache refreshed.
+    """
+    ensure_page_cache(conn)
+    content_hash, page_count = pdf_fingerprint(conn, pdf_path)
+    pages = list(range(page_count)) if pages is None else list(pages)
+
+    texts = {}
+    if use_cache and pages:
+        # Only the span of the requested pages is read from the cache
+        for page, text in conn.execute(f"SELECT page, text FROM {PAGE_CACHE_TABLE} "
+                                       f"WHERE content_hash = ? AND page BETWEEN ? AND ?",
+                                       (content_hash, min(pages), max(pages))):
+            texts[page] = text
+    missing = [page for page in pages if page not in texts]
+    if verbose:
+        print(f"  {pdf_path.name}: {page_count} pages, {len(pages) - len(missing)} cached, "
+              f"{len(missing)} to extract")
+    if missing:
+        texts.update(_extract_pages(conn, pdf_path, content_hash, missing, workers, verbose))
+
+    return [texts[page] for page in pages]
+
+def iter_page_texts(conn, pdf_path, workers=None, use_cache=True, verbose=True):
+    """
+    Text of every page in page order, one page at a time: pages missing from
+    the cache are extracted and cached first, then all are read back from
+    the cache, so only one page is held in memory at a time.
+    """
+    ensure_page_cache(conn)
+    content_hash, page_count = pdf_fingerprint(conn, pdf_path)
+    cached = set()
+    if use_cache:
+        cached = {row[0] for row in conn.execute(
+            f"SELECT page FROM {PAGE_CACHE_TABLE} WHERE content_hash = ?", (content_hash,))}
+    missing = [page for page in range(page_count) if page not in cached]
+    if verbose:
+        print(f"  {pdf_path.name}: {page_count} pages, {page_count - len(missing)} cached, "
+              f"{len(missing)} to extract")
+    if missing:
+        _extract_pages(conn, pdf_path, content_hash, missing, workers, verbose)
+
+    for (text,) in conn.execute(f"SELECT text FROM {PAGE_CACHE_TABLE} "
+                                f"WHERE content_hash = ? AND page < ? ORDER BY page",
+                                (content_hash, page_count)):
+        yield text
+
+def show_page_cache(workers=None, refresh=False):
+    """
+    Fill the page cache for data/docs/arancel_2025.pdf and print what is cached.
+    """
+    pdf_path = Path("data/docs/arancel_2025.pdf")
+    db_path = Path("data/imports/merged/merged_data.db")
+    conn = sqlite3.connect(db_path)
+
+    print("PDF PAGE CACHE")
+    print("=" * 100)
+    start = time.perf_counter()
+    extract_page_texts(conn, pdf_path, workers=workers, use_cache=not refresh)
+    print(f"  All pages available in {time.perf_counter() - start:.1f}s")
+
+    print("\nCACHED PDFS:")
+    print(pd.read_sql(f"""
+        SELECT f.source_file, f.content_hash, f.page_count, COUNT(p.page) AS cached_pages,
+               SUM(LENGTH(p.text)) AS characters, f.cached_at
+        FROM {PDF_FILES_TABLE} f LEFT JOIN {PAGE_CACHE_TABLE} p ON p.content_hash = f.content_hash
+        GROUP BY f.content_hash
+    """, conn).to_string(index=False))
+    conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill and show the PDF page text cache")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processes used to extract pages (default: all cores)")
+    parser.add_argument("--refresh", action="store_true", help="Extract every page again")
+    args = parser.parse_args()
+    show_page_cache(workers=args.workers, refresh=args.refresh)
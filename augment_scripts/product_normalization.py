@@ -0,0 +1,380 @@
+import sqlite3
+import ast
+import hashlib
+import string
+import time
+import pandas as pd
+from functools import lru_cache
+from datetime import datetime
+from pathlib import Path
+from star_schema import storage_table, create_presentation_view
+from fuzzy_matching import ProductMatcher, fold
+
+MAPPING_TABLE = "normalizacion_productos"
+RULES_TABLE = "normalizacion_reglas"
+
+# Flower products with a tariff code of their own: the tipo_producto of their
+# flowers_greens rows (data_marts.py) and the producto_normalizado of their
+# catalogue entries (normalize_descriptions.py)
+PRODUCT_CODES = {
+    60311000000: 'Rosas',
+    60312000000: 'Claveles',
+    60313000000: 'Orquídeas',
+    60314000000: 'Crisantemos',
+    60315000000: 'Azucenas (Lilium)',
+    60319600000: 'Gerberas',
+    60319920000: 'Gladiolas',
+    60319930000: 'Anturios',
+    60319940000: 'Heliconias',
+}
+
+# Conditions on a (tipo_producto, COD_INCISO) pair, with the semantics of the
+# SQL they replace: 'contains' / 'starts' are LIKE '%x%' / 'x%' (ASCII
+# case-insensitive), 'chapter' / 'heading' compare COD_INCISO / 10^10 and
+# (COD_INCISO / 10^8) % 100, 'any' holds when one of its conditions does.
+GENERIC = ('contains', 'demás', 'otros', 'otras', 'Otros')
+
+# Canonical flower products and their spellings in the catalogue and the
+# imports. Each product gets a rule matching its spellings in TAXONOMY, and
+# misspellings of them (PDF and OCR noise such as 'Serberas' or 'Sysofilia')
+# are matched by character n-gram similarity (fuzzy_matching.py).
+PRODUCT_VOCABULARY = {
+    'Rosas': ('Rosas',),
+    'Claveles': ('Claveles',),
+    'Orquídeas': ('Orquídeas', 'Orquideas'),
+    'Crisantemos': ('Crisantemos',),
+    'Gerberas': ('Gerberas',),
+    'Gladiolas': ('Gladiolas',),
+    'Heliconias': ('Heliconias',),
+    'Anturios': ('Anturios',),
+    'Astromerias': ('Astromerias',),
+    'Ginger': ('Ginger',),
+    'Ave del Paraíso': ('Ave del paraíso',),
+    'Calas': ('Calas',),
+    'Gypsophila': ('Gypsophila', 'Gysofilia', 'Gipsófila'),
+    'Estatice': ('Estatice', 'Estaticias'),
+    'Agapantos': ('Agapantos',),
+    'Azucenas (Lilium)': ('Azucenas', 'Lilium'),
+}
+
+# Minimum similarity (Dice coefficient of character trigrams) of a misspelling
+FUZZY_THRESHOLD = 0.65
+
+def rule_name(label):
+    """'Ave del Paraíso' -> 'ave_del_paraiso'."""
+    return '_'.join(fold(label).split())
+
+# The product taxonomy: rule name -> (conditions, action). producto_normalizado
+# of a flowers_greens row comes from the first rule whose conditions all hold:
+# its label, ('strip', n) for the description without its first n characters,
+# or ('closest', threshold, vocabulary) for the product of vocabulary the
+# description resembles most (the rule does not apply when none reaches
+# threshold); otherwise the trimmed description. Every run publishes this into
+# normalizacion_reglas, where a rule whose definition changed gets a new
+# version, and only the pairs the change can affect are reclassified.
+TAXONOMY = {
+    # Specific flower types (keep these first for priority)
+    **{rule_name(label): ([('contains', *spellings)], label) for label, spellings in PRODUCT_VOCABULARY.items()},
+    # Misspelled flower types
+    'variantes': ([('chapter', 6)], ('closest', FUZZY_THRESHOLD, PRODUCT_VOCABULARY)),
+
+    # Generic terms by tariff chapter; chapter 6 = flowers and plants
+    'otras_flores': ([GENERIC, ('chapter', 6), ('any', ('heading', 3), ('contains', 'flores', 'Flores'))],
+                     'Flores Frescas - Otras Variedades'),
+    'otro_follaje': ([GENERIC, ('chapter', 6), ('heading', 4)], 'Follaje y Ramas - Otros'),
+    'otras_plantas': ([GENERIC, ('chapter', 6)], 'Plantas Vivas - Otras'),
+    'otros_vegetales': ([GENERIC, ('chapter', 7)], 'Vegetales - Hortalizas, plantas, raíces  y'),
+    'otras_frutas': ([GENERIC, ('chapter', 8)], 'Frutas - Las frutas y otros frutos refr'),
+    'otros_cafe_te_especias': ([GENERIC, ('chapter', 9)], 'Café, Té, Especias - Otros'),
+    'otros_cereales': ([GENERIC, ('chapter', 10)], 'Cereales - Otros'),
+    'otras_semillas': ([GENERIC, ('chapter', 12)], 'Semillas y Plantas - Otros'),
+
+    # Fallback for any remaining generic terms
+    'otros_agricolas': ([('contains', 'demás', 'otros', 'otras')], 'Productos Agrícolas - Otros'),
+
+    # Clean up leading dashes for everything else
+    'guiones_4': ([('starts', '- - - - ')], ('strip', 8)),
+    'guiones_3': ([('starts', '- - - ')], ('strip', 6)),
+    'guiones_2': ([('starts', '- - ')], ('strip', 4)),
+    'guiones_1': ([('starts', '- ')], ('strip', 2)),
+}
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+def ascii_fold(text):
+    """Lower-case ASCII letters only, as SQLite's LIKE compares them."""
+    return text.translate(_ASCII_LOWER)
+
+def compile_condition(condition):
+    """Predicate (folded tipo_producto, COD_INCISO) -> bool of a rule condition."""
+    kind, *args = condition
+    if kind == 'contains':
+        needles = [ascii_fold(needle) for needle in args]
+        return lambda text, code: any(needle in text for needle in needles)
+    if kind == 'starts':
+        prefix = ascii_fold(args[0])
+        return lambda text, code: text.startswith(prefix)
+    if kind == 'chapter':
+        return lambda text, code: code is not None and code // 10**10 == args[0]
+    if kind == 'heading':
+        return lambda text, code: code is not None and (code // 10**8) % 100 == args[0]
+    if kind == 'any':
+        predicates = [compile_condition(sub) for sub in args]
+        return lambda text, code: any(predicate(text, code) for predicate in predicates)
+    raise ValueError(f"Unknown rule condition: {kind}")
+
+@lru_cache(maxsize=None)
+def product_matcher(threshold, vocabulary):
+    """One ProductMatcher (and match cache) per vocabulary, shared by the compiled rules."""
+    return ProductMatcher(dict(vocabulary), threshold)
+
+def compile_action(action):
+    """tipo_producto -> producto_normalizado (None: the rule does not apply) of a rule's action."""
+    if isinstance(action, str):
+        return lambda text: action
+    kind, *args = action
+    if kind == 'strip':
+        # TRIM(SUBSTR(tipo_producto, count + 1)): SQLite's TRIM removes spaces only
+        count = args[0]
+        return lambda text: text[count:].strip(' ')
+    if kind == 'closest':
+        threshold, vocabulary = args
+        matcher = product_matcher(threshold, tuple((product, tuple(spellings))
+                                                   for product, spellings in vocabulary.items()))
+        return lambda text: (matcher.match(text) or (None,))[0]
+    raise ValueError(f"Unknown rule action: {kind}")
+
+class ProductNormalizer:
+    """
+    Ordered taxonomy rules compiled to Python predicates. rules are
+    (name, version, (conditions, action)), in priority order.
+    """
+
+    def __init__(self, rules):
+        self.rules = [(name, version, [compile_condition(condition) for condition in conditions],
+                       compile_action(action))
+                      for name, version, (conditions, action) in rules]
+
+    @classmethod
+    def from_database(cls, conn):
+        """The rules currently in force in normalizacion_reglas, so edits apply without a restart."""
+        return cls((name, version, ast.literal_eval(definition)) for name, version, definition in conn.execute(
+            f"SELECT regla, version, definicion FROM {RULES_TABLE} WHERE vigente_hasta IS NULL ORDER BY posicion"))
+
+    def classify(self, tipo_producto, cod_inciso):
+        """(producto_normalizado, rule, rule version); no rule for the trimmed default."""
+        if tipo_producto is None:
+            return None, None, None
+        folded = ascii_fold(tipo_producto)
+        for name, version, predicates, action in self.rules:
+            if all(predicate(folded, cod_inciso) for predicate in predicates):
+                label = action(tipo_producto)
+                if label is not None:
+                    return label, name, version
+        return tipo_producto.strip(' '), None, None
+
+def definition_hash(definition):
+    return hashlib.sha256(definition.encode('utf-8')).hexdigest()
+
+def ensure_mapping_tables(conn):
+    """
+    Create the versioned rule table (one row per rule version; the rules in
+    force have no vigente_hasta) and the mapping of distinct (tipo_producto,
+    COD_INCISO) pairs to their producto_normalizado and the rule version that
+    produced it. Tables in an older layout are dropped: both are rebuilt from
+    TAXONOMY and the rows.
+    """
+    for table_name in (MAPPING_TABLE, RULES_TABLE):
+        columns = {row[1] for row in conn.execute(f'PRAGMA table_info("{table_name}")')}
+        if columns and 'regla' not in columns:
+            conn.execute(f"DROP TABLE {table_name}")
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {RULES_TABLE} (
+            regla TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            posicion INTEGER NOT NULL,
+            definicion TEXT NOT NULL,
+            definition_hash TEXT NOT NULL,
+            vigente_desde TEXT NOT NULL,
+            vigente_hasta TEXT,
+            PRIMARY KEY (regla, version)
+        )
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {MAPPING_TABLE} (
+            tipo_producto TEXT,
+            COD_INCISO INTEGER,
+            producto_normalizado TEXT,
+            regla TEXT,
+            version_regla INTEGER,
+            PRIMARY KEY (tipo_producto, COD_INCISO)
+        )
+    """)
+    conn.commit()
+
+def publish_taxonomy(conn, taxonomy=TAXONOMY):
+    """
+    Record taxonomy in normalizacion_reglas, in the caller's transaction: a
+    new or changed rule gets a new version, a removed one is closed and a
+    moved one keeps its version at its new position.
+
+    Returns (stable, revised, closed) rule names. A pair matched by a stable
+    rule keeps its classification: the rule and every rule before it are
+    unchanged and were before it already. Otherwise a pair can only change
+    if it was matched by a closed rule (changed or removed) or a revised
+    rule (new, changed or reordered) now matches it.
+    """
+    current = {row[0]: row[1:] for row in conn.execute(
+        f"SELECT regla, version, posicion, definition_hash FROM {RULES_TABLE} WHERE vigente_hasta IS NULL")}
+    now = datetime.now().isoformat(sep=' ', timespec='seconds')
+    unchanged = []
+    revised = set()
+    for position, (name, rule) in enumerate(taxonomy.items()):
+        definition = repr(rule)
+        rule_hash = definition_hash(definition)
+        if name in current and current[name][2] == rule_hash:
+            unchanged.append(name)
+            if current[name][1] != position:
+                conn.execute(f"UPDATE {RULES_TABLE} SET posicion = ? WHERE regla = ? AND version = ?",
+                             (position, name, current[name][0]))
+            continue
+        revised.add(name)
+        conn.execute(f"UPDATE {RULES_TABLE} SET vigente_hasta = ? WHERE regla = ? AND vigente_hasta IS NULL",
+                     (now, name))
+        conn.execute(f"""
+            INSERT INTO {RULES_TABLE} (regla, version, posicion, definicion, definition_hash, vigente_desde)
+            SELECT ?, COALESCE(MAX(version), 0) + 1, ?, ?, ?, ? FROM {RULES_TABLE} WHERE regla = ?
+        """, (name, position, definition, rule_hash, now, name))
+    closed = (current.keys() - taxonomy.keys()) | (revised & current.keys())
+    for name in current.keys() - taxonomy.keys():
+        conn.execute(f"UPDATE {RULES_TABLE} SET vigente_hasta = ? WHERE regla = ? AND vigente_hasta IS NULL",
+                     (now, name))
+
+    # Unchanged rules whose order relative to each other flipped
+    for i, first in enumerate(unchanged):
+        for second in unchanged[i + 1:]:
+            if current[first][1] > current[second][1]:
+                revised.update((first, second))
+
+    stable = set()
+    for position, name in enumerate(taxonomy):
+        if name not in unchanged:
+            break
+        if name not in revised:
+            stable.add(name)
+    return stable, revised, closed
+
+# producto_normalizado of a row of `table` from the mapping: one primary key seek
+# (IS so that NULL descriptions and codes match too)
+LOOKUP = """(SELECT m.producto_normalizado FROM {mapping} m
+             WHERE m.tipo_producto IS {table}.tipo_producto AND m.COD_INCISO IS {table}.COD_INCISO)"""
+
+def sync_mapping(conn, table_name, where=None, params=(), taxonomy=TAXONOMY):
+    """
+    Bring the mapping up to date, in the caller's transaction. After a
+    taxonomy change only the pairs the change can affect (see
+    publish_taxonomy) are reclassified; then the pairs of the rows of
+    table_name matching where (all rows when None) that are not mapped yet
+    are classified and added.
+    Returns (pairs reclassified, descriptions whose label changed, pairs added).
+    """
+    stable, revised, closed = publish_taxonomy(conn, taxonomy)
+    normalizer = ProductNormalizer.from_database(conn)
+    reclassified = 0
+    relabelled = set()
+    if revised or closed:
+        revised_rules = ProductNormalizer((name, None, taxonomy[name]) for name in taxonomy if name in revised)
+        marks = ', '.join('?' for _ in stable)
+        candidates = conn.execute(f"""
+            SELECT tipo_producto, COD_INCISO, producto_normalizado, regla, version_regla FROM {MAPPING_TABLE}
+            WHERE regla IS NULL OR regla NOT IN ({marks})
+        """, sorted(stable)).fetchall()
+        updates = []
+        for tipo_producto, cod_inciso, *stored in candidates:
+            if stored[1] not in closed and revised_rules.classify(tipo_producto, cod_inciso)[1] is None:
+                continue
+            reclassified += 1
+            result = normalizer.classify(tipo_producto, cod_inciso)
+            if list(result) != stored:
+                updates.append((*result, tipo_producto, cod_inciso))
+            if result[0] != stored[0]:
+                relabelled.add(tipo_producto)
+        conn.executemany(f"UPDATE {MAPPING_TABLE} SET producto_normalizado = ?, regla = ?, version_regla = ? "
+                         f"WHERE tipo_producto IS ? AND COD_INCISO IS ?", updates)
+
+    pairs = conn.execute(f"""
+        SELECT DISTINCT t.tipo_producto, t.COD_INCISO
+        FROM {table_name} t
+        WHERE {where or '1'} AND NOT EXISTS (
+            SELECT 1 FROM {MAPPING_TABLE} m
+            WHERE m.tipo_producto IS t.tipo_producto AND m.COD_INCISO IS t.COD_INCISO)
+    """, params).fetchall()
+    conn.executemany(f"INSERT INTO {MAPPING_TABLE} "
+                     f"(tipo_producto, COD_INCISO, producto_normalizado, regla, version_regla) VALUES (?, ?, ?, ?, ?)",
+                     [(tipo_producto, cod_inciso, *normalizer.classify(tipo_producto, cod_inciso))
+                      for tipo_producto, cod_inciso in pairs])
+    return reclassified, relabelled, len(pairs)
+
+def normalize_table(conn, view_name='flowers_greens', where=None, params=(), taxonomy=TAXONOMY):
+    """
+    Set producto_normalizado on the rows of view_name's storage table
+    matching where (all rows when None) from the mapping, in the caller's
+    transaction; the column is added when missing. Rows of descriptions a
+    taxonomy change relabelled are updated too, whatever where says. Only
+    rows whose value differs are written.
+    Returns (pairs reclassified, pairs added, rows updated).
+    """
+    table_name = storage_table(conn, view_name)
+    if 'producto_normalizado' not in {row[1] for row in conn.execute(f'PRAGMA table_info("{table_name}")')}:
+        conn.execute(f"ALTER TABLE {table_name} ADD COLUMN producto_normalizado TEXT")
+        if table_name != view_name:
+            create_presentation_view(conn, view_name, table_name)
+    reclassified, relabelled, added = sync_mapping(conn, table_name, where, params, taxonomy)
+
+    lookup = LOOKUP.format(mapping=MAPPING_TABLE, table=table_name)
+    condition = f"producto_normalizado IS NOT {lookup}"
+    if where:
+        scope = [f"({where})"]
+        if relabelled:
+            conn.execute("DROP TABLE IF EXISTS temp.relabelled_products")
+            conn.execute("CREATE TEMP TABLE relabelled_products (tipo_producto TEXT PRIMARY KEY)")
+            conn.executemany("INSERT INTO temp.relabelled_products VALUES (?)", [(t,) for t in relabelled])
+            scope.append("tipo_producto IN (SELECT tipo_producto FROM temp.relabelled_products)")
+        condition = f"({' OR '.join(scope)}) AND {condition}"
+    updated = conn.execute(f"UPDATE {table_name} SET producto_normalizado = {lookup} WHERE {condition}",
+                           params if where else ()).rowcount
+    if where and relabelled:
+        conn.execute("DROP TABLE temp.relabelled_products")
+    return reclassified, added, updated
+
+def show_mapping():
+    """
+    Normalize flowers_greens through the mapping and print the rules in
+    force with the pairs and rows each one classifies.
+    """
+    db_path = Path("data/imports/merged/merged_data.db")
+    conn = sqlite3.connect(db_path)
+
+    print("PRODUCT NORMALIZATION MAPPING")
+    print("=" * 100)
+    ensure_mapping_tables(conn)
+    start = time.perf_counter()
+    reclassified, added, updated = normalize_table(conn)
+    conn.commit()
+    print(f"  {reclassified:,} pairs reclassified, {added:,} pairs added, {updated:,} rows updated "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    print(f"\n{RULES_TABLE} (rules in force):")
+    print(pd.read_sql(f"""
+        SELECT r.posicion, r.regla, r.version, r.vigente_desde,
+               COUNT(m.tipo_producto) as pairs
+        FROM {RULES_TABLE} r
+        LEFT JOIN {MAPPING_TABLE} m ON m.regla = r.regla AND m.version_regla = r.version
+        WHERE r.vigente_hasta IS NULL
+        GROUP BY r.regla, r.version
+        ORDER BY r.posicion
+    """, conn).to_string(index=False))
+    conn.close()
+
+if __name__ == "__main__":
+    show_mapping()
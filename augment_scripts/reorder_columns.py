@@ -2,11 +2,46 @@ import sqlite3
 import pandas as pd
 from pathlib import Path
 
+# Canonical column order for merged_imports
+new_column_order = [
+    'FECHA_IMPORTACION_EXPORTACION',
+    'IMPORTADOR_EXPORTADOR',
+    'PAIS_DE_PROCEDENCIA_DESTINO',  # Renamed from PAÍS_DE_PROCEDENCIA_DESTINO
+    'COD_INCISO',
+    'COD_CAPITULO',
+    'COD_PARTIDA',
+    'COD_SUBPARTIDA',
+    'CATEGORIA',
+    'DESCRIPCIÓN',
+    'PUNTO_ENTRADA_PAIS',
+    'PRECIO_UNIDAD',
+    'CANTIDAD',
+    'UNIDAD',
+    'PESO_NETO',
+    'PESO_BRUTO',
+    'VALOR_FOB',
+    'VALOR_FLETE',
+    'VALOR_SEGURO',
+    'VALOR_CIF',
+    'IMPUESTO_IMPORTACION',
+    'ITBMS',
+    'IMP_PROTECCION_PETROLEO',
+    'IMPUESTOS_ISC',
+    'TOTAL_A_PAGAR',
+    'MODO_TRANSPORTE',
+    'source_file'
+]
+
 def reorder_columns():
     """
     Reorder columns in the merged_imports table and rename PAÍS_DE_PROCEDENCIA_DESTINO.
-    Creates a new table with the correct column order, then replaces the old one.
+    Both are versioned migrations (see schema_migrations.py): the rename is an
+    ALTER TABLE ... RENAME COLUMN, and the table is only rewritten (in chunks,
+    swapped in atomically) when it is a flat table out of order.
     """
+    # Imported here: schema_migrations reads new_column_order from this module
+    from schema_migrations import apply_migrations, current_version
+
     db_path = Path("data/imports/merged/merged_data.db")
     
     if not db_path.exists():
@@ -16,65 +51,11 @@ def reorder_columns():
     print(f"Connecting to database: {db_path}")
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
-    
-    # Define the new column order
-    new_column_order = [
-        'FECHA_IMPORTACION_EXPORTACION',
-        'IMPORTADOR_EXPORTADOR',
-        'PAIS_DE_PROCEDENCIA_DESTINO',  # Renamed from PAÍS_DE_PROCEDENCIA_DESTINO
-        'COD_INCISO',
-        'COD_CAPITULO',
-        'COD_PARTIDA',
-        'COD_SUBPARTIDA',
-        'CATEGORIA',
-        'DESCRIPCIÓN',
-        'PUNTO_ENTRADA_PAIS',
-        'PRECIO_UNIDAD',
-        'CANTIDAD',
-        'UNIDAD',
-        'PESO_NETO',
-        'PESO_BRUTO',
-        'VALOR_FOB',
-        'VALOR_FLETE',
-        'VALOR_SEGURO',
-        'VALOR_CIF',
-        'IMPUESTO_IMPORTACION',
-        'ITBMS',
-        'IMP_PROTECCION_PETROLEO',
-        'IMPUESTOS_ISC',
-        'TOTAL_A_PAGAR',
-        'MODO_TRANSPORTE',
-        'source_file'
-    ]
-    
-    print("\nCreating new table with reordered columns...")
-    print("This may take several minutes for 9.5 million rows...")
-    
-    # Create the SELECT statement with renamed column
-    select_columns = []
-    for col in new_column_order:
-        if col == 'PAIS_DE_PROCEDENCIA_DESTINO':
-            select_columns.append('PAÍS_DE_PROCEDENCIA_DESTINO AS PAIS_DE_PROCEDENCIA_DESTINO')
-        else:
-            select_columns.append(col)
-    
-    select_statement = ', '.join(select_columns)
-    
-    # Create new table with reordered columns
-    print("\nStep 1: Creating temporary table with new structure...")
-    cursor.execute(f"""
-        CREATE TABLE merged_imports_new AS
-        SELECT {select_statement}
-        FROM merged_imports
-    """)
-    
-    print("Step 2: Dropping old table...")
-    cursor.execute("DROP TABLE merged_imports")
-    
-    print("Step 3: Renaming new table...")
-    cursor.execute("ALTER TABLE merged_imports_new RENAME TO merged_imports")
-    
-    conn.commit()
+
+    if not apply_migrations(conn):
+        print(f"Schema is already at version {current_version(conn)}. Nothing to do.")
+        conn.close()
+        return
     
     print("\n✓ Columns reordered successfully!")
     
@@ -0,0 +1,216 @@
+import sqlite3
+import json
+import re
+import time
+import posixpath
+import unicodedata
+import zipfile
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from pathlib import Path
+from ingest_manifest import file_hash
+
+SCHEMA_CACHE_TABLE = "ingest_schema_cache"
+
+def _local(tag):
+    """Strip the XML namespace from a tag: '{ns}row' -> 'row'."""
+    return tag.rsplit('}', 1)[-1]
+
+def _column_index(cell_ref):
+    """Convert a cell reference like 'AB1' to a zero-based column index."""
+    letters = re.match(r'[A-Z]+', cell_ref).group(0)
+    index = 0
+    for letter in letters:
+        index = index * 26 + (ord(letter) - ord('A') + 1)
+    return index - 1
+
+def _first_sheet_path(zf):
+    """Locate the first worksheet's XML part via workbook.xml and its relationships."""
+    workbook = ET.fromstring(zf.read('xl/workbook.xml'))
+    first_sheet = next(el for el in workbook.iter() if _local(el.tag) == 'sheet')
+    rel_id = next(v for k, v in first_sheet.attrib.items() if _local(k) == 'id')
+
+    rels = ET.fromstring(zf.read('xl/_rels/workbook.xml.rels'))
+    target = next(el.get('Target') for el in rels if el.get('Id') == rel_id)
+    if target.startswith('/'):
+        return target.lstrip('/')
+    return posixpath.normpath(posixpath.join('xl', target))
+
+def _shared_strings(zf, wanted):
+    """Read only the shared strings whose indices are in `wanted`."""
+    if not wanted or 'xl/sharedStrings.xml' not in zf.namelist():
+        return {}
+    found = {}
+    last = max(wanted)
+    with zf.open('xl/sharedStrings.xml') as f:
+        index = -1
+        for event, el in ET.iterparse(f, events=('end',)):
+            if _local(el.tag) != 'si':
+                continue
+            index += 1
+            if index in wanted:
+                found[index] = ''.join(t.text or '' for t in el.iter() if _local(t.tag) == 't')
+            el.clear()
+            if index >= last:
+                break
+    return found
+
+def read_header_row(xlsx_file):
+    """
+    Return the column names in the first row of the first sheet.
+
+    Only the start of the sheet XML is parsed (up to the end of the first row)
+    and only the shared strings that row refers to, so the cost does not grow
+    with the number of data rows.
+    """
+    with zipfile.ZipFile(xlsx_file) as zf:
+        cells = {}
+        with zf.open(_first_sheet_path(zf)) as f:
+            for event, el in ET.iterparse(f, events=('end',)):
+                tag = _local(el.tag)
+                if tag == 'c':
+                    cell_type = el.get('t')
+                    if cell_type == 'inlineStr':
+                        value = ''.join(t.text or '' for t in el.iter() if _local(t.tag) == 't')
+                    else:
+                        v = next((child for child in el if _local(child.tag) == 'v'), None)
+                        value = v.text if v is not None else None
+                        if cell_type == 's' and value is not None:
+                            value = int(value)
+                            cell_type = 'shared'
+                    if value is not None:
+                        cells[_column_index(el.get('r'))] = (cell_type, value)
+                elif tag == 'row':
+                    if cells:
+                        break
+                    el.clear()
+
+        strings = _shared_strings(zf, {v for t, v in cells.values() if t == 'shared'})
+
+    header = []
+    for idx in sorted(cells):
+        cell_type, value = cells[idx]
+        header.append(strings.get(value) if cell_type == 'shared' else str(value))
+    return header
+
+def ensure_schema_cache(conn):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SCHEMA_CACHE_TABLE} (
+            content_hash TEXT PRIMARY KEY,
+            source_file TEXT NOT NULL,
+            file_size INTEGER NOT NULL,
+            mtime REAL NOT NULL,
+            columns TEXT NOT NULL,
+            scanned_at TEXT NOT NULL
+        )
+    """)
+    conn.commit()
+
+def scan_headers(conn, xlsx_files, verbose=True):
+    """
+    Return {source_file: [columns]} for every workbook, caching headers by file hash.
+
+    A file whose name, size and mtime match a cache entry is not opened at all;
+    otherwise it is hashed and, if the content is new, its header row is read.
+    """
+    ensure_schema_cache(conn)
+    file_columns = {}
+
+    for xlsx_file in xlsx_files:
+        stat = xlsx_file.stat()
+        row = conn.execute(f"""
+            SELECT columns FROM {SCHEMA_CACHE_TABLE}
+            WHERE source_file = ? AND file_size = ? AND mtime = ?
+        """, (xlsx_file.name, stat.st_size, stat.st_mtime)).fetchone()
+        status = 'cached'
+
+        if row is None:
+            content_hash = file_hash(xlsx_file)
+            row = conn.execute(f"SELECT columns FROM {SCHEMA_CACHE_TABLE} WHERE content_hash = ?",
+                               (content_hash,)).fetchone()
+            if row is None:
+                try:
+                    columns = read_header_row(xlsx_file)
+                except Exception as e:
+                    print(f"  Error reading {xlsx_file.name}: {e}")
+                    continue
+                row = (json.dumps(columns, ensure_ascii=False),)
+                status = 'scanned'
+            conn.execute(f"DELETE FROM {SCHEMA_CACHE_TABLE} WHERE source_file = ? AND content_hash != ?",
+                         (xlsx_file.name, content_hash))
+            conn.execute(f"""
+                INSERT OR REPLACE INTO {SCHEMA_CACHE_TABLE}
+                    (content_hash, source_file, file_size, mtime, columns, scanned_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (content_hash, xlsx_file.name, stat.st_size, stat.st_mtime, row[0],
+                  datetime.now().isoformat(sep=' ', timespec='seconds')))
+
+        file_columns[xlsx_file.name] = json.loads(row[0])
+        if verbose:
+            print(f"  {xlsx_file.name}: {len(file_columns[xlsx_file.name])} columns ({status})")
+
+    conn.commit()
+    return file_columns
+
+def drift_key(column):
+    """Spelling-insensitive key: 'PAÍS_DE_PROCEDENCIA_DESTINO' -> 'PAIS_DE_PROCEDENCIA_DESTINO'."""
+    stripped = ''.join(ch for ch in unicodedata.normalize('NFKD', str(column))
+                       if not unicodedata.combining(ch))
+    return re.sub(r'[^A-Z0-9]+', '_', stripped.upper()).strip('_')
+
+def column_drift_report(file_columns):
+    """
+    Find columns spelled differently across files and columns missing from some files.
+    Returns (variants, missing):
+      variants: {key: {spelling: [files]}} for keys with more than one spelling
+      missing:  {key: [files without any spelling of it]}
+    """
+    spellings = {}
+    for source_file, columns in file_columns.items():
+        for column in columns:
+            spellings.setdefault(drift_key(column), {}).setdefault(column, []).append(source_file)
+
+    variants = {key: files for key, files in spellings.items() if len(files) > 1}
+    missing = {}
+    for key, files in spellings.items():
+        present = {f for names in files.values() for f in names}
+        absent = sorted(f for f in file_columns if f not in present)
+        if absent:
+            missing[key] = absent
+    return variants, missing
+
+def print_drift_report(file_columns):
+    variants, missing = column_drift_report(file_columns)
+    if not variants and not missing:
+        print("  No column drift between files")
+        return
+    for key, spellings in sorted(variants.items()):
+        print(f"  {key}: {len(spellings)} spellings")
+        for spelling, files in sorted(spellings.items()):
+            print(f"    {spelling!r}: {', '.join(sorted(files))}")
+    for key, files in sorted(missing.items()):
+        print(f"  {key}: missing in {', '.join(files)}")
+
+def scan_xlsx_headers():
+    """
+    Scan the header row of every workbook in data/imports and report column drift.
+    """
+    imports_dir = Path("data/imports")
+    db_path = imports_dir / "merged" / "merged_data.db"
+    xlsx_files = sorted(imports_dir.glob("*.xlsx"))
+
+    print("XLSX HEADER SCAN")
+    print("=" * 100)
+
+    conn = sqlite3.connect(db_path)
+    start = time.perf_counter()
+    file_columns = scan_headers(conn, xlsx_files)
+    elapsed = time.perf_counter() - start
+    print(f"\nScanned {len(file_columns)} files in {elapsed * 1000:.0f} ms")
+
+    print("\nCOLUMN DRIFT:")
+    print_drift_report(file_columns)
+    conn.close()
+
+if __name__ == "__main__":
+    scan_xlsx_headers()
@@ -0,0 +1,228 @@
+import sqlite3
+import time
+import pandas as pd
+from datetime import datetime
+from pathlib import Path
+from bulk_load import BulkLoadSession
+from reorder_columns import new_column_order
+from star_schema import storage_table
+
+VERSION_TABLE = "schema_version"
+
+COPY_CHUNK_ROWS = 500_000
+
+def ensure_version_table(conn):
+    """Create the table of applied migrations (one row per version)."""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {VERSION_TABLE} (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL,
+            seconds REAL NOT NULL
+        )
+    """)
+    conn.commit()
+
+def current_version(conn):
+    ensure_version_table(conn)
+    return conn.execute(f"SELECT COALESCE(MAX(version), 0) FROM {VERSION_TABLE}").fetchone()[0]
+
+def table_columns(conn, table_name):
+    """[(name, declared type)] of a table in storage order."""
+    return [(row[1], row[2]) for row in conn.execute(f'PRAGMA table_info("{table_name}")')]
+
+def is_table(conn, name):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                        (name,)).fetchone() is not None
+
+def rename_column(conn, table_name, old, new):
+    """
+    ALTER TABLE ... RENAME COLUMN: a schema-only change, no row is rewritten.
+    Leaves the transaction open for apply_migrations to commit with the version.
+    """
+    if old not in {name for name, _ in table_columns(conn, table_name)}:
+        return False
+    print(f"  {table_name}: renaming column {old} -> {new}")
+    conn.execute("BEGIN")
+    conn.execute(f'ALTER TABLE "{table_name}" RENAME COLUMN "{old}" TO "{new}"')
+    return True
+
+def split_definitions(body):
+    """Split the body of a CREATE TABLE on the commas outside parentheses and quotes."""
+    parts = []
+    depth = 0
+    quote = None
+    start = 0
+    for i, char in enumerate(body):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in '\'"`[':
+            quote = ']' if char == '[' else char
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            parts.append(body[start:i].strip())
+            start = i + 1
+    parts.append(body[start:].strip())
+    return parts
+
+def definition_name(definition):
+    """Name a column definition starts with, unquoted."""
+    if definition[0] in '"`[':
+        close = ']' if definition[0] == '[' else definition[0]
+        return definition[1:definition.index(close, 1)]
+    return definition.split()[0]
+
+def reordered_ddl(conn, table_name, new_name, columns):
+    """
+    CREATE TABLE statement of new_name: table_name's own statement with the
+    column definitions in the given order, so column constraints (ROW_HASH
+    UNIQUE), table constraints and options such as STRICT are kept.
+    """
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+                       (table_name,)).fetchone()[0]
+    open_paren = sql.index('(')
+    close_paren = sql.rindex(')')
+    names = {name for name, _ in table_columns(conn, table_name)}
+    definitions = {}
+    constraints = []
+    for definition in split_definitions(sql[open_paren + 1:close_paren]):
+        name = definition_name(definition)
+        if name in names:
+            definitions[name] = definition
+        else:
+            constraints.append(definition)
+    body = ', '.join([definitions[col] for col in columns] + constraints)
+    return f'CREATE TABLE "{new_name}" ({body}){sql[close_paren + 1:]}'
+
+def copy_table(conn, table_name, columns, chunk_rows=COPY_CHUNK_ROWS):
+    """
+    Rewrite table_name with its columns in the given order, for changes SQLite
+    cannot make in place.
+
+    The new table is created from the table's own CREATE TABLE statement
+    (reordered_ddl), so its constraints and options carry over. Rows are
+    copied with their rowids into <table>_migrating in chunks of
+    chunk_rows, committing after each chunk, so an interrupted copy resumes
+    where it stopped. The new table then replaces the old one together with
+    its indexes in one transaction, left open for apply_migrations to commit
+    with the version; until that commit the old table is untouched.
+    """
+    new_name = f"{table_name}_migrating"
+    column_list = ', '.join(f'"{col}"' for col in columns)
+    if not is_table(conn, new_name):
+        conn.execute(reordered_ddl(conn, table_name, new_name, columns))
+        conn.commit()
+
+    copied = conn.execute(f'SELECT COALESCE(MAX(rowid), 0) FROM "{new_name}"').fetchone()[0]
+    last = conn.execute(f'SELECT COALESCE(MAX(rowid), 0) FROM "{table_name}"').fetchone()[0]
+    if copied:
+        print(f"  Resuming copy after rowid {copied:,}")
+
+    start = time.perf_counter()
+    rows = 0
+    with BulkLoadSession(conn, defer_indexes=False, commit_rows=chunk_rows, verbose=False) as session:
+        for low in range(copied, last, chunk_rows):
+            cursor = conn.execute(f'INSERT INTO "{new_name}" (rowid, {column_list}) '
+                                  f'SELECT rowid, {column_list} FROM "{table_name}" '
+                                  f'WHERE rowid > ? AND rowid <= ?', (low, low + chunk_rows))
+            rows += cursor.rowcount
+            session.rows_written(cursor.rowcount)
+            elapsed = time.perf_counter() - start
+            print(f"    copied rows up to {min(low + chunk_rows, last):,} of {last:,} "
+                  f"({rows / elapsed if elapsed else 0:,.0f} rows/sec)")
+
+    indexes = [row[0] for row in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+        (table_name,))]
+    conn.execute("BEGIN")
+    conn.execute(f'DROP TABLE "{table_name}"')
+    conn.execute(f'ALTER TABLE "{new_name}" RENAME TO "{table_name}"')
+    for sql in indexes:
+        conn.execute(sql)
+
+def presentation_order(columns):
+    """Canonical columns first (in new_column_order), then the others in their current order."""
+    canonical = [col for col in new_column_order if col in columns]
+    return canonical + [col for col in columns if col not in canonical]
+
+def migrate_pais_column(conn):
+    """PAÍS_DE_PROCEDENCIA_DESTINO -> PAIS_DE_PROCEDENCIA_DESTINO on pre-merge-script tables."""
+    rename_column(conn, storage_table(conn, 'merged_imports'),
+                  'PAÍS_DE_PROCEDENCIA_DESTINO', 'PAIS_DE_PROCEDENCIA_DESTINO')
+
+def migrate_column_order(conn):
+    """
+    Canonical column order. The star-schema layout gets it from the
+    merged_imports view, so only a flat merged_imports table out of order is
+    rewritten (a view cannot take the name of the table it reads).
+    """
+    table_name = storage_table(conn, 'merged_imports')
+    if table_name != 'merged_imports' or not is_table(conn, table_name):
+        return
+    columns = [name for name, _ in table_columns(conn, table_name)]
+    ordered = presentation_order(columns)
+    if columns != ordered:
+        print(f"  {table_name}: rewriting {len(columns)} columns in canonical order")
+        copy_table(conn, table_name, ordered)
+
+# Applied in version order, each at most once per database. Migrations only act
+# on layouts that need them, so on a database built by the current merge they
+# are recorded without changing anything.
+MIGRATIONS = [
+    (1, 'rename PAÍS_DE_PROCEDENCIA_DESTINO', migrate_pais_column),
+    (2, 'canonical column order', migrate_column_order),
+]
+
+def apply_migrations(conn, migrations=MIGRATIONS):
+    """
+    Apply the migrations newer than the recorded schema version. Each one is
+    recorded in schema_version in the transaction that finishes it, so it is
+    never applied twice. Returns the versions applied.
+    """
+    version = current_version(conn)
+    applied = []
+    for number, name, migrate in migrations:
+        if number <= version:
+            continue
+        print(f"Migration {number}: {name}")
+        start = time.perf_counter()
+        conn.commit()
+        try:
+            migrate(conn)
+            conn.execute(f"INSERT INTO {VERSION_TABLE} (version, name, applied_at, seconds) "
+                         f"VALUES (?, ?, ?, ?)",
+                         (number, name, datetime.now().isoformat(sep=' ', timespec='seconds'),
+                          round(time.perf_counter() - start, 3)))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(number)
+    return applied
+
+def show_schema_version():
+    """
+    Apply pending migrations and print the migration history.
+    """
+    db_path = Path("data/imports/merged/merged_data.db")
+    if not db_path.exists():
+        print(f"Database not found at {db_path}")
+        return
+    conn = sqlite3.connect(db_path)
+
+    print("SCHEMA MIGRATIONS")
+    print("=" * 100)
+    applied = apply_migrations(conn)
+    if not applied:
+        print(f"Schema is up to date (version {current_version(conn)})")
+
+    print("\nAPPLIED MIGRATIONS:")
+    print(pd.read_sql(f"SELECT * FROM {VERSION_TABLE} ORDER BY version", conn).to_string(index=False))
+    conn.close()
+
+if __name__ == "__main__":
+    show_schema_version()
@@ -0,0 +1,141 @@
+import sqlite3
+import pandas as pd
+from pathlib import Path
+from canonical_schema import DIMENSION_TABLES, id_column
+
+# merged_imports and the data marts (data_marts.py) are views over these tables; the views look
+# the dimension values back up so existing queries keep their column names.
+FACT_TABLES = {
+    'merged_imports': 'merged_imports_fact',
+    'flowers_greens': 'flowers_greens_fact',
+    'seafood': 'seafood_fact',
+    'preparations': 'preparations_fact',
+}
+
+def ensure_dimensions(conn):
+    """Create the dimension tables: one row per distinct value, keyed by a small integer."""
+    for dim_table in DIMENSION_TABLES.values():
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {dim_table} (
+                id INTEGER PRIMARY KEY,
+                value TEXT NOT NULL UNIQUE
+            ) STRICT
+        """)
+    conn.commit()
+
+def dimension_id(conn, column, value):
+    """Key of a value in a column's dimension table, or None if it is not there."""
+    row = conn.execute(f"SELECT id FROM {DIMENSION_TABLES[column]} WHERE value = ?",
+                       (value,)).fetchone()
+    return row[0] if row else None
+
+def storage_table(conn, name):
+    """
+    Table that holds the rows shown by `name`: the fact table behind a
+    star-schema view, or `name` itself for a plain table.
+    """
+    fact_table = FACT_TABLES.get(name)
+    if fact_table and conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                   (fact_table,)).fetchone():
+        return fact_table
+    return name
+
+def drop_table_or_view(conn, name):
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = ? AND type IN ('table', 'view')",
+                       (name,)).fetchone()
+    if row:
+        conn.execute(f'DROP {row[0].upper()} "{name}"')
+
+class DimensionEncoder:
+    """
+    Replaces the dimensioned values of row tuples by their integer keys.
+
+    Keys are cached in memory; unseen values are inserted into the dimension
+    table in the caller's transaction. Call reload() after a rollback so the
+    cache forgets keys that were rolled back.
+
+        encoder = DimensionEncoder(conn, all_columns)
+        conn.executemany(sql, encoder.encode(batch))
+    """
+
+    def __init__(self, conn, columns):
+        self.conn = conn
+        self.positions = [(idx, col) for idx, col in enumerate(columns) if col in DIMENSION_TABLES]
+        self.reload()
+
+    def reload(self):
+        self.keys = {
+            col: dict(self.conn.execute(f"SELECT value, id FROM {DIMENSION_TABLES[col]}"))
+            for _, col in self.positions
+        }
+
+    def key(self, column, value):
+        if value is None:
+            return None
+        keys = self.keys[column]
+        if value not in keys:
+            cursor = self.conn.execute(f"INSERT INTO {DIMENSION_TABLES[column]} (value) VALUES (?)",
+                                       (value,))
+            keys[value] = cursor.lastrowid
+        return keys[value]
+
+    def encode(self, batch):
+        encoded = []
+        for row in batch:
+            row = list(row)
+            for idx, col in self.positions:
+                row[idx] = self.key(col, row[idx])
+            encoded.append(tuple(row))
+        return encoded
+
+def create_presentation_view(conn, view_name, fact_table):
+    """
+    (Re)create view_name over fact_table with every <column>_ID replaced, in
+    place, by the dimension value under the original column name. Values are
+    looked up with scalar subqueries on the dimension primary key rather than
+    joins, so a query only pays for the dimensions it reads (SQLite does not
+    drop unused LEFT JOINs from aggregate queries). A lookup still runs per
+    row, so GROUP BYs on a dimension group the fact table on its key and
+    join the values to the groups instead.
+    """
+    id_columns = {id_column(col): col for col in DIMENSION_TABLES}
+    select = []
+    for row in conn.execute(f'PRAGMA table_info("{fact_table}")'):
+        name = row[1]
+        if name in id_columns:
+            column = id_columns[name]
+            select.append(f'(SELECT value FROM {DIMENSION_TABLES[column]} WHERE id = f."{name}") '
+                          f'AS "{column}"')
+        else:
+            select.append(f'f."{name}"')
+
+    drop_table_or_view(conn, view_name)
+    conn.execute(f'CREATE VIEW "{view_name}" AS SELECT {", ".join(select)} FROM "{fact_table}" f')
+
+def show_dimensions():
+    """
+    Print the size of every dimension table and of the fact tables.
+    """
+    db_path = Path("data/imports/merged/merged_data.db")
+    conn = sqlite3.connect(db_path)
+
+    print("STAR SCHEMA")
+    print("=" * 100)
+    rows = []
+    for column, dim_table in DIMENSION_TABLES.items():
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (dim_table,)).fetchone()
+        count = conn.execute(f"SELECT COUNT(*) FROM {dim_table}").fetchone()[0] if exists else None
+        rows.append({'column': column, 'dimension_table': dim_table, 'distinct_values': count})
+    print(pd.DataFrame(rows).to_string(index=False))
+
+    print("\nFACT TABLES:")
+    for view_name, fact_table in FACT_TABLES.items():
+        if storage_table(conn, view_name) == fact_table:
+            count = conn.execute(f'SELECT COUNT(*) FROM "{fact_table}"').fetchone()[0]
+            print(f"  {view_name} -> {fact_table}: {count:,} rows")
+        else:
+            print(f"  {view_name}: not in the star-schema layout")
+    conn.close()
+
+if __name__ == "__main__":
+    show_dimensions()
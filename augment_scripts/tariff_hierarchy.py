@@ -0,0 +1,174 @@
+import sqlite3
+import time
+import pandas as pd
+from pathlib import Path
+from star_schema import storage_table
+
+HIERARCHY_TABLE = "catalogo_jerarquia"
+
+HIERARCHY_COLUMNS = ['COD_INCISO', 'NIVEL_COINCIDENCIA', 'COD_INCISO_CATALOGO',
+                     'COD_CAPITULO', 'COD_PARTIDA', 'COD_SUBPARTIDA', 'CAPITULO_NOMBRE']
+
+# Match levels from the most to the least specific
+MATCH_LEVELS = ['inciso', 'subpartida', 'partida', 'capitulo']
+
+def code_levels(cod_inciso):
+    """
+    (capítulo, partida, subpartida) of a COD_INCISO, with the integer
+    encoding of catalogo_arancel: 60311000000 (0603.11.00.00.00) -> (6, 603, 60311).
+    """
+    return cod_inciso // 10**10, cod_inciso // 10**8, cod_inciso // 10**6
+
+class TariffHierarchy:
+    """
+    In-memory capítulo -> partida -> subpartida -> inciso index of catalogo_arancel.
+
+    resolve() gives an import code's exact catalogue entry or, when the code
+    is not catalogued, its nearest catalogued ancestor: one dict lookup per
+    level. The catalogue only describes incisos, so an ancestor match carries
+    the ancestor's codes and the chapter name but no description or tariff.
+    """
+
+    def __init__(self, catalogue_rows):
+        self.incisos = set()
+        self.levels = {'subpartida': set(), 'partida': set(), 'capitulo': set()}
+        self.chapter_names = {}
+        for cod_inciso, chapter_name in catalogue_rows:
+            self.incisos.add(cod_inciso)
+            capitulo, partida, subpartida = code_levels(cod_inciso)
+            self.levels['subpartida'].add(subpartida)
+            self.levels['partida'].add(partida)
+            self.levels['capitulo'].add(capitulo)
+            if chapter_name is not None:
+                self.chapter_names.setdefault(capitulo, chapter_name)
+
+    @classmethod
+    def from_database(cls, conn):
+        return cls(conn.execute("SELECT COD_INCISO, CAPITULO_NOMBRE FROM catalogo_arancel "
+                                "WHERE COD_INCISO IS NOT NULL"))
+
+    def resolve(self, cod_inciso):
+        """
+        Lookup row of an import code: match level, the catalogue inciso it
+        resolves to (exact matches only) and the codes of the matched node;
+        None when not even its chapter is catalogued.
+        """
+        capitulo, partida, subpartida = code_levels(cod_inciso)
+        row = {'COD_INCISO': cod_inciso, 'COD_CAPITULO': capitulo, 'COD_PARTIDA': partida,
+               'COD_SUBPARTIDA': subpartida, 'COD_INCISO_CATALOGO': None,
+               'CAPITULO_NOMBRE': self.chapter_names.get(capitulo)}
+        if cod_inciso in self.incisos:
+            row.update(NIVEL_COINCIDENCIA='inciso', COD_INCISO_CATALOGO=cod_inciso)
+        elif subpartida in self.levels['subpartida']:
+            row.update(NIVEL_COINCIDENCIA='subpartida')
+        elif partida in self.levels['partida']:
+            row.update(NIVEL_COINCIDENCIA='partida', COD_SUBPARTIDA=None)
+        elif capitulo in self.levels['capitulo']:
+            row.update(NIVEL_COINCIDENCIA='capitulo', COD_SUBPARTIDA=None, COD_PARTIDA=None)
+        else:
+            return None
+        return row
+
+def build_hierarchy_table(conn, view_name='merged_imports'):
+    """
+    Materialise the resolution of every distinct COD_INCISO of view_name and
+    of the catalogue itself in catalogo_jerarquia (COD_INCISO INTEGER PRIMARY
+    KEY), so tables can be enriched with one integer join. Codes whose chapter
+    is not catalogued get no row. Returns the number of rows written.
+    """
+    hierarchy = TariffHierarchy.from_database(conn)
+    codes = {row[0] for row in conn.execute(
+        f'SELECT DISTINCT COD_INCISO FROM "{storage_table(conn, view_name)}" WHERE COD_INCISO IS NOT NULL')}
+    codes.update(hierarchy.incisos)
+    rows = [row for row in map(hierarchy.resolve, sorted(codes)) if row is not None]
+
+    conn.execute(f"DROP TABLE IF EXISTS {HIERARCHY_TABLE}")
+    conn.execute(f"""
+        CREATE TABLE {HIERARCHY_TABLE} (
+            COD_INCISO INTEGER PRIMARY KEY,
+            NIVEL_COINCIDENCIA TEXT NOT NULL,
+            COD_INCISO_CATALOGO INTEGER,
+            COD_CAPITULO INTEGER,
+            COD_PARTIDA INTEGER,
+            COD_SUBPARTIDA INTEGER,
+            CAPITULO_NOMBRE TEXT
+        )
+    """)
+    conn.executemany(f"""
+        INSERT INTO {HIERARCHY_TABLE} (COD_INCISO, NIVEL_COINCIDENCIA, COD_INCISO_CATALOGO,
+                                       COD_CAPITULO, COD_PARTIDA, COD_SUBPARTIDA, CAPITULO_NOMBRE)
+        VALUES (:COD_INCISO, :NIVEL_COINCIDENCIA, :COD_INCISO_CATALOGO,
+                :COD_CAPITULO, :COD_PARTIDA, :COD_SUBPARTIDA, :CAPITULO_NOMBRE)
+    """, rows)
+    conn.commit()
+    return len(rows)
+
+def refresh_hierarchy_rows(conn, codes=(), view_name='merged_imports'):
+    """
+    After a catalogue update: resolve the codes of catalogo_jerarquia, codes,
+    and the import codes of chapters that were not catalogued before against
+    the current catalogue, and rewrite only the rows that changed. Returns
+    the set of codes whose row changed (all codes are written when the table
+    does not exist yet, and none are returned).
+    """
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                    (HIERARCHY_TABLE,)).fetchone() is None:
+        build_hierarchy_table(conn, view_name)
+        return set()
+    hierarchy = TariffHierarchy.from_database(conn)
+    stored = {row[0]: row for row in conn.execute(
+        f"SELECT {', '.join(HIERARCHY_COLUMNS)} FROM {HIERARCHY_TABLE}")}
+    candidates = set(stored).union(codes)
+    # Every code of a catalogued chapter has a row, so only import codes of new chapters are missing
+    for chapter in hierarchy.levels['capitulo'] - {row[3] for row in stored.values()}:
+        candidates.update(row[0] for row in conn.execute(
+            f'SELECT DISTINCT COD_INCISO FROM "{storage_table(conn, view_name)}" '
+            f'WHERE COD_INCISO BETWEEN ? AND ?', (chapter * 10**10, (chapter + 1) * 10**10 - 1)))
+
+    changed = {}
+    for code in candidates:
+        row = hierarchy.resolve(code)
+        values = tuple(row[col] for col in HIERARCHY_COLUMNS) if row else None
+        if values != stored.get(code):
+            changed[code] = values
+    conn.executemany(f"INSERT OR REPLACE INTO {HIERARCHY_TABLE} ({', '.join(HIERARCHY_COLUMNS)}) "
+                     f"VALUES ({', '.join('?' for _ in HIERARCHY_COLUMNS)})",
+                     [values for values in changed.values() if values is not None])
+    conn.executemany(f"DELETE FROM {HIERARCHY_TABLE} WHERE COD_INCISO = ?",
+                     [(code,) for code, values in changed.items() if values is None])
+    conn.commit()
+    return set(changed)
+
+def show_hierarchy_matches():
+    """
+    Build catalogo_jerarquia and print how the import codes resolve.
+    """
+    db_path = Path("data/imports/merged/merged_data.db")
+    if not db_path.exists():
+        print(f"Database not found at {db_path}")
+        return
+    conn = sqlite3.connect(db_path)
+
+    print("TARIFF HIERARCHY")
+    print("=" * 100)
+    start = time.perf_counter()
+    rows = build_hierarchy_table(conn)
+    print(f"  {HIERARCHY_TABLE}: {rows:,} codes resolved in {time.perf_counter() - start:.2f}s")
+
+    print("\nIMPORT CODES BY MATCH LEVEL:")
+    levels = pd.read_sql(f"""
+        SELECT COALESCE(h.NIVEL_COINCIDENCIA, 'sin capítulo') AS nivel_coincidencia,
+               COUNT(*) AS codes, SUM(i.records) AS records
+        FROM (SELECT COD_INCISO, COUNT(*) AS records FROM "{storage_table(conn, 'merged_imports')}"
+              WHERE COD_INCISO IS NOT NULL GROUP BY COD_INCISO) i
+        LEFT JOIN {HIERARCHY_TABLE} h ON h.COD_INCISO = i.COD_INCISO
+        GROUP BY h.NIVEL_COINCIDENCIA
+    """, conn)
+    order = {level: position for position, level in enumerate(MATCH_LEVELS)}
+    levels = levels.sort_values('nivel_coincidencia', key=lambda col: col.map(order).fillna(len(order)))
+    levels['pct_codes'] = (levels['codes'] / levels['codes'].sum() * 100).round(2)
+    print(levels.to_string(index=False))
+    conn.close()
+
+if __name__ == "__main__":
+    show_hierarchy_matches()
@@ -0,0 +1,83 @@
+import sqlite3
+import pytest
+from catalogue_tokenizer import CatalogueTokenizer
+from chapter_page_index import CHAPTER_INDEX_TABLE, extract_catalogue, extract_chapters
+from pdf_page_cache import PAGE_CACHE_TABLE, PDF_FILES_TABLE, ensure_page_cache
+
+# Chapters share their boundary pages; 0503.11, 0603.11 and 0703.11 all yield
+# the alternate code 03.11.00.00.00, and 19.00.00.00.10 is a chapter 6 line
+# in the alternate format only
+PAGES = [
+    "Capítulo 5\nProductos de origen animal\n"
+    "0501.00.00.00.00 - Cabello en bruto 10 7 0 0\n"
+    "0503.11.00.00.00 - Crin 5 7 0 0",
+    "0511.10.00.00.00 - Semen de bovino 0 0 0 0\n"
+    "Capítulo 6\nPlantas vivas y productos de la floricultura\n"
+    "0601.10.00.00.00 - Bulbos en reposo 10 0 0 0",
+    "0603.11.00.00.00 - - Rosas 15 0 0 0\n"
+    "0603.12.00.00.00 - - Claveles 15 0 0 0\n"
+    "19.00.00.00.10 - - Flores secas 10 0 0 0\n"
+    "0604.20.00.00.00 - Follaje fresco\n",
+    "0604.90.00.00.00 - Los demás 10 0 0 0\n"
+    "Capítulo 7\nHortalizas\n"
+    "0701.10.00.00.00 - Para siembra 0 0 0 0",
+    "0703.11.00.00.00 - Cebollas 15 0 0 0\n"
+    "Capítulo 8\nFrutas\n"
+    "0801.11.00.00.00 - Cocos 10 0 0 0",
+]
+
+CATALOGUE_COLUMNS = ['COD_INCISO', 'COD_CAPITULO', 'COD_PARTIDA', 'COD_SUBPARTIDA', 'DESCRIPCIÓN',
+                     'DAI', 'ITBMS', 'ISC', 'ICCDP']
+
+def cached_pdf(conn, pdf_path, content_hash="arancel"):
+    """Register pdf_path with PAGES already in the page cache."""
+    pdf_path.write_bytes(b"%PDF")
+    ensure_page_cache(conn)
+    stat = pdf_path.stat()
+    conn.execute(f"INSERT INTO {PDF_FILES_TABLE} VALUES (?, ?, ?, ?, ?, '2026-01-01')",
+                 (content_hash, pdf_path.name, stat.st_size, stat.st_mtime, len(PAGES)))
+    conn.executemany(f"INSERT INTO {PAGE_CACHE_TABLE} VALUES (?, ?, ?)",
+                     [(content_hash, page, text) for page, text in enumerate(PAGES)])
+
+def load_catalogue(conn, rows):
+    column_list = ', '.join(f'"{col}"' for col in CATALOGUE_COLUMNS)
+    conn.execute(f"CREATE TABLE catalogo_arancel ({column_list})")
+    conn.executemany(f"INSERT INTO catalogo_arancel VALUES ({', '.join('?' for _ in CATALOGUE_COLUMNS)})",
+                     [[row[col] for col in CATALOGUE_COLUMNS] for row in rows])
+
+def full_slice(chapters):
+    """{COD_INCISO: row} of a full extraction read from the lines of the given chapters."""
+    tokenizer = CatalogueTokenizer()
+    for text in PAGES:
+        tokenizer.feed(text)
+    rows, _ = tokenizer.close()
+    return {row['COD_INCISO']: row for row in rows if tokenizer.line_chapters[row['COD_INCISO']] in chapters}
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    yield conn
+    conn.close()
+
+@pytest.mark.parametrize("indexed", [True, False])
+@pytest.mark.parametrize("chapters", [[5], [6], [7], [6, 7], [5, 7], [5, 6, 7, 8]])
+def test_chapter_refresh_equals_full_extraction_slice(conn, tmp_path, chapters, indexed):
+    pdf_path = tmp_path / "arancel_2025.pdf"
+    cached_pdf(conn, pdf_path)
+    full_rows, full_names, _ = extract_catalogue(conn, pdf_path, verbose=False)
+    load_catalogue(conn, full_rows)
+    if not indexed:
+        conn.execute(f"DELETE FROM {CHAPTER_INDEX_TABLE}")
+
+    rows, chapter_names = extract_chapters(conn, pdf_path, chapters, verbose=False)
+    assert {row['COD_INCISO']: row for row in rows} == full_slice(chapters)
+    assert len(rows) == len(full_slice(chapters))
+    assert chapter_names == {ch: full_names[ch] for ch in chapters}
+
+def test_chapter_refresh_keeps_alternate_format_rows(conn, tmp_path):
+    pdf_path = tmp_path / "arancel_2025.pdf"
+    cached_pdf(conn, pdf_path)
+    rows, _ = extract_chapters(conn, pdf_path, [6], verbose=False)
+    alternate = {row['COD_INCISO'] for row in rows if row['COD_CAPITULO'] == 0}
+    # 03.11 is the chapter 6 line's own with no earlier chapter loaded
+    assert alternate == {110000000, 311000000, 312000000, 1900000010, 490000000}
@@ -0,0 +1,66 @@
+import sqlite3
+import pytest
+from importer_resolution import NAMES_TABLE, resolve_importers
+
+def flat_database(names):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE merged_imports (IMPORTADOR_EXPORTADOR TEXT)")
+    conn.executemany("INSERT INTO merged_imports VALUES (?)", [(name,) for name in names])
+    return conn
+
+def star_database(names):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE dim_importador (id INTEGER PRIMARY KEY, value TEXT NOT NULL UNIQUE)")
+    conn.execute("CREATE TABLE merged_imports_fact (IMPORTADOR_EXPORTADOR_ID INTEGER)")
+    for name in names:
+        conn.execute("INSERT OR IGNORE INTO dim_importador (value) VALUES (?)", (name,))
+        conn.execute("INSERT INTO merged_imports_fact SELECT id FROM dim_importador WHERE value = ?", (name,))
+    return conn
+
+def importer_ids(conn):
+    return dict(conn.execute(f"SELECT IMPORTADOR_EXPORTADOR, importer_id FROM {NAMES_TABLE}"))
+
+@pytest.mark.parametrize("database", [flat_database, star_database])
+@pytest.mark.parametrize("first, second", [
+    ("IMPORTADORA 12, S.A.", "IMPORTADORA 13, S.A."),
+    ("DISTRIBUIDORA PANAMA, S.A.", "DISTRIBUIDORA PANAMA 2, S.A."),
+    ("ESPECIALIDADES AGRICOLAS, S.A.", "ESPECIALIDADES AGRICOLAS DIRECTAS, S.A."),
+])
+def test_distinct_companies_stay_apart(database, first, second):
+    conn = database([first, second])
+    resolve_importers(conn)
+    ids = importer_ids(conn)
+    assert ids[first] != ids[second]
+
+@pytest.mark.parametrize("database", [flat_database, star_database])
+def test_variants_are_merged(database):
+    names = ["SUPER 99, S.A.", "Super 99 S.A", "DISTRIBUIDORA EL VALLE, S.A.",
+             "DISTRIBUIDORA EL VALE SA", "Distribuidora El Valle S. de R.L."]
+    conn = database(names)
+    resolve_importers(conn)
+    ids = importer_ids(conn)
+    assert ids["SUPER 99, S.A."] == ids["Super 99 S.A"]
+    assert len({ids[name] for name in names[2:]}) == 1
+    assert ids["SUPER 99, S.A."] != ids[names[2]]
+
+def test_incremental_names_join_existing_importers():
+    conn = flat_database(["IMPORTADORA 12, S.A.", "FLORES DEL SOL, S.A."])
+    resolve_importers(conn)
+    before = importer_ids(conn)
+    conn.executemany("INSERT INTO merged_imports VALUES (?)",
+                     [("Flores del Sol SA",), ("IMPORTADORA 13, S.A.",)])
+    assert resolve_importers(conn) == (2, 1)
+    after = importer_ids(conn)
+    assert after["Flores del Sol SA"] == before["FLORES DEL SOL, S.A."]
+    assert after["IMPORTADORA 13, S.A."] not in before.values()
+
+def test_star_mapping_is_keyed_on_dimension():
+    conn = star_database(["SUPER 99, S.A.", "Super 99 S.A", "FLORES DEL SOL, S.A."])
+    resolve_importers(conn)
+    keys = dict(conn.execute(f"SELECT IMPORTADOR_EXPORTADOR, IMPORTADOR_EXPORTADOR_ID FROM {NAMES_TABLE}"))
+    assert keys == dict(conn.execute("SELECT value, id FROM dim_importador"))
+
+def test_flat_mapping_has_no_dimension_key():
+    conn = flat_database(["SUPER 99, S.A.", "Super 99 S.A"])
+    resolve_importers(conn)
+    assert conn.execute(f"SELECT COUNT(IMPORTADOR_EXPORTADOR_ID) FROM {NAMES_TABLE}").fetchone()[0] == 0
@@ -0,0 +1,47 @@
+import sqlite3
+import pytest
+from bulk_load import BulkLoadSession
+from canonical_schema import table_ddl
+from schema_migrations import copy_table, table_columns
+
+COLUMNS = ['COD_INCISO', 'ROW_HASH', 'CANTIDAD', 'source_file']
+ORDERED = ['source_file', 'COD_INCISO', 'CANTIDAD', 'ROW_HASH']
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute(table_ddl('merged_imports', COLUMNS))
+    conn.execute('CREATE INDEX idx_inciso ON merged_imports(COD_INCISO)')
+    # Sparse rowids: chunks of 3 rowids hold fewer rows
+    conn.executemany('INSERT INTO merged_imports (rowid, COD_INCISO, ROW_HASH, CANTIDAD, source_file) '
+                     'VALUES (?, ?, ?, ?, ?)',
+                     [(rowid, 603110000 + rowid, rowid, 1.5 * rowid, 'IMP_2020_1.xlsx')
+                      for rowid in (1, 2, 5, 9, 10)])
+    conn.commit()
+    yield conn
+    conn.close()
+
+def test_copy_keeps_rows_in_new_order(conn):
+    before = conn.execute('SELECT rowid, * FROM merged_imports ORDER BY rowid').fetchall()
+    copy_table(conn, 'merged_imports', ORDERED, chunk_rows=3)
+    conn.commit()
+    assert [name for name, _ in table_columns(conn, 'merged_imports')] == ORDERED
+    after = conn.execute('SELECT rowid, COD_INCISO, ROW_HASH, CANTIDAD, source_file '
+                         'FROM merged_imports ORDER BY rowid').fetchall()
+    assert after == before
+    assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_inciso'").fetchone()
+
+def test_copy_keeps_strict_and_row_hash_unique(conn):
+    copy_table(conn, 'merged_imports', ORDERED, chunk_rows=3)
+    conn.commit()
+    cursor = conn.execute('INSERT OR IGNORE INTO merged_imports (COD_INCISO, ROW_HASH) VALUES (1, 5)')
+    assert cursor.rowcount == 0
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute("INSERT INTO merged_imports (COD_INCISO, ROW_HASH) VALUES ('not a code', 99)")
+
+def test_copy_reports_rows_copied(conn, monkeypatch):
+    written = []
+    monkeypatch.setattr(BulkLoadSession, 'rows_written', lambda session, count: written.append(count))
+    copy_table(conn, 'merged_imports', ORDERED, chunk_rows=3)
+    conn.commit()
+    assert written == [2, 1, 1, 1]
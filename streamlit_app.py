@@ -29,6 +29,23 @@ def get_product_types():
     df = pd.read_sql(query, conn)
     return ['All Products'] + df['producto_normalizado'].tolist()
 
+# Importer names grouped by canonical importer (augment_scripts/importer_resolution.py),
+# or as spelled in the imports until it has run. Queries group flowers_greens_fact
+# on IMPORTADOR_EXPORTADOR_ID first and join the name (dim_importador d) to the
+# per-key totals, instead of looking the name up on every row through the view;
+# the canonical importer is joined on the same integer key.
+def get_importer_columns():
+    resolved = conn.execute(
+        "SELECT 1 FROM pragma_table_info('importadores_nombres') "
+        "WHERE name = 'IMPORTADOR_EXPORTADOR_ID'").fetchone()
+    if resolved:
+        return ("COALESCE(i.nombre_canonico, d.value)",
+                "LEFT JOIN importadores_nombres n ON n.IMPORTADOR_EXPORTADOR_ID = d.id "
+                "LEFT JOIN importadores i ON i.importer_id = n.importer_id")
+    return "d.value", ""
+
+importer, importer_join = get_importer_columns()
+
 # Sidebar
 st.sidebar.title("🌱 Filters")
 product_types = get_product_types()
@@ -49,29 +66,29 @@ with tab1:
     if selected_product == 'All Products':
         query = """
         SELECT 
-            strftime('%Y-%m', FECHA_IMPORTACION_EXPORTACION) as month,
+            printf('%04d-%02d', yyyymm / 100, yyyymm % 100) as month,
             SUM(CANTIDAD) as volume,
             SUM(PRECIO_UNIDAD * CANTIDAD) / NULLIF(SUM(CANTIDAD), 0) as weighted_avg_price,
             SUM(TOTAL_A_PAGAR) as total_value,
             COUNT(*) as num_shipments
         FROM flowers_greens
-        WHERE FECHA_IMPORTACION_EXPORTACION IS NOT NULL
-        GROUP BY month
-        ORDER BY month
+        WHERE yyyymm IS NOT NULL
+        GROUP BY yyyymm
+        ORDER BY yyyymm
         """
         df_monthly = pd.read_sql(query, conn)
     else:
         query = """
         SELECT
-            strftime('%Y-%m', FECHA_IMPORTACION_EXPORTACION) as month,
+            printf('%04d-%02d', yyyymm / 100, yyyymm % 100) as month,
             SUM(CANTIDAD) as volume,
             SUM(PRECIO_UNIDAD * CANTIDAD) / NULLIF(SUM(CANTIDAD), 0) as weighted_avg_price,
             SUM(TOTAL_A_PAGAR) as total_value,
             COUNT(*) as num_shipments
         FROM flowers_greens
-        WHERE producto_normalizado = ? AND FECHA_IMPORTACION_EXPORTACION IS NOT NULL
-        GROUP BY month
-        ORDER BY month
+        WHERE producto_normalizado = ? AND yyyymm IS NOT NULL
+        GROUP BY yyyymm
+        ORDER BY yyyymm
         """
         df_monthly = pd.read_sql(query, conn, params=[selected_product])
     
@@ -113,31 +130,47 @@ with tab1:
 with tab2:
     st.header("🏢 Importer Analysis")
     
-    # Query importer data
+    # Query importer data: totals per importer key, then per (canonical) name
     if selected_product == 'All Products':
-        query = """
-        SELECT 
-            IMPORTADOR_EXPORTADOR as importer,
-            COUNT(*) as shipments,
-            SUM(CANTIDAD) as volume,
-            SUM(TOTAL_A_PAGAR) as total_value
-        FROM flowers_greens
-        WHERE IMPORTADOR_EXPORTADOR IS NOT NULL
-        GROUP BY IMPORTADOR_EXPORTADOR
+        query = f"""
+        SELECT
+            {importer} as importer,
+            COUNT(*) as name_variants,
+            SUM(t.shipments) as shipments,
+            SUM(t.volume) as volume,
+            SUM(t.total_value) as total_value
+        FROM (
+            SELECT IMPORTADOR_EXPORTADOR_ID as id, COUNT(*) as shipments,
+                   SUM(CANTIDAD) as volume, SUM(TOTAL_A_PAGAR) as total_value
+            FROM flowers_greens_fact
+            WHERE IMPORTADOR_EXPORTADOR_ID IS NOT NULL
+            GROUP BY IMPORTADOR_EXPORTADOR_ID
+        ) t
+        JOIN dim_importador d ON d.id = t.id
+        {importer_join}
+        GROUP BY importer
         ORDER BY volume DESC
         LIMIT 30
         """
         df_importers = pd.read_sql(query, conn)
     else:
-        query = """
+        query = f"""
         SELECT
-            IMPORTADOR_EXPORTADOR as importer,
-            COUNT(*) as shipments,
-            SUM(CANTIDAD) as volume,
-            SUM(TOTAL_A_PAGAR) as total_value
-        FROM flowers_greens
-        WHERE producto_normalizado = ? AND IMPORTADOR_EXPORTADOR IS NOT NULL
-        GROUP BY IMPORTADOR_EXPORTADOR
+            {importer} as importer,
+            COUNT(*) as name_variants,
+            SUM(t.shipments) as shipments,
+            SUM(t.volume) as volume,
+            SUM(t.total_value) as total_value
+        FROM (
+            SELECT IMPORTADOR_EXPORTADOR_ID as id, COUNT(*) as shipments,
+                   SUM(CANTIDAD) as volume, SUM(TOTAL_A_PAGAR) as total_value
+            FROM flowers_greens_fact
+            WHERE producto_normalizado = ? AND IMPORTADOR_EXPORTADOR_ID IS NOT NULL
+            GROUP BY IMPORTADOR_EXPORTADOR_ID
+        ) t
+        JOIN dim_importador d ON d.id = t.id
+        {importer_join}
+        GROUP BY importer
         ORDER BY volume DESC
         LIMIT 30
         """
@@ -216,19 +249,23 @@ with tab4:
     st.header("🌹 Roses - Complete Analysis")
 
     # Overview metrics
-    query_overview = """
+    query_overview = f"""
     SELECT
         COUNT(*) as total_shipments,
         SUM(CANTIDAD) as total_volume,
         SUM(TOTAL_A_PAGAR) as total_value,
-        COUNT(DISTINCT IMPORTADOR_EXPORTADOR) as num_importers,
-        COUNT(DISTINCT PAIS_DE_PROCEDENCIA_DESTINO) as num_countries,
+        (SELECT COUNT(DISTINCT {importer})
+         FROM (SELECT DISTINCT IMPORTADOR_EXPORTADOR_ID as id FROM flowers_greens_fact
+               WHERE producto_normalizado = 'Rosas') t
+         JOIN dim_importador d ON d.id = t.id
+         {importer_join}) as num_importers,
+        COUNT(DISTINCT PAIS_DE_PROCEDENCIA_DESTINO_ID) as num_countries,
         MIN(FECHA_IMPORTACION_EXPORTACION) as first_import,
         MAX(FECHA_IMPORTACION_EXPORTACION) as last_import,
         MIN(PRECIO_UNIDAD) as min_price,
         MAX(PRECIO_UNIDAD) as max_price,
         AVG(PRECIO_UNIDAD) as avg_price
-    FROM flowers_greens
+    FROM flowers_greens_fact
     WHERE producto_normalizado = 'Rosas'
     """
     df_overview = pd.read_sql(query_overview, conn)
@@ -252,15 +289,15 @@ with tab4:
         st.subheader("📈 Monthly Trends")
         query_monthly = """
         SELECT
-            strftime('%Y-%m', FECHA_IMPORTACION_EXPORTACION) as month,
+            printf('%04d-%02d', yyyymm / 100, yyyymm % 100) as month,
             SUM(CANTIDAD) as volume,
             SUM(PRECIO_UNIDAD * CANTIDAD) / NULLIF(SUM(CANTIDAD), 0) as weighted_avg_price,
             SUM(TOTAL_A_PAGAR) as total_value,
             COUNT(*) as shipments
         FROM flowers_greens
-        WHERE producto_normalizado = 'Rosas' AND FECHA_IMPORTACION_EXPORTACION IS NOT NULL
-        GROUP BY month
-        ORDER BY month
+        WHERE producto_normalizado = 'Rosas' AND yyyymm IS NOT NULL
+        GROUP BY yyyymm
+        ORDER BY yyyymm
         """
         df_monthly = pd.read_sql(query_monthly, conn)
 
@@ -298,18 +335,29 @@ with tab4:
 
         # Top importers
         st.subheader("🏢 Top Importers")
-        query_importers = """
+        query_importers = f"""
         SELECT
-            IMPORTADOR_EXPORTADOR as importer,
-            COUNT(*) as shipments,
-            SUM(CANTIDAD) as volume,
-            SUM(TOTAL_A_PAGAR) as total_value,
-            ROUND(AVG(PRECIO_UNIDAD), 4) as avg_price,
-            MIN(FECHA_IMPORTACION_EXPORTACION) as first_import,
-            MAX(FECHA_IMPORTACION_EXPORTACION) as last_import
-        FROM flowers_greens
-        WHERE producto_normalizado = 'Rosas' AND IMPORTADOR_EXPORTADOR IS NOT NULL
-        GROUP BY IMPORTADOR_EXPORTADOR
+            {importer} as importer,
+            COUNT(*) as name_variants,
+            SUM(t.shipments) as shipments,
+            SUM(t.volume) as volume,
+            SUM(t.total_value) as total_value,
+            ROUND(SUM(t.price_sum) / SUM(t.prices), 4) as avg_price,
+            MIN(t.first_import) as first_import,
+            MAX(t.last_import) as last_import
+        FROM (
+            SELECT IMPORTADOR_EXPORTADOR_ID as id, COUNT(*) as shipments,
+                   SUM(CANTIDAD) as volume, SUM(TOTAL_A_PAGAR) as total_value,
+                   SUM(PRECIO_UNIDAD) as price_sum, COUNT(PRECIO_UNIDAD) as prices,
+                   MIN(FECHA_IMPORTACION_EXPORTACION) as first_import,
+                   MAX(FECHA_IMPORTACION_EXPORTACION) as last_import
+            FROM flowers_greens_fact
+            WHERE producto_normalizado = 'Rosas' AND IMPORTADOR_EXPORTADOR_ID IS NOT NULL
+            GROUP BY IMPORTADOR_EXPORTADOR_ID
+        ) t
+        JOIN dim_importador d ON d.id = t.id
+        {importer_join}
+        GROUP BY importer
         ORDER BY volume DESC
         LIMIT 20
         """
@@ -329,18 +377,20 @@ with tab4:
 
         # Price distribution
         st.subheader("💰 Price Analysis")
-        query_prices = """
+        query_prices = f"""
         SELECT
-            PRECIO_UNIDAD as price,
-            CANTIDAD as quantity,
-            TOTAL_A_PAGAR as value,
-            FECHA_IMPORTACION_EXPORTACION as date,
-            IMPORTADOR_EXPORTADOR as importer
-        FROM flowers_greens
-        WHERE producto_normalizado = 'Rosas'
-          AND PRECIO_UNIDAD IS NOT NULL
-          AND PRECIO_UNIDAD > 0
-          AND PRECIO_UNIDAD < 1
+            f.PRECIO_UNIDAD as price,
+            f.CANTIDAD as quantity,
+            f.TOTAL_A_PAGAR as value,
+            f.FECHA_IMPORTACION_EXPORTACION as date,
+            {importer} as importer
+        FROM flowers_greens_fact f
+        LEFT JOIN dim_importador d ON d.id = f.IMPORTADOR_EXPORTADOR_ID
+        {importer_join}
+        WHERE f.producto_normalizado = 'Rosas'
+          AND f.PRECIO_UNIDAD IS NOT NULL
+          AND f.PRECIO_UNIDAD > 0
+          AND f.PRECIO_UNIDAD < 1
         LIMIT 5000
         """
         df_prices = pd.read_sql(query_prices, conn)
@@ -366,16 +416,23 @@ with tab4:
         st.subheader("🌍 Countries of Origin")
         query_countries = """
         SELECT
-            PAIS_DE_PROCEDENCIA_DESTINO as country,
-            COUNT(*) as shipments,
-            SUM(CANTIDAD) as volume,
-            SUM(TOTAL_A_PAGAR) as total_value,
-            ROUND(AVG(PRECIO_UNIDAD), 4) as avg_price
-        FROM flowers_greens
-        WHERE producto_normalizado = 'Rosas' AND PAIS_DE_PROCEDENCIA_DESTINO IS NOT NULL
-        GROUP BY PAIS_DE_PROCEDENCIA_DESTINO
-        ORDER BY volume DESC
-        LIMIT 15
+            d.value as country,
+            t.shipments,
+            t.volume,
+            t.total_value,
+            t.avg_price
+        FROM (
+            SELECT PAIS_DE_PROCEDENCIA_DESTINO_ID as id, COUNT(*) as shipments,
+                   SUM(CANTIDAD) as volume, SUM(TOTAL_A_PAGAR) as total_value,
+                   ROUND(AVG(PRECIO_UNIDAD), 4) as avg_price
+            FROM flowers_greens_fact
+            WHERE producto_normalizado = 'Rosas' AND PAIS_DE_PROCEDENCIA_DESTINO_ID IS NOT NULL
+            GROUP BY PAIS_DE_PROCEDENCIA_DESTINO_ID
+            ORDER BY volume DESC
+            LIMIT 15
+        ) t
+        JOIN dim_pais d ON d.id = t.id
+        ORDER BY t.volume DESC
         """
         df_countries = pd.read_sql(query_countries, conn)
 